@@ -0,0 +1,64 @@
+#!/usr/bin/env -S uv run python
+
+#####################################################################################################
+"""
+Local stand-in for an OpenTelemetry collector, receives OTLP/HTTP JSON traces.
+
+Usage:
+    ./src/_otlp_standin.py [port] [output.jsonl]
+
+Point the app to it with TRACING_OTLP_ENDPOINT=http://localhost:<port>. Every span is logged
+with its session (trace) and duration. Requests are appended to the output file when given,
+in the format the otlpjsonfile receiver of the collector reads.
+"""
+#####################################################################################################
+
+from logging import INFO, StreamHandler, getLogger
+from pathlib import Path
+from sys import argv
+from typing import Final
+
+from aiohttp import web
+
+#####################################################################################################
+
+_LOGGER: Final = getLogger(__name__)
+_LOGGER.setLevel(INFO)
+_LOGGER.addHandler(StreamHandler())
+
+#####################################################################################################
+
+def create_app(output: Path | None = None) -> web.Application:
+    routes: Final = web.RouteTableDef()
+
+    @routes.post('/v1/traces')
+    async def traces(request: web.Request) -> web.Response:
+        body = await request.read()
+        payload = await request.json()
+        if output is not None:
+            with open(output, 'ab') as file:
+                file.write(body.rstrip(b'\n') + b'\n')
+        for resource_spans in payload.get('resourceSpans', ()):
+            for scope_spans in resource_spans.get('scopeSpans', ()):
+                for span in scope_spans.get('spans', ()):
+                    duration_ms = (int(span['endTimeUnixNano']) - int(span['startTimeUnixNano'])) / 1e6
+                    status = span.get('status', {})
+                    error = f' ERROR {status.get("message")}' if status.get('code') == 2 else ''
+                    _LOGGER.info(
+                        f'{span["traceId"]} {span.get("parentSpanId", "-" * 16)} {span["spanId"]} '
+                        f'{duration_ms:>10.1f} ms  {span["name"]}{error}'
+                    )
+        return web.json_response({})
+
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    app.add_routes(routes)
+    return app
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    port = int(argv[1]) if len(argv) > 1 else 4318
+    output = Path(argv[2]) if len(argv) > 2 else None
+    web.run_app(create_app(output), port=port)
+
+#####################################################################################################
@@ -0,0 +1,132 @@
+#!/usr/bin/env -S uv run python
+
+#####################################################################################################
+"""
+Local stand-in for the Xano API, for development and benchmarks.
+
+Usage:
+    ./src/_xano_standin.py [port] [latency_ms]
+
+Point the app to it with XANO_API_URL=http://localhost:<port>
+"""
+#####################################################################################################
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from logging import INFO, StreamHandler, getLogger
+from random import Random
+from sys import argv
+from typing import Final
+
+from aiohttp import web
+
+#####################################################################################################
+
+_LOGGER: Final = getLogger(__name__)
+_LOGGER.setLevel(INFO)
+_LOGGER.addHandler(StreamHandler())
+
+_STREETS: Final = (
+    'Hope Street', 'Byres Road', 'Great Western Road', 'Sauchiehall Street', 'Argyle Street',
+    'Dumbarton Road', 'Victoria Road', 'Pollokshaws Road', 'Maryhill Road', 'Paisley Road',
+)
+_CITIES: Final = (('Glasgow', 'G'), ('Edinburgh', 'EH'), ('Paisley', 'PA'))
+_AGENTS: Final = (('1', 'Alice Brown'), ('2', 'Robert Wilson'), ('3', 'Fiona Campbell'))
+
+#####################################################################################################
+
+def generate_properties(count: int, seed: int = 42) -> list[dict]:
+    rnd = Random(seed)
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    properties = []
+    for number in range(count):
+        city, area = rnd.choice(_CITIES)
+        properties.append({
+            'external_id': f'P-{number + 1:06d}',
+            'address': f'{rnd.randint(1, 300)} {rnd.choice(_STREETS)}',
+            'city': city,
+            'country': 'United Kingdom',
+            'state': 'Scotland',
+            'postcode': f'{area}{rnd.randint(1, 20)} {rnd.randint(1, 9)}{rnd.choice("ABDEFGHJLNPQRSTUWXYZ")}'
+                        f'{rnd.choice("ABDEFGHJLNPQRSTUWXYZ")}',
+            'property_type': rnd.choice(('Flat', 'House', 'Cottage')),
+            'bedroom_count': rnd.randint(1, 5),
+            'bathroom_count': rnd.randint(1, 3),
+            'floor_count': rnd.randint(1, 3),
+            'date_available_for_sale': None,
+            'short_description': None,
+            'long_description': None,
+            'glazing': None,
+            'parking_type': None,
+            'updated_at': now_ms - rnd.randint(0, 30 * 24 * 3600 * 1000),
+        })
+    return properties
+
+#####################################################################################################
+
+def create_app(latency: float = 0.0, property_count: int = 1000) -> web.Application:
+    properties: Final = generate_properties(property_count)
+    routes: Final = web.RouteTableDef()
+
+    async def delay() -> None:
+        if latency:
+            await asyncio.sleep(latency)
+
+    @routes.post('/property_search_address')
+    async def property_search_address(request: web.Request) -> web.Response:
+        await delay()
+        body = await request.json()
+        words = body.get('search_address', '').lower().replace(',', ' ').split()
+        items = [
+            item for item in properties
+            if words and all(word in f"{item['address']} {item['city']} {item['postcode']}".lower() for word in words)
+        ]
+        return web.json_response({'items': items[:10]})
+
+    @routes.post('/property_sync')
+    async def property_sync(request: web.Request) -> web.Response:
+        await delay()
+        body = await request.json()
+        updated_after = body.get('updated_after')
+        page, per_page = body.get('page', 1), body.get('per_page', 500)
+        items = [item for item in properties if updated_after is None or item['updated_at'] > updated_after]
+        chunk = items[(page - 1) * per_page: page * per_page]
+        next_page = page + 1 if page * per_page < len(items) else None
+        return web.json_response({'items': chunk, 'nextPage': next_page})
+
+    @routes.post('/calendar_slots')
+    async def calendar_slots(request: web.Request) -> web.Response:
+        await delay()
+        body = await request.json()
+        start = datetime.fromtimestamp(body['from_ts'] / 1000, tz=timezone.utc).replace(minute=0, second=0)
+        slots = []
+        for number, hour in enumerate(range(1, 40, 3)):
+            slot_start = start + timedelta(hours=hour)
+            agent_id, agent_name = _AGENTS[number % len(_AGENTS)]
+            slots.append({
+                'agent_id': agent_id,
+                'agent_name': agent_name,
+                'start': slot_start.isoformat(),
+                'end': (slot_start + timedelta(minutes=30)).isoformat(),
+            })
+        return web.json_response(slots)
+
+    @routes.post('/calendar')
+    async def calendar(request: web.Request) -> web.Response:
+        await delay()
+        body = await request.json()
+        _LOGGER.info(f'Appointment created in session {request.headers.get("X-Session-Id")}: {body}')
+        return web.json_response({'status': 'ok'})
+
+    app = web.Application()
+    app.add_routes(routes)
+    return app
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    port = int(argv[1]) if len(argv) > 1 else 8081
+    latency_ms = float(argv[2]) if len(argv) > 2 else 0.0
+    web.run_app(create_app(latency=latency_ms / 1000), port=port)
+
+#####################################################################################################
@@ -1,9 +1,12 @@
 from app import App
-from api.routes import demo, ws, agency, conversation
+from api.routes import demo, ws, agency, analytics, appointment, conversation, metrics
 
 
 def setup_routes(app: App) -> None:
     app.include_router(demo.router)
     app.include_router(agency.router)
     app.include_router(conversation.router)
+    app.include_router(appointment.router)
+    app.include_router(analytics.router)
     app.include_router(ws.router)
+    app.include_router(metrics.router)
@@ -1,12 +1,18 @@
 #####################################################################################################
 from typing import Final
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from app import App
+from app_types.exceptions import InvalidCursor
+from dependencies.common import get_app
 from dependencies.services_deps import get_agency_service
 from schema.agency import (
     AgencyCreate,
     AgencyUpdate,
     AgencyOut,
+    AgencyPageOut,
+    PromptSizeReportOut,
 )
 from services.agency import AgencyService
 
@@ -16,18 +22,31 @@ router: Final = APIRouter(tags=["Agency"], prefix="/api/agency")
 
 #####################################################################################################
 
-@router.get("/", response_model=list[AgencyOut])
+@router.get("/", response_model=AgencyPageOut)
 async def get_agency_list(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    include_settings: bool = False,
     agency_service: AgencyService = Depends(get_agency_service),
-) -> list[AgencyOut]:
-    # TODO: add pagination. Ask frontend what kind of pagination need
+) -> AgencyPageOut:
     try:
-        return await agency_service.get_agency_list()
+        return await agency_service.get_agency_list(limit, cursor, include_settings)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e.detail}")
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to get agency list")
 
 #####################################################################################################
 
+@router.get("/prompt-size", response_model=PromptSizeReportOut)
+async def get_prompt_size_report(
+    app: App = Depends(get_app),
+    agency_service: AgencyService = Depends(get_agency_service),
+) -> PromptSizeReportOut:
+    return await agency_service.get_prompt_size_report(app.app_settings.prompt_tokens_warning_threshold)
+
+#####################################################################################################
+
 @router.get("/{agency_id}", response_model=AgencyOut)
 async def get_agency(
     agency_id: str,
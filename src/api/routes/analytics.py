@@ -0,0 +1,45 @@
+#####################################################################################################
+from datetime import date, datetime, timedelta, timezone
+from typing import Final
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import UUID4
+
+from dependencies.services_deps import get_analytics_service
+from schema.analytics import AgencyAnalyticsOut, AnalyticsBackfillOut
+from services.analytics import AnalyticsService
+
+#####################################################################################################
+
+router: Final = APIRouter(tags=["Analytics"], prefix="/api/analytics")
+
+#####################################################################################################
+
+@router.get("/agency/{agency_id}", response_model=AgencyAnalyticsOut)
+async def get_agency_analytics(
+    agency_id: UUID4,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+) -> AgencyAnalyticsOut:
+    """Daily rollups and their total, last 30 UTC days by default. Both dates are inclusive."""
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+    return await analytics_service.get_agency_analytics(str(agency_id), date_from, date_to)
+
+#####################################################################################################
+
+@router.post("/backfill", response_model=AnalyticsBackfillOut)
+async def backfill_analytics(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
+) -> AnalyticsBackfillOut:
+    """Rebuilds rollups of the days from conversations. Large histories are best done a month at a time."""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from is after date_to")
+    return await analytics_service.backfill(date_from, date_to)
+
+#####################################################################################################
@@ -0,0 +1,34 @@
+#####################################################################################################
+from typing import Final
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from dependencies.services_deps import get_appointment_outbox_service
+from schema.appointment import OutboxEntryOut, OutboxStatusOut
+from services.appointment_outbox import AppointmentOutboxService
+
+#####################################################################################################
+
+router: Final = APIRouter(tags=["Appointment"], prefix="/api/appointment")
+
+#####################################################################################################
+
+@router.get("/outbox", response_model=OutboxStatusOut)
+async def get_outbox_status(
+    outbox_service: AppointmentOutboxService = Depends(get_appointment_outbox_service),
+) -> OutboxStatusOut:
+    return await outbox_service.get_status()
+
+#####################################################################################################
+
+@router.get("/outbox/{entry_id}", response_model=OutboxEntryOut)
+async def get_outbox_entry(
+    entry_id: int,
+    outbox_service: AppointmentOutboxService = Depends(get_appointment_outbox_service),
+) -> OutboxEntryOut:
+    entry = await outbox_service.get_entry(entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Outbox entry not found")
+    return entry
+
+#####################################################################################################
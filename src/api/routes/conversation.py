@@ -1,10 +1,36 @@
-from typing import Final
+from datetime import datetime
+from typing import Final, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import UUID4
+from sqlalchemy import Row
 
+from app_types.enums import ExportFormat
+from app_types.exceptions import InvalidCursor, InvalidSearchQuery
+from db.models.enums import ConversationPurpose
 from db.repositories.conversation import ConversationRepository
 from dependencies.common import conv_repository
-from schema.conversation import ConversationOut
+from dependencies.services_deps import (
+    get_conversation_detail_cache,
+    get_conversation_export_service,
+    get_conversation_search_service,
+    get_transcript_storage_service,
+)
+from schema.conversation import (
+    ConversationListItemOut,
+    ConversationOut,
+    ConversationPageOut,
+    ConversationSearchPageOut,
+    TranscriptPackReportOut,
+)
+from schema.lead import LeadOut
+from services.conversation_detail import ConversationDetailCache
+from services.conversation_export import ENCODERS, ConversationExportService
+from services.conversation_search import ConversationSearchService
+from services.transcript_storage import TranscriptStorageService
+from utils.http_cache import etag_matches
+from utils.pagination import decode_cursor, encode_cursor
 
 
 #####################################################################################################
@@ -15,24 +41,160 @@ router: Final = APIRouter(tags=["Conversation"], prefix="/api/conversation")
 
 @router.get("/")
 async def get_conversation_list(
-    limit: int = 20,
-    offset: int = 0,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    purpose: ConversationPurpose | None = None,
+    lead_created: bool | None = None,
+    started_from: datetime | None = None,
+    started_to: datetime | None = None,
+    include_transcript: bool = False,
     repository: ConversationRepository = Depends(conv_repository),
-) -> list[ConversationOut]:
-    conversations = await repository.get_list(limit, offset)
-    return [ConversationOut.model_validate(conversation) for conversation in conversations]
+) -> ConversationPageOut:
+    """Newest conversations first. next_cursor is passed as cursor to get the following page."""
+    try:
+        after = decode_cursor(cursor, datetime, int) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e.detail}")
+    rows = await repository.get_page(
+        limit + 1,
+        after=after,
+        purpose=purpose,
+        lead_created=lead_created,
+        started_from=started_from,
+        started_to=started_to,
+        include_transcript=include_transcript,
+    )
+    items = [_list_item(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1].started_at, items[-1].id)
+    return ConversationPageOut(items=items, next_cursor=next_cursor)
+
+def _list_item(row: Row) -> ConversationListItemOut:
+    lead = None
+    if row.lead_id is not None:
+        lead = LeadOut(id=row.lead_id, name=row.lead_name, email=row.lead_email, phone=row.lead_phone)
+    return ConversationListItemOut(
+        id=row.id,
+        duration=row.duration,
+        started_at=row.started_at,
+        topic=row.topic,
+        purpose=row.purpose,
+        lead_created=row.lead_created,
+        tool_calls=row.tool_calls,
+        lead=lead,
+        agency_id=row.agency_id,
+        transcript=row.transcript if 'transcript' in row._fields else None,
+    )
+
+#####################################################################################################
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_conversations(
+    request: Request,
+    format: ExportFormat = ExportFormat.NDJSON,
+    started_from: datetime | None = None,
+    started_to: datetime | None = None,
+    agency_id: UUID4 | None = None,
+    purpose: ConversationPurpose | None = None,
+    export_service: ConversationExportService = Depends(get_conversation_export_service),
+) -> StreamingResponse:
+    """
+    All matching conversations with transcripts and leads, oldest first. The body is gzipped
+    when the client accepts it (e.g. curl --compressed).
+    """
+    compress = 'gzip' in request.headers.get('accept-encoding', '')
+    headers = {
+        'Content-Disposition': f'attachment; filename="conversations.{format.value}"',
+        'Vary': 'Accept-Encoding',
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    chunks = export_service.export(
+        format,
+        compress=compress,
+        started_from=started_from,
+        started_to=started_to,
+        agency_id=str(agency_id) if agency_id else None,
+        purpose=purpose,
+    )
+    return StreamingResponse(chunks, media_type=ENCODERS[format].media_type, headers=headers)
+
+#####################################################################################################
+
+@router.get("/search", response_model=ConversationSearchPageOut)
+async def search_conversations(
+    q: str = Query(min_length=1, max_length=200),
+    role: Literal['user', 'assistant'] | None = None,
+    agency_id: UUID4 | None = None,
+    started_from: datetime | None = None,
+    started_to: datetime | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    search_service: ConversationSearchService = Depends(get_conversation_search_service),
+) -> ConversationSearchPageOut:
+    """
+    Newest conversations whose transcript matches q. All words must match, "quoted words"
+    are a phrase, word* is a prefix and -word excludes. role limits matching to what the
+    user or the assistant said.
+    """
+    try:
+        return await search_service.search(
+            q,
+            limit=limit,
+            cursor=cursor,
+            role=role,
+            agency_id=str(agency_id) if agency_id else None,
+            started_from=started_from,
+            started_to=started_to,
+        )
+    except InvalidSearchQuery as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {e.detail}")
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e.detail}")
 
 #####################################################################################################
 
-@router.get("/{conversation_id}")
+@router.post("/search/backfill")
+async def backfill_conversation_search(
+    search_service: ConversationSearchService = Depends(get_conversation_search_service),
+) -> dict[str, int]:
+    """Indexes conversations stored before the search existed."""
+    return {"indexed": await search_service.backfill()}
+
+#####################################################################################################
+
+@router.post("/transcripts/pack")
+async def pack_transcripts(
+    transcript_storage: TranscriptStorageService = Depends(get_transcript_storage_service),
+) -> TranscriptPackReportOut:
+    """Re-encodes plain JSON transcripts of older conversations into the packed format."""
+    return await transcript_storage.pack_existing()
+
+#####################################################################################################
+
+@router.get("/{conversation_id}", response_model=ConversationOut)
 async def get_conversation(
     conversation_id: int,
-    repository: ConversationRepository = Depends(conv_repository),
-) -> ConversationOut:
-    conversation = await repository.get_by_id(conversation_id)
-    if not conversation:
+    request: Request,
+    started_at: datetime | None = None,
+    detail_cache: ConversationDetailCache = Depends(get_conversation_detail_cache),
+) -> Response:
+    """
+    started_at of the list item makes the lookup touch a single monthly partition. Responses
+    carry an ETag, If-None-Match with it gets 304, from the process cache without the database.
+    """
+    detail = await detail_cache.get(conversation_id, started_at)
+    if detail is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return ConversationOut.model_validate(conversation)
+    headers = {
+        "ETag": detail.etag,
+        "Cache-Control": f"private, max-age={request.app.app_settings.conversation_detail_max_age}",
+    }
+    if etag_matches(request.headers.get("if-none-match"), detail.etag):
+        detail_cache.not_modified(detail)
+        return Response(status_code=304, headers=headers)
+    return Response(content=detail.body, media_type="application/json", headers=headers)
 
 #####################################################################################################
 
@@ -1,10 +1,15 @@
 #####################################################################################################
 
+from asyncio import to_thread
+from pathlib import Path
 from typing import Final
 
-from fastapi import APIRouter, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 
-from configs.constants import BASE_DIR
+from app_types.exceptions import PromptTemplateError
+from dependencies.services_deps import get_prompt_service
+from services.prompts import PromptService
+from utils.prompt import compile_prompt
 
 
 #####################################################################################################
@@ -16,19 +21,22 @@ router: Final = APIRouter(tags=['Demo'], prefix='/api/demo')
 #####################################################################################################
 
 @router.get("/get-demo-instructions")
-async def get_instructions() -> dict[str, str]:
-    instructions_filepath = BASE_DIR / 'src' / 'prompts' / 'dev_instructions.txt'
-    assistant_instructions = instructions_filepath.read_text()
-    return {'instructions': assistant_instructions}
+async def get_instructions(prompt_service: PromptService = Depends(get_prompt_service)) -> dict[str, str]:
+    return {'instructions': prompt_service.builder.dev_instructions_source}
 
 #####################################################################################################
 
-@router.post("/update-prompt")
-async def update_prompt(prompt_data: dict):
+@router.post("/update-prompt", status_code=204)
+async def update_prompt(prompt_data: dict, prompt_service: PromptService = Depends(get_prompt_service)):
     try:
-        instructions_filepath = BASE_DIR / 'src' / 'prompts' / 'dev_instructions.txt'
-        with open(instructions_filepath, 'w') as f:
-            f.write(prompt_data["prompt"])
-        return Response(status_code=status.HTTP_204_NO_CONTENT)
+        compile_prompt(prompt_data["prompt"])
+    except PromptTemplateError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid prompt: {e.detail}")
+    try:
+        # The event loop carries live audio, the file is written in a thread
+        await to_thread(Path.write_text, prompt_service.builder.dev_instructions_path, prompt_data["prompt"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    # Next calls use the new prompt right away instead of after the next reload check
+    prompt_service.reload()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
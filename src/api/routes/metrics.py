@@ -0,0 +1,19 @@
+#####################################################################################################
+from typing import Final
+
+from fastapi import APIRouter, Response
+
+from utils.metrics import PROMETHEUS_CONTENT_TYPE, render_text
+
+#####################################################################################################
+
+router: Final = APIRouter(tags=["Metrics"])
+
+#####################################################################################################
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """In-process metrics of this worker in the Prometheus text format."""
+    return Response(content=render_text(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+#####################################################################################################
@@ -2,16 +2,20 @@
 
 import logging
 from typing import Any, Final
-from fastapi import WebSocket, APIRouter, WebSocketDisconnect, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from dependencies.common import get_ws_db
+from fastapi import WebSocket, APIRouter, WebSocketDisconnect
 from services.voice_service import VoiceAssistant
+from utils.metrics import REGISTRY, Gauge
+from utils.serialization import dumps_text
 
 #####################################################################################################
 
 router: Final = APIRouter(tags=['WS'], prefix='/api/ws')
 
+_WS_CONNECTIONS: Final = Gauge(
+    'voice_ws_connections_active',
+    'Client WebSocket connections, with or without a started session',
+)
+
 #####################################################################################################
 
 class ConnectionManager:
@@ -19,15 +23,19 @@ class ConnectionManager:
         self.active_connections: dict[WebSocket, VoiceAssistant] = {}
         self.logger = logging.getLogger(__name__)
     
-    async def connect_client(self, websocket: WebSocket, db_session) -> VoiceAssistant:
+    async def connect_client(self, websocket: WebSocket) -> VoiceAssistant:
         await websocket.accept()
         # Connect to voice service
         voice_assistant = VoiceAssistant(
             app_settings=websocket.app.app_settings,
             xano_service=websocket.app.xano_service,
+            command_registry=websocket.app.command_registry,
+            agency_config_cache=websocket.app.agency_config_cache,
+            prompt_builder=websocket.app.prompt_service.builder,
+            conversation_writer=websocket.app.conversation_writer,
+            caller_lookup=websocket.app.caller_lookup,
             client_ws=websocket,
             logger=websocket.app.logger,
-            db_session=db_session
         )
         self.active_connections[websocket] = voice_assistant
         self.logger.info('Client connected')
@@ -41,7 +49,7 @@ class ConnectionManager:
             self.logger.info('Client disconnected')
 
     async def send_to_client(self, websocket: WebSocket, data: Any):
-        await websocket.send_json(data) if isinstance(data, dict) else await websocket.send_bytes(data)
+        await websocket.send_text(dumps_text(data)) if isinstance(data, dict) else await websocket.send_bytes(data)
     
     async def send_to_voice_service(self, websocket: WebSocket, data: Any):
         if websocket not in self.active_connections:
@@ -53,15 +61,16 @@ class ConnectionManager:
 #####################################################################################################
 
 manager = ConnectionManager()
+REGISTRY.add_collect_hook(lambda: _WS_CONNECTIONS.set(len(manager.active_connections)))
 
 #####################################################################################################
 
 @router.websocket("")
-async def websocket_endpoint(websocket: WebSocket, db_session: AsyncSession = Depends(get_ws_db)) -> None:
+async def websocket_endpoint(websocket: WebSocket) -> None:
     voice_assistant = None
     manager.logger.info('New client connection attempt')
     try:
-        voice_assistant = await manager.connect_client(websocket, db_session)
+        voice_assistant = await manager.connect_client(websocket)
         await voice_assistant.run()
     except WebSocketDisconnect:
         manager.logger.info("Client closed connection")
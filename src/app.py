@@ -8,8 +8,25 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
 
+from commands.commands import CommandServices
+from commands.registry import CommandRegistry
 from configs.settings import AppSettings
 from db.connection.session import DatabaseManager
+from services.agency_cache import AgencyConfigCache
+from services.analytics import AnalyticsService
+from services.appointment_outbox import AppointmentOutboxService
+from services.caller_lookup import CallerLookupService
+from services.conversation_detail import ConversationDetailCache
+from services.conversation_export import ConversationExportService
+from services.conversation_partitions import ConversationPartitionService
+from services.conversation_search import ConversationSearchService
+from services.conversation_writer import ConversationWriter
+from services.func_tools import FUNCTION_DEFINITIONS
+from services.loop_monitor import LoopLagMonitor
+from services.prompts import PromptService
+from services.property_index import PropertyCatalog
+from services.trace_exporter import TraceExporter
+from services.transcript_storage import TranscriptStorageService
 from services.xano import XanoService
 from utils.aiohttp_utils import create_aiohttp_client
 
@@ -45,23 +62,74 @@ class App(FastAPI):
             allow_methods=["*"],
             allow_headers=["*"],
         )
+        self.loop_monitor: Final = LoopLagMonitor(app_settings, logger)
         self.aiohttp_client: Final = create_aiohttp_client()
+        self.trace_exporter: Final = TraceExporter(app_settings, self.aiohttp_client, logger)
         self.xano_service = XanoService(app_settings, self.aiohttp_client, logger)
+        self.prompt_service: Final = PromptService(app_settings, logger)
+        self.agency_config_cache: Final = AgencyConfigCache(app_settings, self.db_manager, logger)
+        self.property_catalog: Final = PropertyCatalog(app_settings, self.xano_service, self.db_manager, logger)
+        self.appointment_outbox: Final = AppointmentOutboxService(
+            app_settings, self.xano_service, self.db_manager, logger,
+        )
+        self.conversation_detail: Final = ConversationDetailCache(app_settings, self.db_manager, logger)
+        self.conversation_export: Final = ConversationExportService(app_settings, self.db_manager, logger)
+        self.analytics: Final = AnalyticsService(self.db_manager, logger)
+        self.conversation_search: Final = ConversationSearchService(self.db_manager, logger)
+        self.transcript_storage: Final = TranscriptStorageService(self.db_manager, logger)
+        self.conversation_partitions: Final = ConversationPartitionService(app_settings, self.db_manager, logger)
+        self.caller_lookup: Final = CallerLookupService(app_settings, self.db_manager, logger)
+        self.conversation_writer: Final = ConversationWriter(app_settings, self.db_manager, logger)
+        self.command_registry: Final = CommandRegistry.from_definitions(
+            FUNCTION_DEFINITIONS,
+            services=CommandServices(
+                xano_service=self.xano_service,
+                property_catalog=self.property_catalog,
+                appointment_outbox=self.appointment_outbox,
+            ),
+            logger=logger,
+            dev_mode=app_settings.dev_mode,
+        )
 
 #####################################################################################################
 
 @asynccontextmanager
 async def lifespan(app: App):
+    # First to start and last to stop, blocking on startup and shutdown is reported as well
+    app.loop_monitor.start()
 
     async with app.db_manager.engine.begin() as conn:
-        from db.models import Base
+        from db.models import Base, add_missing_columns, create_missing_indexes
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+    # CREATE INDEX CONCURRENTLY can not run in a transaction
+    async with app.db_manager.engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level='AUTOCOMMIT')
+        await conn.run_sync(create_missing_indexes)
 
+    app.prompt_service.start()
+    await app.agency_config_cache.start()
+    app.property_catalog.start()
+    app.appointment_outbox.start()
+    # Partitions of the current month must exist before conversations are written
+    await app.conversation_partitions.start()
+    app.conversation_writer.start()
+    app.trace_exporter.start()
     yield
     # Cleanup on shutdown
     # TODO FOR DEVELOPMENT PURPOSES. DELETE THIS CODE!!!
     # async with app.db_manager.engine.begin() as conn:
     #     await conn.run_sync(Base.metadata.drop_all)
-        
+
+    # Queued conversations are written before the pool is closed
+    await app.conversation_writer.stop()
+    # After the writer, persistence spans of the last calls end there
+    await app.trace_exporter.stop()
+    await app.conversation_partitions.stop()
+    await app.appointment_outbox.stop()
+    await app.property_catalog.stop()
+    await app.agency_config_cache.stop()
+    await app.prompt_service.stop()
     await app.db_manager.close()
     await app.aiohttp_client.close()
+    await app.loop_monitor.stop()
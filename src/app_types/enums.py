@@ -36,3 +36,7 @@ class SampleRate(IntEnum):
     SAMPLE_RATE_24000 = 24000
     SAMPLE_RATE_32000 = 32000
     SAMPLE_RATE_48000 = 48000
+
+class ExportFormat(StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
@@ -15,3 +15,50 @@ class AgencyNotFound(Exception):
 
 
 
+
+
+class ToolArgumentsError(Exception):
+    def __init__(self, function_name: str, errors: list[dict[str, str]]) -> None:
+        self.function_name = function_name
+        self.errors = errors
+
+    def to_llm_response(self) -> dict:
+        """Compact description of the problem, so the LLM can fix the arguments in one turn."""
+        return {
+            "error": "invalid_arguments",
+            "function": self.function_name,
+            "problems": self.errors,
+            "hint": "Fix the listed fields and call the function again.",
+        }
+
+    def __str__(self) -> str:
+        return f"Invalid arguments for {self.function_name}: {self.errors}"
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(function_name={self.function_name}, errors={self.errors})"
+
+
+
+class PromptTemplateError(ValueError):
+    """Prompt template can not be compiled or uses unknown placeholders."""
+
+    def __init__(self, detail: str) -> None:
+        super().__init__(detail)
+        self.detail = detail
+
+
+
+class InvalidCursor(ValueError):
+    """Pagination cursor is malformed or belongs to another listing."""
+
+    def __init__(self, detail: str) -> None:
+        super().__init__(detail)
+        self.detail = detail
+
+
+class InvalidSearchQuery(ValueError):
+    """Search query has nothing to search for."""
+
+    def __init__(self, detail: str) -> None:
+        super().__init__(detail)
+        self.detail = detail
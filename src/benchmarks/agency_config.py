@@ -0,0 +1,72 @@
+#####################################################################################################
+"""
+Micro-benchmark of the agency configuration on call start.
+
+Compares the uncached path (validation of the agency row, instructions formatting, context)
+with rendering of a cached prepared configuration. The SELECT of the uncached path is not
+included, so the real saving is larger by one database round trip.
+
+Usage (from src/):
+    uv run python -m benchmarks.agency_config [iterations]
+"""
+import uuid
+from sys import argv
+from timeit import timeit
+from types import SimpleNamespace
+
+from schema.agency import (
+    Agency,
+    AgencySettings,
+    DeepgramAgentSettings,
+    ListenSettings,
+    SpeakSettings,
+)
+from services.agency import AgencyService
+
+#####################################################################################################
+
+def _agency_row() -> SimpleNamespace:
+    service = AgencyService(session=None)
+    settings = AgencySettings(
+        audio=AgencyService._DEFAULT_AUDIO_SETTINGS,
+        agent=DeepgramAgentSettings(
+            listen=ListenSettings(),
+            think=service._create_think_settings(view_task=True, valuation_task=True),
+            speak=SpeakSettings(provider='eleven_labs', voice_id='SB13jgWjPxi4e4JoTT1H'),
+        ),
+        filler_phrases=['One moment please.'],
+    )
+    # Same shape as the ORM object, settings come from a JSON column
+    return SimpleNamespace(
+        id=str(uuid.uuid4()),
+        assistant_name='Margaret',
+        agency_name='Pacitti Jones',
+        agency_location='Glasgow',
+        agency_timezone='Europe/London',
+        agency_description='Estate agency',
+        settings=settings.model_dump(mode='json'),
+    )
+
+#####################################################################################################
+
+def run(iterations: int) -> None:
+    row = _agency_row()
+
+    def uncached() -> None:
+        agency = Agency.model_validate(row, from_attributes=True)
+        AgencyService.render_configuration(AgencyService.prepare_configuration(agency))
+
+    prepared = AgencyService.prepare_configuration(Agency.model_validate(row, from_attributes=True))
+
+    def cached() -> None:
+        AgencyService.render_configuration(prepared)
+
+    old = timeit(uncached, number=iterations) / iterations * 1e6
+    new = timeit(cached, number=iterations) / iterations * 1e6
+    print(f'{"uncached us":>14}{"cached us":>14}{"speedup":>10}')
+    print(f'{old:>14.2f}{new:>14.2f}{old / new:>9.1f}x')
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    run(int(argv[1]) if len(argv) > 1 else 5_000)
@@ -0,0 +1,122 @@
+#####################################################################################################
+"""
+Benchmark of the conversation export.
+
+Compares materializing every conversation as ConversationOut and serializing the list (what a
+client gets by paging through the whole table) with the streaming encoders fed in batches like
+the server-side cursor does. Rows are synthetic, the database is not involved. Every case runs
+in a fresh process, so peak RSS belongs to that case only.
+
+Usage (from src/):
+    uv run python -m benchmarks.conversation_export [rows]
+"""
+import asyncio
+import resource
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from multiprocessing import get_context
+from sys import argv
+from time import perf_counter
+from typing import Iterator
+
+from pydantic import TypeAdapter
+
+from app_types.enums import ExportFormat
+from schema.conversation import ConversationOut
+from services.conversation_export import CSV_COLUMNS, ENCODERS, encode_stream
+
+#####################################################################################################
+
+_BATCH_SIZE = 500
+
+_Row = namedtuple('_Row', CSV_COLUMNS)
+
+#####################################################################################################
+
+def _rows(count: int) -> Iterator[_Row]:
+    started_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    transcript = [
+        {'role': 'user' if turn % 2 else 'assistant', 'content': f'Turn {turn} about the flat on Byres Road, is it still available?'}
+        for turn in range(24)
+    ]
+    for id in range(1, count + 1):
+        yield _Row(
+            id=id,
+            agency_id=str(uuid.uuid4()),
+            started_at=started_at + timedelta(minutes=id),
+            duration=180,
+            topic='Viewing request',
+            purpose='viewing',
+            lead_created=True,
+            tool_calls=['find_property', 'create_appointment'],
+            lead_id=str(uuid.uuid4()),
+            lead_name='John Smith',
+            lead_email='john@example.com',
+            lead_phone='+447700900123',
+            transcript=transcript,
+        )
+
+#####################################################################################################
+
+def _materialized(count: int) -> int:
+    conversations = [
+        ConversationOut(
+            **row._asdict(),
+            lead={'id': row.lead_id, 'name': row.lead_name, 'email': row.lead_email, 'phone': row.lead_phone},
+        )
+        for row in _rows(count)
+    ]
+    return len(TypeAdapter(list[ConversationOut]).dump_json(conversations))
+
+def _streamed(count: int, export_format: ExportFormat, compress: bool) -> int:
+    async def batches():
+        batch = []
+        for row in _rows(count):
+            batch.append(row)
+            if len(batch) == _BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def consume() -> int:
+        # The response writes chunks to the socket, only their size is kept here
+        return sum([len(chunk) async for chunk in encode_stream(batches(), ENCODERS[export_format], compress)])
+
+    return asyncio.run(consume())
+
+#####################################################################################################
+
+_CASES = {
+    'materialized json': lambda count: _materialized(count),
+    'ndjson': lambda count: _streamed(count, ExportFormat.NDJSON, False),
+    'ndjson gzip': lambda count: _streamed(count, ExportFormat.NDJSON, True),
+    'csv': lambda count: _streamed(count, ExportFormat.CSV, False),
+    'csv gzip': lambda count: _streamed(count, ExportFormat.CSV, True),
+}
+
+def _run_case(name: str, count: int, results) -> None:
+    started = perf_counter()
+    size = _CASES[name](count)
+    elapsed = perf_counter() - started
+    # ru_maxrss is in kilobytes on Linux
+    results.put((count / elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, size / 2**20))
+
+#####################################################################################################
+
+def run(count: int) -> None:
+    context = get_context('spawn')
+    print(f'{"case":<20}{"rows/s":>12}{"peak RSS MB":>14}{"output MB":>12}')
+    for name in _CASES:
+        results = context.Queue()
+        process = context.Process(target=_run_case, args=(name, count, results))
+        process.start()
+        rows_per_second, peak_rss, size = results.get()
+        process.join()
+        print(f'{name:<20}{rows_per_second:>12,.0f}{peak_rss:>14.1f}{size:>12.1f}')
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    run(int(argv[1]) if len(argv) > 1 else 50_000)
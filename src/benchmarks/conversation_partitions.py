@@ -0,0 +1,169 @@
+#####################################################################################################
+"""
+Benchmark of conversation list and detail queries on a plain and a partitioned table.
+
+Needs the database from .env. Loads synthetic conversations spread over two years (two
+million by default) into a scratch schema, once into the monthly partitioned table and once
+into a plain copy with the same indexes, then times the queries of the API on both and the
+removal of the oldest month. The scratch schema is dropped at the end.
+
+Usage (from src/):
+    uv run python -m benchmarks.conversation_partitions [rows]
+"""
+import asyncio
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from statistics import median
+from sys import argv
+from time import perf_counter
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from configs.settings import AppSettings
+from db.connection.engine import create_db_engine
+from db.models.conversation import Conversation
+from db.partitioning import add_months, create_partitions, drop_partitions_before, list_partitions, month_start
+
+#####################################################################################################
+
+_SCHEMA = 'bench_partitions'
+_PLAIN = 'conversations_plain'
+_MONTHS = 24
+_LOAD_CHUNK = 200_000
+_RUNS = 50
+_AGENCIES = 20
+
+#####################################################################################################
+
+def _agency_id(index: int) -> str:
+    return str(uuid.UUID(hashlib.md5(str(index).encode()).hexdigest()))
+
+async def _load(connection: AsyncConnection, rows: int, now: datetime) -> None:
+    await connection.execute(text(f'DROP SCHEMA IF EXISTS {_SCHEMA} CASCADE'))
+    await connection.execute(text(f'CREATE SCHEMA {_SCHEMA}'))
+    # Partition helpers use unqualified names, they resolve in the scratch schema
+    await connection.execute(text(f'SET search_path TO {_SCHEMA}, public'))
+    table = Conversation.__table__
+    await connection.run_sync(lambda sync_connection: table.create(sync_connection))
+    first = add_months(month_start(now), -_MONTHS)
+    await connection.run_sync(create_partitions, first, month_start(now))
+    await connection.commit()
+
+    # Ids grow with started_at as they do in production
+    insert = text(f"""
+        INSERT INTO conversations (id, duration, started_at, topic, purpose, lead_created, tool_calls, transcript, agency_id)
+        SELECT
+            g,
+            30 + g % 600,
+            CAST(:now AS timestamptz) - ((:rows - g)::float8 / :rows) * interval '{_MONTHS * 30} days',
+            'topic ' || g % 100,
+            (ARRAY['viewing', 'valuation', NULL])[1 + g % 3],
+            g % 7 = 0,
+            '["search_properties"]'::json,
+            '[{{"role": "user", "content": "hello"}}, {{"role": "assistant", "content": "hi"}}]'::json,
+            md5((g % {_AGENCIES})::text)::uuid
+        FROM generate_series(:start, :stop) AS g
+    """)
+    for start in range(1, rows + 1, _LOAD_CHUNK):
+        stop = min(start + _LOAD_CHUNK - 1, rows)
+        started = perf_counter()
+        await connection.execute(insert, {'start': start, 'stop': stop, 'rows': rows, 'now': now})
+        await connection.commit()
+        print(f'loaded {stop:,} rows ({perf_counter() - started:.1f}s)')
+
+    started = perf_counter()
+    await connection.execute(text(f'CREATE TABLE {_PLAIN} (LIKE conversations INCLUDING DEFAULTS)'))
+    await connection.execute(text(f'INSERT INTO {_PLAIN} SELECT * FROM conversations'))
+    await connection.execute(text(f'ALTER TABLE {_PLAIN} ADD PRIMARY KEY (id, started_at)'))
+    for columns in ('started_at, id', 'purpose, started_at, id', 'agency_id, started_at, id'):
+        await connection.execute(text(f'CREATE INDEX ON {_PLAIN} ({columns})'))
+    await connection.execute(text(f'CREATE INDEX ON {_PLAIN} (started_at, id) WHERE lead_created'))
+    await connection.execute(text('ANALYZE conversations'))
+    await connection.execute(text(f'ANALYZE {_PLAIN}'))
+    await connection.commit()
+    print(f'plain copy built ({perf_counter() - started:.1f}s)')
+
+#####################################################################################################
+
+async def _time(connection: AsyncConnection, statement: str, parameters: dict) -> float:
+    timings = []
+    for _ in range(_RUNS):
+        started = perf_counter()
+        (await connection.execute(text(statement), parameters)).all()
+        timings.append((perf_counter() - started) * 1000)
+    return median(timings)
+
+def _cases(detail_id: int, detail_started_at: datetime, month_ago: datetime) -> dict[str, tuple[str, dict]]:
+    return {
+        'latest page': (
+            'SELECT id, started_at, duration, purpose FROM {table} ORDER BY started_at DESC, id DESC LIMIT 20',
+            {},
+        ),
+        'agency, 30 days': (
+            'SELECT id, started_at, duration, purpose FROM {table} '
+            'WHERE agency_id = :agency_id AND started_at >= :started_from '
+            'ORDER BY started_at DESC, id DESC LIMIT 20',
+            {'agency_id': _agency_id(3), 'started_from': month_ago},
+        ),
+        'leads, 30 days': (
+            'SELECT id, started_at, duration, purpose FROM {table} '
+            'WHERE lead_created AND started_at >= :started_from '
+            'ORDER BY started_at DESC, id DESC LIMIT 20',
+            {'started_from': month_ago},
+        ),
+        'detail by id': (
+            'SELECT * FROM {table} WHERE id = :id',
+            {'id': detail_id},
+        ),
+        'detail by id, started_at': (
+            'SELECT * FROM {table} WHERE id = :id AND started_at = :started_at',
+            {'id': detail_id, 'started_at': detail_started_at},
+        ),
+    }
+
+async def _compare(connection: AsyncConnection, cases: dict[str, tuple[str, dict]]) -> None:
+    print(f'{"query":<28}{"plain ms":>12}{"partitioned ms":>16}')
+    for name, (statement, parameters) in cases.items():
+        plain_ms = await _time(connection, statement.format(table=_PLAIN), parameters)
+        partitioned_ms = await _time(connection, statement.format(table='conversations'), parameters)
+        print(f'{name:<28}{plain_ms:>12.2f}{partitioned_ms:>16.2f}')
+
+async def _compare_expiry(connection: AsyncConnection) -> None:
+    """Retention of the oldest month: a DELETE of its rows against dropping its partition."""
+    before = add_months((await connection.run_sync(list_partitions))[0], 1)
+    started = perf_counter()
+    deleted = (await connection.execute(text(f'DELETE FROM {_PLAIN} WHERE started_at < :before'), {'before': before})).rowcount
+    await connection.commit()
+    delete_ms = (perf_counter() - started) * 1000
+    started = perf_counter()
+    await connection.run_sync(drop_partitions_before, before)
+    await connection.commit()
+    drop_ms = (perf_counter() - started) * 1000
+    print(f'{f"expire {deleted:,} rows":<28}{delete_ms:>12.2f}{drop_ms:>16.2f}')
+
+async def run(rows: int) -> None:
+    load_dotenv()
+    engine = create_db_engine(AppSettings())
+    now = datetime.now(timezone.utc)
+    try:
+        async with engine.connect() as connection:
+            await _load(connection, rows, now)
+            # A conversation from the middle of the range, found by id alone and by id with started_at
+            detail_id = rows // 2
+            detail_started_at = (await connection.execute(
+                text('SELECT started_at FROM conversations WHERE id = :id'), {'id': detail_id},
+            )).scalar_one()
+            await _compare(connection, _cases(detail_id, detail_started_at, now - timedelta(days=30)))
+            await _compare_expiry(connection)
+            await connection.execute(text(f'DROP SCHEMA {_SCHEMA} CASCADE'))
+            await connection.commit()
+    finally:
+        await engine.dispose()
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    asyncio.run(run(int(argv[1]) if len(argv) > 1 else 2_000_000))
@@ -0,0 +1,182 @@
+#####################################################################################################
+"""
+Throughput of JSON serialization of API responses and WebSocket/tool payloads.
+
+API responses are an agency page with settings, a conversation page with transcripts and a
+conversation detail. Each is serialized the way FastAPI does without a response model
+(jsonable_encoder + json.dumps), the way an orjson response class does (the response model is
+dumped to Python first, then orjson) and the way the routes do now (response model straight
+to bytes by pydantic-core). Payloads to the client and Deepgram compare the indented stdlib
+JSON of the Deepgram SDK with utils.serialization. Every case checks that all encoders give
+the same document, so datetime, UUID and enum values are written alike.
+
+Usage (from src/):
+    uv run python -m benchmarks.json_serialization [seconds per case]
+"""
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from sys import argv
+from time import perf_counter
+from typing import Any, Callable
+
+import orjson
+from deepgram import FunctionCallResponse
+from deepgram.clients.agent.v1.websocket.response import ConversationTextResponse
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+
+from app_types.enums import AudioContainer, AudioEncoding, SampleRate
+from db.models.enums import ConversationPurpose
+from schema.agency import AgencyPageOut
+from schema.conversation import ConversationOut, ConversationPageOut
+from services.agency import AgencyService
+from utils.serialization import dumps, dumps_text
+
+#####################################################################################################
+
+_PAGE_SIZE = 20
+_TURNS = 24
+
+#####################################################################################################
+
+def _transcript() -> list[dict[str, Any]]:
+    return [
+        {
+            'type': 'ConversationText',
+            'role': 'user' if turn % 2 else 'assistant',
+            'content': f'Turn {turn} about the two bedroom flat on Byres Road, is it still available?',
+        }
+        for turn in range(_TURNS)
+    ]
+
+def _lead() -> dict[str, Any]:
+    return {'id': str(uuid.uuid4()), 'name': 'John Smith', 'email': 'john@example.com', 'phone': '+447700900123'}
+
+def _agency_page() -> AgencyPageOut:
+    think = AgencyService(session=None)._create_think_settings(view_task=True, valuation_task=True)
+    settings = {
+        'agent': {
+            'listen': {'model': 'nova-3', 'keyterms': ['Byres Road', 'Hyndland']},
+            'speak': {'provider': 'eleven_labs', 'voice_id': 'SB13jgWjPxi4e4JoTT1H'},
+        },
+        'filler_phrases': ['One moment please.', 'Let me check that for you.'],
+        'retention_months': 12,
+    }
+    items = [
+        {
+            'id': uuid.uuid4(),
+            'assistant_name': 'Margaret',
+            'agency_name': f'Agency {number}',
+            'agency_location': 'Glasgow',
+            'agency_timezone': 'Europe/London',
+            'agency_description': think.instructions[:2_000],
+            'settings': settings,
+        }
+        for number in range(_PAGE_SIZE)
+    ]
+    return AgencyPageOut.model_validate({'items': items, 'next_cursor': 'eyJpZCI6IDIwfQ'})
+
+def _conversation(id: int) -> dict[str, Any]:
+    return {
+        'id': id,
+        'duration': 180,
+        'started_at': datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=id),
+        'topic': 'Viewing request',
+        'purpose': ConversationPurpose.VIEWING if id % 2 else ConversationPurpose.VALUATION,
+        'lead_created': True,
+        'tool_calls': ['find_property', 'get_calendar_slots', 'create_appointment'],
+        'transcript': _transcript(),
+        'lead': _lead(),
+        'agency_id': str(uuid.uuid4()),
+    }
+
+def _conversation_page() -> ConversationPageOut:
+    items = [_conversation(id) for id in range(1, _PAGE_SIZE + 1)]
+    return ConversationPageOut.model_validate({'items': items, 'next_cursor': 'WyIyMDI1LTAxLTAxIiwgMjBd'})
+
+def _tool_result() -> dict[str, Any]:
+    # Shape of a property search result with settings enums, as commands return it
+    return {
+        'properties': [
+            {
+                'id': uuid.uuid4(),
+                'address': f'{number} Byres Road, Glasgow G12 8TD',
+                'price': 185_000 + number * 1_000,
+                'bedrooms': 2,
+                'available_from': datetime(2025, 3, 1, tzinfo=timezone.utc),
+                'purpose': ConversationPurpose.VIEWING,
+                'description': 'Bright two bedroom flat close to the university and the subway.',
+            }
+            for number in range(10)
+        ],
+        'audio': {'encoding': AudioEncoding.LINEAR16, 'sample_rate': SampleRate.SAMPLE_RATE_16000, 'container': AudioContainer.NONE},
+    }
+
+#####################################################################################################
+
+def _throughput(encode: Callable[[], bytes | str], seconds: float) -> float:
+    calls = 0
+    deadline = perf_counter() + seconds
+    started = perf_counter()
+    while perf_counter() < deadline:
+        for _ in range(20):
+            encode()
+        calls += 20
+    return calls / (perf_counter() - started)
+
+def _api_encoders(model: BaseModel) -> dict[str, Callable[[], bytes | str]]:
+    adapter = TypeAdapter(type(model))
+    return {
+        'jsonable_encoder': lambda: json.dumps(jsonable_encoder(model), ensure_ascii=False, separators=(',', ':')).encode(),
+        'orjson response': lambda: orjson.dumps(model.model_dump(mode='json')),
+        'pydantic dump_json': lambda: adapter.dump_json(model),
+    }
+
+def _stdlib_json(obj: Any) -> str:
+    return json.dumps(obj, indent=4, ensure_ascii=False, default=str)
+
+def _cases() -> dict[str, dict[str, Callable[[], bytes | str]]]:
+    detail = ConversationOut.model_validate(_conversation(1))
+    tool_result = _tool_result()
+    function_response = FunctionCallResponse(type='FunctionCallResponse', function_call_id='call_1', output=dumps_text(tool_result))
+    conversation_text = ConversationTextResponse(type='ConversationText', role='assistant', content=_transcript()[0]['content'])
+    return {
+        'agency page': _api_encoders(_agency_page()),
+        'conversation page': _api_encoders(_conversation_page()),
+        'conversation detail': _api_encoders(detail),
+        'tool result': {
+            'json indent=4': lambda: _stdlib_json(tool_result),
+            'serialization': lambda: dumps(tool_result),
+        },
+        'function response': {
+            'sdk to_json': lambda: function_response.to_json(ensure_ascii=False),
+            'serialization': lambda: dumps_text(function_response.to_dict()),
+        },
+        'conversation text': {
+            'sdk to_json': lambda: conversation_text.to_json(indent=4),
+            'serialization': lambda: dumps_text(conversation_text.to_dict()),
+        },
+    }
+
+#####################################################################################################
+
+def run(seconds: float) -> None:
+    print(f'{"payload":<22}{"encoder":<22}{"bytes":>9}{"ops/s":>12}{"speedup":>10}')
+    for payload, encoders in _cases().items():
+        documents = {name: encode() for name, encode in encoders.items()}
+        parsed = [orjson.loads(document) for document in documents.values()]
+        # Tool results carry UUID and datetime, which the stdlib baseline writes with str()
+        if payload != 'tool result':
+            assert all(document == parsed[0] for document in parsed), f'{payload}: encoders disagree'
+        baseline = None
+        for name, encode in encoders.items():
+            ops = _throughput(encode, seconds)
+            baseline = baseline or ops
+            size = len(documents[name].encode() if isinstance(documents[name], str) else documents[name])
+            print(f'{payload:<22}{name:<22}{size:>9}{ops:>12.0f}{ops / baseline:>9.1f}x')
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    run(float(argv[1]) if len(argv) > 1 else 1.0)
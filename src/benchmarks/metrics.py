@@ -0,0 +1,65 @@
+#####################################################################################################
+"""
+Micro-benchmark of metrics recording and of a /metrics scrape.
+
+Compares the per-frame cost of counting audio bytes on a child bound once with looking it up
+by labels() on every frame, and measures render_text() of all metrics of the app with a
+realistic number of agencies, functions and Xano endpoints.
+
+Usage (from src/):
+    uv run python -m benchmarks.metrics [iterations]
+"""
+from logging import getLogger
+from sys import argv
+from timeit import timeit
+
+import api.routes  # noqa: F401 registers the metrics of all services
+from commands.commands import CommandServices
+from commands.registry import CommandRegistry
+from services.func_tools import FUNCTION_DEFINITIONS
+from utils.metrics import REGISTRY, render_text
+
+#####################################################################################################
+
+_AGENCIES = 200
+
+#####################################################################################################
+
+def _populate() -> None:
+    for agency in range(_AGENCIES):
+        REGISTRY.get('voice_sessions_active').labels(f'agency-{agency}').inc()
+        REGISTRY.get('voice_sessions_started_total').labels(f'agency-{agency}').inc()
+    # Function labels as in production, where the registry is built from the same definitions
+    registry = CommandRegistry.from_definitions(
+        FUNCTION_DEFINITIONS,
+        services=CommandServices(xano_service=None),
+        logger=getLogger(),
+    )
+    for function in registry.function_names:
+        REGISTRY.get('voice_tool_call_duration_seconds').labels(function).observe(0.2)
+        REGISTRY.get('voice_tool_calls_total').labels(function, 'ok').inc()
+    for endpoint in ('calendar_slots', 'property_search_address', 'calendar', 'property_sync'):
+        REGISTRY.get('voice_xano_request_duration_seconds').labels(endpoint).observe(0.1)
+        REGISTRY.get('voice_xano_responses_total').labels(endpoint, '200').inc()
+
+def run(iterations: int) -> None:
+    audio_bytes = REGISTRY.get('voice_audio_bytes_total')
+    bound = audio_bytes.labels('inbound')
+    frame = 1_920
+
+    looked_up = timeit(lambda: audio_bytes.labels('inbound').inc(frame), number=iterations) / iterations * 1e9
+    prebound = timeit(lambda: bound.inc(frame), number=iterations) / iterations * 1e9
+    print(f'{"labels() ns":>14}{"bound ns":>14}{"speedup":>10}')
+    print(f'{looked_up:>14.1f}{prebound:>14.1f}{looked_up / prebound:>9.1f}x')
+
+    _populate()
+    scrapes = max(iterations // 10_000, 10)
+    body = render_text()
+    scrape = timeit(render_text, number=scrapes) / scrapes * 1e3
+    print(f'\n{"metrics":>10}{"lines":>10}{"bytes":>10}{"scrape ms":>12}')
+    print(f'{len(REGISTRY.metrics()):>10}{body.count(chr(10)):>10}{len(body):>10}{scrape:>12.2f}')
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    run(int(argv[1]) if len(argv) > 1 else 1_000_000)
@@ -0,0 +1,76 @@
+#####################################################################################################
+"""
+Micro-benchmark of the settings message built on call start.
+
+Compares the previous per-call work (options tree or rendered settings dict serialized by the
+SDK as indented JSON) with rendering of a compiled settings frame.
+
+Usage (from src/):
+    uv run python -m benchmarks.settings_frame [iterations]
+"""
+import json
+from datetime import datetime
+from sys import argv
+from timeit import timeit
+
+from deepgram import Agent, Audio, Context, Input, Output, Provider, SettingsConfigurationOptions, Speak, Think
+
+from benchmarks.agency_config import _agency_row
+from schema.agency import Agency
+from services.agency import AgencyService, format_now
+from services.func_tools import FUNCTION_DEFINITIONS
+from utils.settings_frame import SettingsFrameTemplate, placeholder
+
+#####################################################################################################
+
+_INSTRUCTIONS = 'You are a helpful real estate assistant. Current time is {now}. ' * 40
+
+#####################################################################################################
+
+def _dev_options(instructions: str) -> SettingsConfigurationOptions:
+    return SettingsConfigurationOptions(
+        agent=Agent(
+            think=Think(
+                provider=Provider(type='open_ai'),
+                model='gpt-4o-mini',
+                instructions=instructions,
+                functions=FUNCTION_DEFINITIONS,
+            ),
+            speak=Speak(provider='eleven_labs', voice_id='SB13jgWjPxi4e4JoTT1H'),
+        ),
+        audio=Audio(
+            input=Input(encoding='linear32', sample_rate=48000),
+            output=Output(encoding='linear16', sample_rate=24000, container='none'),
+        ),
+        context=Context(messages=[{'role': 'assistant', 'content': 'Welcome!'}], replay=True),
+    )
+
+#####################################################################################################
+
+def run(iterations: int) -> None:
+    dev_frame = SettingsFrameTemplate.compile(_dev_options(_INSTRUCTIONS.format(now=placeholder('now'))).to_dict())
+    prepared = AgencyService.prepare_configuration(Agency.model_validate(_agency_row(), from_attributes=True))
+    agency_frame = SettingsFrameTemplate.compile(prepared.settings)
+
+    cases = {
+        'dev mode': (
+            lambda: str(_dev_options(_INSTRUCTIONS.format(now=datetime.now()))),
+            lambda: dev_frame.render(now=datetime.now()),
+        ),
+        'agency': (
+            # Indented JSON like str(options) of the SDK. SettingsConfigurationOptions.from_dict
+            # is left out, it can not represent JSON schema parameters of the functions
+            lambda: json.dumps(AgencyService.render_configuration(prepared).settings, indent=4, default=str),
+            lambda: agency_frame.render(now=format_now()),
+        ),
+    }
+    print(f'{"path":<12}{"before us":>12}{"after us":>12}{"speedup":>10}')
+    for name, (before, after) in cases.items():
+        old = timeit(before, number=iterations) / iterations * 1e6
+        new = timeit(after, number=iterations) / iterations * 1e6
+        print(f'{name:<12}{old:>12.2f}{new:>12.2f}{old / new:>9.1f}x')
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    run(int(argv[1]) if len(argv) > 1 else 2_000)
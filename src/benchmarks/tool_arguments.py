@@ -0,0 +1,74 @@
+#####################################################################################################
+"""
+Micro-benchmark of the function call arguments decoding.
+
+Compares the old ast.literal_eval path with orjson + precompiled schema validation.
+
+Usage (from src/):
+    uv run python -m benchmarks.tool_arguments [iterations]
+"""
+import ast
+import json
+from logging import getLogger
+from sys import argv
+from timeit import timeit
+from typing import Final
+
+from commands.commands import CommandServices
+from commands.registry import CommandRegistry
+from services.func_tools import FUNCTION_DEFINITIONS
+
+#####################################################################################################
+
+_ARGUMENTS: Final = {
+    'searchForProperties': json.dumps({'search_address': '12 Hope Street, Glasgow'}),
+    'getFreeCalendarSlots': json.dumps({
+        'from_ts': '2025-05-12T10:00:00',
+        'prop_postcode': 'G2 6AB',
+        'event_type': 'Viewing',
+    }),
+    'createAppointment': json.dumps({
+        'start': '2025-05-12T10:00:00',
+        'end': '2025-05-12T10:30:00',
+        'name': 'John Smith',
+        'address': '12 Hope Street, Glasgow',
+        'email': 'john@example.com',
+        'phone': None,
+        'agent_id': '42',
+        'event_type': 'Viewing',
+        'property_id': 'P-1001',
+    }),
+}
+
+#####################################################################################################
+
+def _literal_eval_path(input_data: str) -> dict:
+    serialized_data = ast.literal_eval(input_data)
+    if isinstance(serialized_data, dict):
+        return serialized_data
+    raise ValueError("Input data is not a dictionary")
+
+#####################################################################################################
+
+def run(iterations: int) -> None:
+    registry = CommandRegistry.from_definitions(
+        FUNCTION_DEFINITIONS,
+        services=CommandServices(xano_service=None),
+        logger=getLogger(),
+    )
+    print(f'{"function":<24}{"literal_eval us":>18}{"orjson+schema us":>20}{"speedup":>10}')
+    for function_name, input_data in _ARGUMENTS.items():
+        command = registry.get(function_name)
+        try:
+            _literal_eval_path(input_data)
+            old = timeit(lambda: _literal_eval_path(input_data), number=iterations) / iterations * 1e6
+        except ValueError:
+            # literal_eval does not understand JSON null/true/false
+            old = float('nan')
+        new = timeit(lambda: command.serialize_input(input_data), number=iterations) / iterations * 1e6
+        print(f'{function_name:<24}{old:>18.2f}{new:>20.2f}{old / new:>9.1f}x')
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    run(int(argv[1]) if len(argv) > 1 else 20_000)
@@ -0,0 +1,149 @@
+#####################################################################################################
+"""
+Benchmark of transcript search latency on a synthetic dataset.
+
+Needs the database from .env. Loads synthetic search documents (a million by default) into a
+scratch schema, builds the indexes and times first pages of the search statement, compared
+with ILIKE over the same text. The scratch schema is dropped at the end.
+
+Usage (from src/):
+    uv run python -m benchmarks.transcript_search [rows]
+"""
+import asyncio
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from statistics import median
+from sys import argv
+from time import perf_counter
+
+from dotenv import load_dotenv
+from sqlalchemy import Text, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from configs.settings import AppSettings
+from db.connection.engine import create_db_engine
+from db.models.conversation_search import ConversationSearch
+from db.repositories.conversation_search import ConversationSearchRepository
+from utils.search import build_tsquery
+
+#####################################################################################################
+
+_SCHEMA = 'bench_search'
+_LOAD_CHUNK = 100_000
+_RUNS = 20
+_AGENCIES = 20
+
+_WORDS = (
+    'hello hi thanks thank you please yes no okay sure great fine good morning afternoon evening '
+    'flat house apartment studio bungalow cottage terrace detached semi bedroom bedrooms bathroom '
+    'kitchen garden garage parking balcony view views floor ground first second top lift stairs '
+    'viewing valuation appointment book booking arrange tomorrow today monday tuesday wednesday '
+    'thursday friday saturday sunday morning noon pm am time slot available availability free '
+    'price prices pricing expensive cheap affordable offer offers asking budget deposit mortgage '
+    'rent rental let letting sale sell selling buy buying buyer seller landlord tenant agent '
+    'byres road great western dumbarton street avenue crescent park lane drive place square '
+    'glasgow edinburgh west end city centre southside hyndland partick kelvinside finnieston '
+    'school schools station transport bus subway shops quiet busy noisy bright spacious small '
+    'large modern refurbished period feature fireplace bay window windows heating gas electric '
+    'double glazing epc council tax factor fees service charge name email phone number call back '
+    'complain complaint unhappy problem issue repair repairs damp mould leak broken boiler '
+    'interested interest still sold under sale agreed closing date survey home report'
+).split()
+
+#####################################################################################################
+
+def _agency_id(index: int) -> str:
+    return str(uuid.UUID(hashlib.md5(str(index).encode()).hexdigest()))
+
+async def _load(connection: AsyncConnection, rows: int) -> None:
+    await connection.execute(text(f'DROP SCHEMA IF EXISTS {_SCHEMA} CASCADE'))
+    await connection.execute(text(f'CREATE SCHEMA {_SCHEMA}'))
+    table = ConversationSearch.__table__
+    await connection.run_sync(lambda sync_connection: table.create(sync_connection))
+    # Indexes are built once after the load, much faster than maintaining them row by row
+    for index in table.indexes:
+        await connection.run_sync(index.drop)
+    await connection.commit()
+
+    insert = text(f"""
+        INSERT INTO {_SCHEMA}.conversation_search (conversation_id, agency_id, started_at, user_text, assistant_text)
+        SELECT
+            g,
+            md5((g % {_AGENCIES})::text)::uuid,
+            now() - (g % 525600) * interval '1 minute',
+            (SELECT string_agg(vocab.words[1 + floor(random() * vocab.size)::int], ' ') FROM generate_series(1, 40 + g % 7)),
+            (SELECT string_agg(vocab.words[1 + floor(random() * vocab.size)::int], ' ') FROM generate_series(1, 60 + g % 5))
+        FROM generate_series(:start, :stop) AS g,
+             (SELECT CAST(:words AS text[]) AS words, cardinality(CAST(:words AS text[])) AS size) AS vocab
+    """).bindparams(bindparam('words', type_=ARRAY(Text)))
+    for start in range(1, rows + 1, _LOAD_CHUNK):
+        stop = min(start + _LOAD_CHUNK - 1, rows)
+        started = perf_counter()
+        await connection.execute(insert, {'start': start, 'stop': stop, 'words': list(_WORDS)})
+        await connection.commit()
+        print(f'loaded {stop:,} rows ({perf_counter() - started:.1f}s)')
+
+    started = perf_counter()
+    for index in table.indexes:
+        await connection.run_sync(index.create)
+    await connection.execute(text(f'ANALYZE {_SCHEMA}.conversation_search'))
+    await connection.commit()
+    print(f'indexes built ({perf_counter() - started:.1f}s)')
+
+#####################################################################################################
+
+async def _time(connection: AsyncConnection, statement, runs: int) -> tuple[float, int]:
+    timings = []
+    found = 0
+    for _ in range(runs):
+        started = perf_counter()
+        found = len((await connection.execute(statement)).all())
+        timings.append((perf_counter() - started) * 1000)
+    return median(timings), found
+
+async def run(rows: int) -> None:
+    load_dotenv()
+    engine = create_db_engine(AppSettings())
+    month_ago = datetime.now(timezone.utc) - timedelta(days=30)
+    cases = {
+        'word': dict(query='expensive'),
+        'two words': dict(query='damp boiler'),
+        'phrase': dict(query='"byres road"'),
+        'prefix': dict(query='refurb*'),
+        'user only': dict(query='expensive', weights='A', snippet_from='user_text'),
+        'agency 30 days': dict(query='viewing', agency_id=_agency_id(3), started_from=month_ago),
+    }
+    try:
+        async with engine.connect() as connection:
+            connection = await connection.execution_options(schema_translate_map={None: _SCHEMA})
+            await _load(connection, rows)
+            print(f'{"query":<18}{"tsvector ms":>14}{"ILIKE ms":>12}{"hits":>8}')
+            for name, case in cases.items():
+                statement = ConversationSearchRepository.search_statement(
+                    build_tsquery(case['query'], case.get('weights', '')),
+                    20,
+                    snippet_from=case.get('snippet_from'),
+                    agency_id=case.get('agency_id'),
+                    started_from=case.get('started_from'),
+                )
+                search_ms, hits = await _time(connection, statement, _RUNS)
+                # What finding a word meant without the index, a sequential scan of the text
+                pattern = case['query'].strip('"*-').split()[0]
+                baseline = text(f"""
+                    SELECT conversation_id FROM {_SCHEMA}.conversation_search
+                    WHERE user_text ILIKE :pattern OR assistant_text ILIKE :pattern
+                    ORDER BY started_at DESC, conversation_id DESC LIMIT 20
+                """).bindparams(pattern=f'%{pattern}%')
+                ilike_ms, _ = await _time(connection, baseline, 3)
+                print(f'{name:<18}{search_ms:>14.2f}{ilike_ms:>12.2f}{hits:>8}')
+            await connection.execute(text(f'DROP SCHEMA {_SCHEMA} CASCADE'))
+            await connection.commit()
+    finally:
+        await engine.dispose()
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    asyncio.run(run(int(argv[1]) if len(argv) > 1 else 1_000_000))
@@ -0,0 +1,70 @@
+#####################################################################################################
+"""
+Micro-benchmark of packed transcript storage.
+
+For synthetic calls of different lengths compares the size of plain JSON (as PostgreSQL would
+store it, pglz compressed only above about 2 kB) with packed transcripts, and the cost of
+packing and of reading a transcript back in both formats.
+
+Usage (from src/):
+    uv run python -m benchmarks.transcript_storage [iterations]
+"""
+import random
+from sys import argv
+from timeit import timeit
+
+import orjson
+
+from utils.transcript import pack_transcript, unpack_transcript
+
+#####################################################################################################
+
+_USER = (
+    'Hi, I am calling about the flat on Byres Road.',
+    'Is it still available?',
+    'How many bedrooms does it have?',
+    'Could I come and see it on Saturday morning?',
+    'My name is John Smith, email john@example.com.',
+    'Yes, that time works for me, thanks.',
+)
+_ASSISTANT = (
+    'Thank you for calling. How can I help you today?',
+    'Yes, the two bedroom flat on Byres Road is still available at 1,250 pounds a month.',
+    'It has two bedrooms, a modern kitchen and a south facing balcony.',
+    'I can book a viewing for Saturday at 10am or 11:30am. Which would you prefer?',
+    'Could I take your name, email address and phone number, please?',
+    'Your viewing is booked. You will get a confirmation email shortly.',
+)
+
+#####################################################################################################
+
+def _transcript(turns: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            'type': 'ConversationText',
+            'role': 'assistant' if turn % 2 == 0 else 'user',
+            'content': rng.choice(_ASSISTANT if turn % 2 == 0 else _USER),
+        }
+        for turn in range(turns)
+    ]
+
+def run(iterations: int) -> None:
+    print(f'{"turns":>6}{"json B":>10}{"packed B":>10}{"ratio":>8}{"pack us":>10}{"json read us":>14}{"packed read us":>16}')
+    for turns in (4, 12, 24, 60, 150):
+        transcript = _transcript(turns, seed=turns)
+        plain = orjson.dumps(transcript)
+        packed = pack_transcript(transcript)
+        assert unpack_transcript(packed) == transcript
+        pack_us = timeit(lambda: pack_transcript(transcript), number=iterations) / iterations * 1e6
+        plain_us = timeit(lambda: unpack_transcript(plain), number=iterations) / iterations * 1e6
+        packed_us = timeit(lambda: unpack_transcript(packed), number=iterations) / iterations * 1e6
+        print(
+            f'{turns:>6}{len(plain):>10}{len(packed):>10}{len(plain) / len(packed):>8.1f}'
+            f'{pack_us:>10.1f}{plain_us:>14.1f}{packed_us:>16.1f}'
+        )
+
+#####################################################################################################
+
+if __name__ == '__main__':
+    run(int(argv[1]) if len(argv) > 1 else 10_000)
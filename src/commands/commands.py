@@ -1,98 +1,261 @@
-import ast
-
 import json
 from abc import ABC, abstractmethod
-from datetime import datetime, timedelta
-from logging import Logger
-from typing import Any, Final
+from asyncio import CancelledError, create_task, wait
+from dataclasses import dataclass
+from datetime import datetime
+from logging import DEBUG, Logger
+from random import choice, random
+from time import perf_counter
+from typing import Any, Awaitable, Callable, ClassVar, Final, Mapping, Sequence
 
+import orjson
 from deepgram.clients.agent.v1 import FunctionCallRequest
 from fastapi import WebSocket
 
 from deepgram import AsyncAgentWebSocketClient, FunctionCallResponse
 from pydantic import BaseModel
 
+from app_types.exceptions import ToolArgumentsError
+from commands.formatting import fit_items_to_budget, hoist_common_fields
+from configs.constants import CALENDAR_SLOTS_WINDOW
+from db.models.enums import ConversationPurpose
 from schema.conversation import ConversationState
 from schema.lead import LeadInfo
-from schema.xano import CalendarSlotsRequest, CalendarSlotsResponse, CreateAppointmentRequest, SearchPropertyAgentFormat, SearchPropertyItemAgentFormat, SearchPropertyResponse, TimeSlot
+from schema.xano import CalendarSlotsRequest, CalendarSlotsResponse, CreateAppointmentRequest, SearchPropertyAgentFormat, SearchPropertyItemAgentFormat, SearchPropertyItemXanoFormat, SearchPropertyResponse, TimeSlot
+from services.appointment_outbox import AppointmentOutboxService
+from services.calendar_prefetch import CalendarPrefetcher
+from services.property_index import PropertyCatalog
 from services.xano import XanoService
+from utils.json_schema import compile_schema
+from utils.metrics import Counter, Histogram
+from utils.serialization import dumps_pretty, dumps_text
+from utils.tracing import Span
+
+
+DEFAULT_FILLER_PHRASES: Final = (
+    "Let me check that for you…",
+    "One moment please, I'm looking that up.",
+    "Just a second, I'm checking.",
+)
+
+_TOOL_CALL_DURATION: Final = Histogram(
+    'voice_tool_call_duration_seconds',
+    'Execution time of LLM function calls',
+    ('function',),
+)
+_TOOL_CALLS: Final = Counter(
+    'voice_tool_calls_total',
+    'LLM function calls by result: ok, invalid_arguments or error',
+    ('function', 'result'),
+)
+_TOOL_FILLER_INJECTED: Final = Counter(
+    'voice_tool_filler_injected_total',
+    'Filler messages injected while a slow function call was running',
+    ('function',),
+)
+_TOOL_RESPONSE_BYTES: Final = Counter(
+    'voice_tool_response_bytes_total',
+    'Size of function responses sent to the LLM',
+    ('function',),
+)
+_TOOL_RESPONSE_SIZE_SAMPLES: Final = Counter(
+    'voice_tool_response_size_samples_total',
+    'Function responses compared with indented JSON of the full result',
+    ('function',),
+)
+_TOOL_RESPONSE_BYTES_SAVED: Final = Counter(
+    'voice_tool_response_bytes_saved_total',
+    'Bytes saved by compact function responses compared to indented JSON of the full result, sampled responses only',
+    ('function',),
+)
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class CommandServices:
+    """Process wide services shared by all command handlers."""
+    xano_service: XanoService
+    property_catalog: PropertyCatalog | None = None
+    appointment_outbox: AppointmentOutboxService | None = None
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class CommandContext:
+    """Per-session state passed to the shared command handlers on every call."""
+    client_ws: WebSocket
+    deepgram_agent: AsyncAgentWebSocketClient
+    conv_state: ConversationState
+    exit_callback: Callable[[], Awaitable[None]]
+    agency_id: str | None = None
+    filler_phrases: Sequence[str] = DEFAULT_FILLER_PHRASES
+    calendar_prefetcher: CalendarPrefetcher | None = None
+    # Root span of the session when it is traced
+    trace_span: Span | None = None
 
 
 class FunctionCommand(ABC):
+    """
+    Handler for a single LLM function. Instances are stateless and shared between sessions,
+    everything session related comes with the CommandContext.
+    """
+
+    function_name: ClassVar[str]
+    # Seconds of silence after which a filler phrase is spoken. None disables filler for the tool
+    filler_delay: ClassVar[float | None] = None
+    # Max size of the function response in characters, about 4 characters per token
+    response_budget: ClassVar[int] = 2000
+    # Share of responses whose size is compared with indented JSON of the full result
+    response_size_sample_rate: ClassVar[float] = 0.05
+    _COMMANDS: ClassVar[dict[str, type["FunctionCommand"]]] = {}
+
+    def __init_subclass__(cls, function_name: str | None = None, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if function_name is not None:
+            if function_name in FunctionCommand._COMMANDS:
+                raise ValueError(f'Command for function "{function_name}" is already registered')
+            cls.function_name = function_name
+            FunctionCommand._COMMANDS[function_name] = cls
+
+    @classmethod
+    def get_command_class(cls, function_name: str) -> type["FunctionCommand"] | None:
+        return FunctionCommand._COMMANDS.get(function_name)
 
     def __init__(
         self,
-        xano_service: XanoService,
+        services: CommandServices,
         logger: Logger,
-        client_ws: WebSocket,
-        deepgram_agent: AsyncAgentWebSocketClient,
-        conv_state: ConversationState,
+        parameters: Mapping[str, Any] | None = None,
         dev_mode: bool = False,
     ):
-        self._xano_service = xano_service
+        self._services = services
+        self._xano_service = services.xano_service
         self._logger = logger
-        self._client_ws = client_ws
-        self._deepgram_agent = deepgram_agent
         self._dev_mode = dev_mode
-        self._conv_state = conv_state
+        self._validate_arguments: Final = compile_schema(parameters or {'type': 'object'})
+        self._duration_metric: Final = _TOOL_CALL_DURATION.labels(self.function_name)
+        self._filler_metric: Final = _TOOL_FILLER_INJECTED.labels(self.function_name)
+        self._ok_metric: Final = _TOOL_CALLS.labels(self.function_name, 'ok')
+        self._invalid_arguments_metric: Final = _TOOL_CALLS.labels(self.function_name, 'invalid_arguments')
+        self._error_metric: Final = _TOOL_CALLS.labels(self.function_name, 'error')
+        self._response_bytes_metric: Final = _TOOL_RESPONSE_BYTES.labels(self.function_name)
+        self._response_size_samples_metric: Final = _TOOL_RESPONSE_SIZE_SAMPLES.labels(self.function_name)
+        self._response_bytes_saved_metric: Final = _TOOL_RESPONSE_BYTES_SAVED.labels(self.function_name)
 
-    async def execute(self, function_call_request: FunctionCallRequest) -> None:
+    async def execute(self, ctx: CommandContext, function_call_request: FunctionCallRequest) -> None:
         """Common execution logic for all Commands."""
-        self._logger.debug(f'Incoming function call request to {self.__class__.__name__}:')
-        self._logger.debug(function_call_request.to_json(ensure_ascii=False, indent=4))
-        self._conv_state.tool_calls.add(function_call_request.function_name)
-        input_data = function_call_request.input
+        if self._logger.isEnabledFor(DEBUG):
+            self._logger.debug(f'Incoming function call request to {self.__class__.__name__}:')
+            self._logger.debug(dumps_pretty(function_call_request.to_dict()))
+        ctx.conv_state.tool_calls.add(function_call_request.function_name)
+        started = perf_counter()
+        if self.filler_delay is None:
+            result = await self._safe_execute(ctx, function_call_request)
+        else:
+            result = await self._execute_with_filler(ctx, function_call_request)
+        self._duration_metric.observe(perf_counter() - started)
+        formatted_response = self.format_response(result, function_call_request.function_call_id)
+        response = formatted_response.to_dict()
+        await ctx.deepgram_agent.send(dumps_text(response))
+        if self._dev_mode:
+            await ctx.client_ws.send_text(dumps_pretty(response))
+
+    async def _safe_execute(self, ctx: CommandContext, function_call_request: FunctionCallRequest) -> Any:
         try:
-            serialized_input = self.serialize_input(input_data)
-            result = await self._execute(serialized_input)
+            serialized_input = self.serialize_input(function_call_request.input)
+            result = await self._execute(ctx, serialized_input)
+        except ToolArgumentsError as ex:
+            self._invalid_arguments_metric.inc()
+            self._logger.warning(str(ex))
+            return ex.to_llm_response()
         except Exception as ex:
+            self._error_metric.inc()
             # Return error message even if exception occurred while executing the function
             self._logger.error(f'Error executing function call {function_call_request.function_name}: {ex}')
-            result = f"Error executing function call {function_call_request.function_name}: {ex}"
-        formatted_response = self.format_response(result, function_call_request.function_call_id)
-        await self._deepgram_agent.send(formatted_response.to_json(ensure_ascii=False, indent=4))
-        if self._dev_mode:
-            await self._client_ws.send_text(formatted_response.to_json(ensure_ascii=False, indent=4))
+            return f"Error executing function call {function_call_request.function_name}: {ex}"
+        self._ok_metric.inc()
+        return result
+
+    async def _execute_with_filler(self, ctx: CommandContext, function_call_request: FunctionCallRequest) -> Any:
+        """
+        Runs the command and, if it is still not finished after filler_delay, lets the agent say
+        a filler phrase. Filler is sent at most once and always before the result.
+        """
+        task = create_task(self._safe_execute(ctx, function_call_request))
+        try:
+            done, _ = await wait((task,), timeout=self.filler_delay)
+            if not done and ctx.filler_phrases:
+                inject_message = {"type": "InjectAgentMessage", "message": choice(ctx.filler_phrases)}
+                await ctx.deepgram_agent.send(dumps_text(inject_message))
+                self._filler_metric.inc()
+            return await task
+        except CancelledError:
+            task.cancel()
+            raise
 
     @abstractmethod
-    async def _execute(self, params: dict[str, Any]) -> Any:
+    async def _execute(self, ctx: CommandContext, params: dict[str, Any]) -> Any:
         pass
 
-    @staticmethod
-    def serialize_input(input_data: str) -> dict:
-        # TODO REFACTOR IT
-        serialized_data = ast.literal_eval(input_data)
-        if isinstance(serialized_data, dict):
-            return serialized_data
-        raise ValueError("Input data is not a dictionary")
+    def serialize_input(self, input_data: str) -> dict:
+        """Decode the arguments JSON and validate it against the function parameters schema."""
+        try:
+            serialized_data = orjson.loads(input_data)
+        except orjson.JSONDecodeError as ex:
+            raise ToolArgumentsError(self.function_name, [{'field': '$', 'error': f'invalid JSON: {ex}'}])
+        if not isinstance(serialized_data, dict):
+            raise ToolArgumentsError(self.function_name, [{'field': '$', 'error': 'expected object'}])
+        errors = self._validate_arguments(serialized_data)
+        if errors:
+            raise ToolArgumentsError(self.function_name, errors)
+        return serialized_data
 
-    @staticmethod
-    def format_response(data: Any, func_id: str) -> FunctionCallResponse:
+    def format_response(self, data: Any, func_id: str) -> FunctionCallResponse:
         """
         Format the response to the FunctionCallResponse valid format
         """
-        if isinstance(data, BaseModel) and hasattr(data, 'model_dump_json'):
-            output = data.model_dump_json(indent=4)
-        elif isinstance(data, str) and (data.startswith('{') or data.startswith('[')):
-            output = data
-        elif isinstance(data, (dict, list)):
-            output = json.dumps(data, indent=4, ensure_ascii=False)
-        else:
-            output = json.dumps({"result": data}, indent=4, ensure_ascii=False)
-
+        output = self.render_output(data)
+        self._record_response_size(data, output)
         return FunctionCallResponse(
             type='FunctionCallResponse',
             function_call_id=func_id,
             output=output,
         )
 
+    def render_output(self, data: Any) -> str:
+        """Minified JSON of the result. Commands with large results override it to fit response_budget."""
+        if isinstance(data, BaseModel):
+            return data.model_dump_json()
+        elif isinstance(data, str) and (data.startswith('{') or data.startswith('[')):
+            return data
+        elif isinstance(data, (dict, list)):
+            return dumps_text(data)
+        else:
+            return dumps_text({"result": data})
+
+    def _record_response_size(self, data: Any, output: str) -> None:
+        size = len(output.encode())
+        self._response_bytes_metric.inc(size)
+        # Serializing the full result again costs more than the compact output, so only a sample is compared
+        if random() >= self.response_size_sample_rate:
+            return
+        if isinstance(data, BaseModel):
+            full_size = len(data.model_dump_json(indent=4).encode())
+        elif isinstance(data, (dict, list)):
+            # Stays the stdlib format the responses had before, the saving is measured against it
+            full_size = len(json.dumps(data, indent=4, ensure_ascii=False).encode())
+        else:
+            return
+        saved = max(full_size - size, 0)
+        self._response_size_samples_metric.inc()
+        self._response_bytes_saved_metric.inc(saved)
+        self._logger.info(f'"{self.function_name}" response: {size} bytes, saved {saved} of {full_size} bytes')
+
 
-class CreateAppointmentCommand(FunctionCommand):
+class CreateAppointmentCommand(FunctionCommand, function_name='createAppointment'):
 
     _APPOINTMENT_CREATED_MESSAGE = "Appointment created successfully"
     _APPOINTMENT_NOT_CREATED_MESSAGE = "Couldn't create appointment"
 
-    async def _execute(self, params: dict[str, Any]) -> Any:
+    async def _execute(self, ctx: CommandContext, params: dict[str, Any]) -> Any:
         start = datetime.fromisoformat(params['start'])
         end = datetime.fromisoformat(params['end'])
         start_ts = int(start.timestamp()) * 1000
@@ -114,26 +277,40 @@ class CreateAppointmentCommand(FunctionCommand):
         except Exception as ex:
             self._logger.error('Invalid payload for creating appointment', exc_info=ex)
             raise ValueError(f'Invalid payload for creating appointment: {ex}')
-        response = await self._xano_service.create_appointment(payload)
-        if not response:
-            return self._APPOINTMENT_NOT_CREATED_MESSAGE
-        self._conv_state.lead_created = True
-        self._conv_state.lead_info = LeadInfo(
+        lead_info = LeadInfo(
             name=params['name'],
             email=params['email'],
             phone=params['phone'],
         )
+        outbox = self._services.appointment_outbox
+        if outbox is not None:
+            # Stored locally and delivered to Xano in the background, the caller does not wait for it
+            ctx.conv_state.lead_id, _ = await outbox.enqueue(payload, lead_info, ctx.agency_id)
+        elif not await self._xano_service.create_appointment(payload):
+            return self._APPOINTMENT_NOT_CREATED_MESSAGE
+        ctx.conv_state.lead_created = True
+        ctx.conv_state.lead_info = lead_info
         return self._APPOINTMENT_CREATED_MESSAGE
 
 
-class SearchPropertiesCommand(FunctionCommand):
-    
-    async def _execute(self, params: dict) -> SearchPropertyAgentFormat:
+class SearchPropertiesCommand(FunctionCommand, function_name='searchForProperties'):
+
+    filler_delay = 1.0
+    response_budget = 1500
+
+    async def _execute(self, ctx: CommandContext, params: dict) -> SearchPropertyAgentFormat:
         search_address: str = params.get('search_address')
-        properties: SearchPropertyResponse | None = await self._xano_service.search_property(search_address)
-        if not properties:
-            return SearchPropertyAgentFormat(items=[])
-        
+        items = self._search_local(ctx, search_address)
+        if items is None:
+            properties: SearchPropertyResponse | None = await self._xano_service.search_property(search_address)
+            if not properties:
+                return SearchPropertyAgentFormat(items=[])
+            items = properties.items
+
+        if ctx.calendar_prefetcher is not None and items:
+            event_type = 'Valuation' if ctx.conv_state.purpose == ConversationPurpose.VALUATION else 'Viewing'
+            ctx.calendar_prefetcher.speculate((p.postcode for p in items), event_type)
+
         properties_output = SearchPropertyAgentFormat(
             items=[SearchPropertyItemAgentFormat(
                 property_id=p.external_id,
@@ -142,18 +319,34 @@ class SearchPropertiesCommand(FunctionCommand):
                 country=p.country,
                 state=p.state,
                 postcode=p.postcode,
-            ) for p in properties.items]
+            ) for p in items]
         )
         return properties_output
+
+    def _search_local(self, ctx: CommandContext, search_address: str) -> list[SearchPropertyItemXanoFormat] | None:
+        catalog = self._services.property_catalog
+        if catalog is None or ctx.agency_id is None:
+            return None
+        return catalog.search(ctx.agency_id, search_address)
+
+    def render_output(self, data: Any) -> str:
+        if not isinstance(data, SearchPropertyAgentFormat):
+            return super().render_output(data)
+        rows = [item.model_dump() for item in data.items]
+        common = hoist_common_fields(rows, ('country', 'state', 'city'))
+        return fit_items_to_budget(rows, lambda chunk: {**common, 'items': list(chunk)}, self.response_budget)
     
 
-class GetFreeCalendarSlotsCommand(FunctionCommand):
+class GetFreeCalendarSlotsCommand(FunctionCommand, function_name='getFreeCalendarSlots'):
 
     _MAX_NUMBER_OF_SLOTS_RESPONSE: Final[int] = 10
 
-    async def _execute(self, params: dict) -> CalendarSlotsResponse:
+    filler_delay = 1.0
+    response_budget = 1500
+
+    async def _execute(self, ctx: CommandContext, params: dict) -> CalendarSlotsResponse:
         from_dt = datetime.fromisoformat(params['from_ts'])
-        to_dt = from_dt + timedelta(hours=50)
+        to_dt = from_dt + CALENDAR_SLOTS_WINDOW
         post_code = params['prop_postcode']
         post_code = post_code.split()[0]
         event_type = params['event_type']
@@ -166,38 +359,64 @@ class GetFreeCalendarSlotsCommand(FunctionCommand):
             prop_postcode=post_code,
             event_type=event_type,
         )
-        slots: list[TimeSlot] | None = await self._xano_service.get_calendar_slots(payload)
-        self._conv_state.set_purpose_by_event_type(event_type)
+        slots: list[TimeSlot] | None = None
+        if ctx.calendar_prefetcher is not None:
+            slots = await ctx.calendar_prefetcher.lookup(payload, self._MAX_NUMBER_OF_SLOTS_RESPONSE)
+        if slots is None:
+            slots = await self._xano_service.get_calendar_slots(payload)
+        ctx.conv_state.set_purpose_by_event_type(event_type)
         if not slots:
             return CalendarSlotsResponse(slots=[])
         return CalendarSlotsResponse(slots=slots[:self._MAX_NUMBER_OF_SLOTS_RESPONSE])
+
+    def render_output(self, data: Any) -> str:
+        if not isinstance(data, CalendarSlotsResponse):
+            return super().render_output(data)
+        return fit_items_to_budget(data.slots, self._group_by_agent, self.response_budget)
+
+    @staticmethod
+    def _group_by_agent(slots: Sequence[TimeSlot]) -> dict[str, Any]:
+        agents: dict[str, dict[str, Any]] = {}
+        for slot in slots:
+            agent = agents.setdefault(slot.agent_id, {
+                'agent_id': slot.agent_id,
+                'agent_name': slot.agent_name,
+                'slots': [],
+            })
+            agent['slots'].append([slot.start, slot.end])
+        return {'slot_format': '[start, end]', 'agents': list(agents.values())}
     
 
-class EndCallCommand(FunctionCommand):
-    def __init__(self, exit_callback, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._exit_callback = exit_callback
+class EndCallCommand(FunctionCommand, function_name='end_call'):
 
-    async def execute(self, function_call_request: FunctionCallRequest) -> Any:
-        self._logger.debug(f'Incoming function call request to {self.__class__.__name__}:')
-        self._logger.debug(function_call_request.to_json(ensure_ascii=False, indent=4))
+    async def execute(self, ctx: CommandContext, function_call_request: FunctionCallRequest) -> Any:
+        if self._logger.isEnabledFor(DEBUG):
+            self._logger.debug(f'Incoming function call request to {self.__class__.__name__}:')
+            self._logger.debug(dumps_pretty(function_call_request.to_dict()))
         input_data = function_call_request.input
         try:
             serialized_input = self.serialize_input(input_data)
-            result = await self._execute(serialized_input)
+            result = await self._execute(ctx, serialized_input)
+            self._ok_metric.inc()
+        except ToolArgumentsError as ex:
+            # Farewell type is cosmetic, do not keep the caller on the line because of it
+            self._invalid_arguments_metric.inc()
+            self._logger.warning(str(ex))
+            result = await self._execute(ctx, {})
         except Exception as ex:
+            self._error_metric.inc()
             # Return error message even if exception occurred while executing the function
             self._logger.error(f'Error executing function call {function_call_request.function_name}: {ex}')
             result = f"Error executing function call {function_call_request.function_name}: {ex}"
         function_response = result["function_response"]
         inject_message = result["inject_message"]
         formatted_response = self.format_response(function_response, function_call_request.function_call_id)
-        await self._deepgram_agent.send(formatted_response.to_json())
-        await self._deepgram_agent.send(json.dumps(inject_message))
+        await ctx.deepgram_agent.send(dumps_text(formatted_response.to_dict()))
+        await ctx.deepgram_agent.send(dumps_text(inject_message))
         # TODO work with the implementation of exit_callback. It should voice last inject message from agent
-        await self._exit_callback()
+        await ctx.exit_callback()
 
-    async def _execute(self, params: dict) -> dict:
+    async def _execute(self, ctx: CommandContext, params: dict) -> dict:
         farewell_type = params.get("farewell_type", "general")
         
         if farewell_type == "thanks":
@@ -0,0 +1,70 @@
+#####################################################################################################
+
+from asyncio import CancelledError, Semaphore, Task, create_task, current_task, gather
+from logging import Logger
+from typing import Final
+
+from deepgram import FunctionCallRequest
+
+from commands.commands import CommandContext
+from commands.registry import CommandRegistry
+from utils.serialization import dumps_text
+from utils.tracing import TRACER
+
+#####################################################################################################
+
+class ToolCallDispatcher:
+    """
+    Runs function calls of a single session as tracked background tasks, so the Deepgram
+    event loop (audio, transcripts) is not blocked while a tool is waiting for Xano.
+    """
+
+    def __init__(self, registry: CommandRegistry, logger: Logger, max_concurrency: int) -> None:
+        self._registry: Final = registry
+        self._logger: Final = logger
+        self._semaphore: Final = Semaphore(max_concurrency)
+        self._tasks: Final[set[Task]] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def dispatch(self, ctx: CommandContext, function_call_request: FunctionCallRequest) -> None:
+        task = create_task(
+            self._run(ctx, function_call_request),
+            name=f'tool:{function_call_request.function_name}:{function_call_request.function_call_id}',
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, ctx: CommandContext, function_call_request: FunctionCallRequest) -> None:
+        function_name = function_call_request.function_name
+        attributes = {'tool.name': function_name, 'tool.call_id': function_call_request.function_call_id}
+        # Includes waiting for a free slot, which is part of what the caller waits for
+        with TRACER.span(f'tool {function_name}', parent=ctx.trace_span, attributes=attributes):
+            async with self._semaphore:
+                try:
+                    if not function_call_request.input:
+                        await ctx.deepgram_agent.send(dumps_text({"error": "No input data provided for function call."}))
+                    command = self._registry.get(function_name)
+                    if command is None:
+                        self._logger.warning(f'Unknown function call: "{function_name}"')
+                        await ctx.deepgram_agent.send(dumps_text({"error": f"Unknown function call: {function_name}"}))
+                        return
+                    await command.execute(ctx, function_call_request)
+                except CancelledError:
+                    self._logger.info(f'Function call "{function_name}" was cancelled')
+                    raise
+                except Exception as ex:
+                    self._logger.error(f'Unhandled error in function call "{function_name}"', exc_info=ex)
+
+    async def cancel_all(self) -> None:
+        # The calling task is skipped: end_call finishes the session from inside its own task
+        this_task = current_task()
+        tasks = [task for task in self._tasks if task is not this_task]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await gather(*tasks, return_exceptions=True)
+
+#####################################################################################################
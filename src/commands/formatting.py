@@ -0,0 +1,69 @@
+#####################################################################################################
+"""
+Compact rendering of tool results for the LLM.
+
+Every character of a function response becomes prompt tokens on each following LLM turn,
+so results are minified, repeated fields are hoisted and long lists are cut to a budget.
+"""
+from typing import Any, Callable, Final, Sequence, TypeVar
+
+from utils.serialization import dumps_text
+
+#####################################################################################################
+
+T = TypeVar('T')
+
+CONTINUATION_HINT: Final = 'Only part of the results is shown. Ask the caller to narrow the request to see others.'
+
+#####################################################################################################
+
+def fit_items_to_budget(
+    items: Sequence[T],
+    render: Callable[[Sequence[T]], dict[str, Any]],
+    budget: int,
+) -> str:
+    """
+    Renders the longest prefix of items that fits into budget characters.
+    If some items were cut, the payload gets "omitted" count and a continuation hint.
+    """
+    output = dumps_text(render(items))
+    if len(output) <= budget or not items:
+        return output
+
+    # Binary search of the longest prefix that still fits together with the hint
+    low, high = 0, len(items) - 1
+    best = _render_truncated(items, 0, render)
+    while low <= high:
+        middle = (low + high) // 2
+        candidate = _render_truncated(items, middle, render)
+        if len(candidate) <= budget:
+            best = candidate
+            low = middle + 1
+        else:
+            high = middle - 1
+    return best
+
+#####################################################################################################
+
+def _render_truncated(items: Sequence[T], count: int, render: Callable[[Sequence[T]], dict[str, Any]]) -> str:
+    payload = render(items[:count])
+    payload['omitted'] = len(items) - count
+    payload['hint'] = CONTINUATION_HINT
+    return dumps_text(payload)
+
+#####################################################################################################
+
+def hoist_common_fields(rows: list[dict[str, Any]], fields: Sequence[str]) -> dict[str, Any]:
+    """Moves fields which have the same value in every row out of the rows."""
+    common: dict[str, Any] = {}
+    if not rows:
+        return common
+    for field in fields:
+        value = rows[0].get(field)
+        if all(row.get(field) == value for row in rows):
+            common[field] = value
+            for row in rows:
+                row.pop(field, None)
+    return common
+
+#####################################################################################################
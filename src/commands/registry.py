@@ -0,0 +1,49 @@
+#####################################################################################################
+
+from logging import Logger
+from types import MappingProxyType
+from typing import Any, Final, Iterable, Mapping, Self
+
+from commands.commands import CommandServices, FunctionCommand
+
+#####################################################################################################
+
+class CommandRegistry:
+    """
+    Maps LLM function names to preconstructed command handlers.
+    Built once per process, handlers are shared by all sessions.
+    """
+
+    def __init__(self, handlers: Mapping[str, FunctionCommand]) -> None:
+        self._handlers: Final = MappingProxyType(dict(handlers))
+
+    @classmethod
+    def from_definitions(
+        cls,
+        definitions: Iterable[Mapping[str, Any]],
+        services: CommandServices,
+        logger: Logger,
+        dev_mode: bool = False,
+    ) -> Self:
+        handlers: dict[str, FunctionCommand] = {}
+        for definition in definitions:
+            function_name = definition['name']
+            command_class = FunctionCommand.get_command_class(function_name)
+            if command_class is None:
+                raise ValueError(f'No command registered for function "{function_name}"')
+            handlers[function_name] = command_class(
+                services=services,
+                logger=logger,
+                parameters=definition.get('parameters'),
+                dev_mode=dev_mode,
+            )
+        return cls(handlers)
+
+    def get(self, function_name: str) -> FunctionCommand | None:
+        return self._handlers.get(function_name)
+
+    @property
+    def function_names(self) -> tuple[str, ...]:
+        return tuple(self._handlers)
+
+#####################################################################################################
@@ -1,4 +1,8 @@
+from datetime import timedelta
 from pathlib import Path
 from typing import Final
 
 BASE_DIR: Final = Path(__file__).parent.parent.parent
+
+# Range of getFreeCalendarSlots search starting from the time requested by the caller
+CALENDAR_SLOTS_WINDOW: Final = timedelta(hours=50)
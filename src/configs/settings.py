@@ -21,11 +21,78 @@ class AppSettings(BaseSettings):
     postgres_host: str
     postgres_port: int
     postgres_db: str
+    postgres_pool_size: int = 10
+    postgres_pool_max_overflow: int = 10
+    postgres_pool_timeout: float = 30
+    postgres_pool_recycle: int = 1800
+    postgres_pool_pre_ping: bool = True
+    postgres_statement_cache_size: int = 100
 
     xano_dev_api_token: str
+    xano_api_url: str = 'https://xgpn-deh3-dvvh.n7c.xano.io/api:7-FXIT0K'
 
     deepgram_api_key: str
 
+    tool_calls_max_concurrency: int = 4
+
+    calendar_prefetch_enabled: bool = False
+    calendar_prefetch_max_per_session: int = 3
+
+    property_index_enabled: bool = False
+    property_index_sync_interval: float = 60
+    property_index_full_resync_interval: float = 3600
+    property_index_max_staleness: float = 900
+    property_index_max_documents: int = 20_000
+
+    prompt_reload_interval: float = 5
+    prompt_tokens_warning_threshold: int = 2500
+
+    agency_config_cache_enabled: bool = True
+    agency_config_cache_ttl: float = 300
+
+    appointment_outbox_batch_size: int = 20
+    appointment_outbox_poll_interval: float = 5
+    appointment_outbox_max_attempts: int = 8
+    appointment_outbox_retry_base_delay: float = 2
+    appointment_outbox_retry_max_delay: float = 600
+
+    conversation_export_batch_size: int = 500
+
+    conversation_detail_cache_max_bytes: int = 64 * 1024 * 1024
+    conversation_detail_cache_ttl: float = 3600
+    conversation_detail_max_age: int = 300
+
+    conversation_writer_batch_size: int = 50
+    conversation_writer_flush_interval: float = 1
+    conversation_writer_queue_size: int = 1000
+    conversation_writer_max_attempts: int = 5
+    conversation_writer_retry_base_delay: float = 1
+
+    returning_caller_lookup_enabled: bool = True
+    returning_caller_lookup_timeout: float = 0.5
+    returning_caller_max_conversations: int = 5
+
+    conversation_partitions_ahead: int = 3
+    # Months of conversations to keep unless the agency sets its own, 0 keeps them forever
+    conversation_retention_months: int = 24
+    conversation_retention_archive: bool = False
+    conversation_maintenance_interval: float = 21600
+
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval: float = 0.1
+    # Longer stalls of the event loop get the stack of the blocking code logged
+    loop_monitor_stall_threshold: float = 0.2
+    loop_monitor_report_interval: float = 60
+
+    # Share of sessions traced, 0 turns tracing off. The session id header is sent to Xano anyway
+    tracing_sample_rate: float = 0.1
+    # OTLP JSON lines, relative to the project directory. Empty to export only to the endpoint
+    tracing_export_path: str | None = 'logs/traces.jsonl'
+    # OTLP/HTTP collector, e.g. http://localhost:4318
+    tracing_otlp_endpoint: str | None = None
+    tracing_export_interval: float = 5
+    tracing_max_queued_spans: int = 10000
+
     def __str__(self, /) -> str:
         obj_for_output: Final = self._get_fields_for_output()
         return f'APP INFO: {json.dumps(obj_for_output, indent=4, ensure_ascii=False)}'
@@ -40,6 +107,8 @@ class AppSettings(BaseSettings):
             'SERVER_EXTERNAL_URL': self.app_host,
             'DEV_MODE': self.dev_mode,
             'POSTGRES_PORT': self.postgres_port,
+            'POSTGRES_POOL_SIZE': self.postgres_pool_size,
+            'POSTGRES_POOL_MAX_OVERFLOW': self.postgres_pool_max_overflow,
         }
 
         return obj_for_output
@@ -0,0 +1,74 @@
+#####################################################################################################
+
+from time import perf_counter
+from typing import Final
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+
+from configs.settings import AppSettings
+from utils.metrics import Counter, Gauge, Histogram
+
+#####################################################################################################
+
+_POOL_CHECKOUT_WAIT: Final = Histogram(
+    'voice_db_pool_checkout_wait_seconds',
+    'Time to get a connection from the pool, including opening a new one',
+)
+_POOL_CHECKOUT_TIMEOUTS: Final = Counter(
+    'voice_db_pool_checkout_timeouts_total',
+    'Connection requests which gave up waiting for the pool',
+)
+_POOL_CHECKED_OUT: Final = Gauge(
+    'voice_db_pool_checked_out',
+    'Connections in use',
+)
+_POOL_UTILIZATION: Final = Gauge(
+    'voice_db_pool_utilization',
+    'Connections in use relative to pool size plus overflow',
+)
+
+#####################################################################################################
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Default pool of async engines reporting checkout waits and the number of connections in use."""
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started = perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            _POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            _POOL_CHECKOUT_WAIT.observe(perf_counter() - started)
+        self._update_usage()
+        return record
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        super()._do_return_conn(record)
+        self._update_usage()
+
+    def _update_usage(self) -> None:
+        checked_out = self.checkedout()
+        _POOL_CHECKED_OUT.set(checked_out)
+        _POOL_UTILIZATION.set(checked_out / max(self.size() + max(self._max_overflow, 0), 1))
+
+#####################################################################################################
+
+def create_db_engine(app_settings: AppSettings) -> AsyncEngine:
+    return create_async_engine(
+        url=app_settings.postgres_async_dsn,
+        echo=False,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_size=app_settings.postgres_pool_size,
+        max_overflow=app_settings.postgres_pool_max_overflow,
+        pool_timeout=app_settings.postgres_pool_timeout,
+        pool_recycle=app_settings.postgres_pool_recycle,
+        pool_pre_ping=app_settings.postgres_pool_pre_ping,
+        # Prepared statements of asyncpg, 0 behind pgbouncer in transaction mode
+        connect_args={'statement_cache_size': app_settings.postgres_statement_cache_size},
+    )
+
+#####################################################################################################
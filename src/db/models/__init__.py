@@ -1,6 +1,9 @@
 from .agency import Agency
+from .appointment_outbox import AppointmentOutbox
 from .conversation import Conversation
+from .conversation_search import ConversationSearch
+from .conversation_stats import ConversationDailyStats
 from .lead import Lead
-from .base import Base
+from .base import Base, add_missing_columns, create_missing_indexes
 
-__all__ = ["Agency", "Base", "Conversation", "Lead"]
+__all__ = ["Agency", "AppointmentOutbox", "Base", "Conversation", "ConversationDailyStats", "ConversationSearch", "Lead", "add_missing_columns", "create_missing_indexes"]
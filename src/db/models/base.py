@@ -1,4 +1,113 @@
+import re
+from typing import Final
+
+from sqlalchemy import Connection, inspect, text
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.schema import CreateIndex
+
+# Any constant, the same for all workers
+_INDEX_LOCK_KEY: Final = 0x7067_7661_0001
+_INDEX_DDL_RE: Final = re.compile(
+    r'^CREATE (?P<unique>UNIQUE )?INDEX IF NOT EXISTS \S+ ON \S+ (?P<definition>.*)$', re.DOTALL
+)
+
 
 class Base(DeclarativeBase):
     pass
+
+
+def add_missing_columns(connection: Connection) -> None:
+    """
+    create_all() does not alter existing tables, so nullable columns declared later are
+    added here. For use with AsyncConnection.run_sync, before create_missing_indexes.
+    """
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {column.name} {column_type}'))
+
+
+def create_missing_indexes(connection: Connection) -> None:
+    """
+    create_all() adds indexes only together with new tables, so indexes declared later
+    for existing tables are created here. For use with AsyncConnection.run_sync on a
+    connection in AUTOCOMMIT mode: indexes are built CONCURRENTLY, so conversations are
+    written meanwhile. Partitioned tables can not be indexed concurrently, so each partition
+    is, and its index is attached to the index of the table. Workers starting at once take
+    turns on an advisory lock, a build interrupted before leaves an invalid index which is
+    dropped and built again.
+    """
+    connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': _INDEX_LOCK_KEY})
+    try:
+        for table in Base.metadata.sorted_tables:
+            partitions = _partitions(connection, table.name)
+            for index in table.indexes:
+                if _index_state(connection, index.name) == 'valid':
+                    continue
+                ddl = _INDEX_DDL_RE.match(
+                    str(CreateIndex(index, if_not_exists=True).compile(dialect=connection.dialect))
+                )
+                if partitions is None:
+                    _create_index_concurrently(connection, index.name, table.name, ddl)
+                    continue
+                # Invalid until an index of every partition is attached
+                connection.execute(text(
+                    f'CREATE {ddl["unique"] or ""}INDEX IF NOT EXISTS {index.name} ON ONLY {table.name} {ddl["definition"]}'
+                ))
+                # Partitions created after the index of the table got theirs with it
+                indexed_partitions = set(connection.execute(
+                    text(
+                        'SELECT pg_index.indrelid::regclass::text FROM pg_inherits'
+                        ' JOIN pg_index ON pg_index.indexrelid = pg_inherits.inhrelid'
+                        ' WHERE pg_inherits.inhparent = to_regclass(:index)'
+                    ),
+                    {'index': index.name},
+                ).scalars())
+                for partition in partitions:
+                    if partition in indexed_partitions:
+                        continue
+                    partition_index = f'{index.name}_{partition.removeprefix(f"{table.name}_")}'[:63]
+                    _create_index_concurrently(connection, partition_index, partition, ddl)
+                    connection.execute(text(f'ALTER INDEX {index.name} ATTACH PARTITION {partition_index}'))
+    finally:
+        connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': _INDEX_LOCK_KEY})
+
+
+def _partitions(connection: Connection, table: str) -> list[str] | None:
+    """Names of the partitions of the table, None when it is not partitioned."""
+    relkind = connection.execute(
+        text('SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)'),
+        {'table': table},
+    ).scalar()
+    if relkind != 'p':
+        return None
+    return list(connection.execute(
+        text('SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(:table)'),
+        {'table': table},
+    ).scalars())
+
+
+def _index_state(connection: Connection, name: str) -> str | None:
+    """valid, invalid or None when the index does not exist."""
+    valid = connection.execute(
+        text('SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:index)'),
+        {'index': name},
+    ).scalar()
+    return None if valid is None else 'valid' if valid else 'invalid'
+
+
+def _create_index_concurrently(connection: Connection, name: str, table: str, ddl: re.Match) -> None:
+    state = _index_state(connection, name)
+    if state == 'valid':
+        return
+    if state == 'invalid':
+        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+    connection.execute(text(
+        f'CREATE {ddl["unique"] or ""}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {ddl["definition"]}'
+    ))
@@ -1,26 +1,65 @@
 
 from datetime import datetime
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Boolean, ForeignKey, Integer, String, JSON, TIMESTAMP
+from sqlalchemy.orm import Mapped, column_property, mapped_column, relationship
+from sqlalchemy import Boolean, ForeignKey, Index, Integer, String, JSON, TIMESTAMP, UUID, Text, cast, func, text, type_coerce
 
 from db.models.base import Base
 from db.models.enums import ConversationPurpose
+from db.models.types import PackedTranscript
 
 
 class Conversation(Base):
     __tablename__ = "conversations"
     
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     duration: Mapped[int] = mapped_column(Integer, nullable=False)
-    started_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True))
+    # Partition key, a part of the primary key as PostgreSQL requires
+    started_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True)
     topic: Mapped[str] = mapped_column(String(length=100), nullable=True)
     purpose: Mapped[ConversationPurpose] = mapped_column(String(length=50), nullable=True)
     lead_created: Mapped[bool] = mapped_column(Boolean, default=False)
     tool_calls: Mapped[list[str]] = mapped_column(JSON, nullable=True)
-    transcript: Mapped[list[dict]] = mapped_column(JSON, nullable=True)
-    lead_id: Mapped[int] = mapped_column(ForeignKey("leads.id", ondelete="SET NULL"), nullable=True, unique=True)
+    # Plain JSON of rows written before transcripts were packed, see services.transcript_storage
+    # None is written as SQL NULL, not as JSON null, so packed rows do not look plain
+    transcript_json: Mapped[list[dict] | None] = mapped_column(
+        "transcript", JSON(none_as_null=True), nullable=True, deferred=True
+    )
+    transcript_packed: Mapped[list[dict] | None] = mapped_column(PackedTranscript, nullable=True, deferred=True)
+    # Read only, whichever of the two is set. Decoded only where selected or undeferred
+    transcript: Mapped[list[dict] | None] = column_property(
+        type_coerce(
+            func.coalesce(transcript_packed, func.convert_to(cast(transcript_json, Text), 'UTF8')),
+            PackedTranscript,
+        ),
+        deferred=True,
+    )
+    lead_id: Mapped[int] = mapped_column(ForeignKey("leads.id", ondelete="SET NULL"), nullable=True)
+    # Not a foreign key, conversations are kept when their agency is deleted
+    agency_id: Mapped[str | None] = mapped_column(UUID(as_uuid=False), nullable=True)
 
-    lead: Mapped["Lead"] = relationship(back_populates="conversation")
+    lead: Mapped["Lead"] = relationship(back_populates="conversations")
+
+    # Keyset pagination goes by (started_at, id), filters are leading columns or partial indexes
+    __table_args__ = (
+        Index("ix_conversations_started_at_id", "started_at", "id"),
+        Index("ix_conversations_purpose_started_at_id", "purpose", "started_at", "id"),
+        Index("ix_conversations_agency_id_started_at_id", "agency_id", "started_at", "id"),
+        # Earlier conversations of a returning caller
+        Index(
+            "ix_conversations_lead_id_started_at",
+            "lead_id",
+            "started_at",
+            postgresql_where=text("lead_id IS NOT NULL"),
+        ),
+        Index(
+            "ix_conversations_lead_created_started_at_id",
+            "started_at",
+            "id",
+            postgresql_where=text("lead_created"),
+        ),
+        # Monthly partitions are managed by db.partitioning
+        {"postgresql_partition_by": "RANGE (started_at)"},
+    )
 
     def __repr__(self) -> str:
         return f"<Conversation(id={self.id})>"
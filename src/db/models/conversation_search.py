@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from sqlalchemy import Computed, Index, Integer, Text, TIMESTAMP
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.models.base import Base
+from utils.search import SEARCH_CONFIG
+
+
+class ConversationSearch(Base):
+    """
+    Search document of a conversation transcript. A side table rather than a column of
+    conversations, so the transcript storage format does not matter to the index.
+    User text has weight A and assistant text weight B, which is how role filters work.
+    """
+    __tablename__ = "conversation_search"
+
+    conversation_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    agency_id: Mapped[str | None] = mapped_column(UUID(as_uuid=False), nullable=True)
+    started_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
+    user_text: Mapped[str] = mapped_column(Text, nullable=False, default='')
+    assistant_text: Mapped[str] = mapped_column(Text, nullable=False, default='')
+    document: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', user_text), 'A')"
+            f" || setweight(to_tsvector('{SEARCH_CONFIG}', assistant_text), 'B')",
+            persisted=True,
+        ),
+    )
+
+    __table_args__ = (
+        Index("ix_conversation_search_document", "document", postgresql_using="gin"),
+        Index("ix_conversation_search_started_at_id", "started_at", "conversation_id"),
+        Index("ix_conversation_search_agency_id_started_at_id", "agency_id", "started_at", "conversation_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ConversationSearch(conversation_id={self.conversation_id})>"
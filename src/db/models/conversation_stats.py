@@ -0,0 +1,26 @@
+from datetime import date
+
+from sqlalchemy import BigInteger, Date, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db.models.base import Base
+
+
+class ConversationDailyStats(Base):
+    """Per agency and UTC day rollup of conversations, kept up to date by the conversation writer."""
+    __tablename__ = "conversation_daily_stats"
+
+    agency_id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    conversations: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    duration_sum: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    # Counts per bucket of services.analytics.DURATION_BUCKETS, the last one is unbounded
+    duration_buckets: Mapped[list[int]] = mapped_column(ARRAY(Integer), nullable=False)
+    viewing: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    valuation: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    leads_created: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    tool_calls: Mapped[dict[str, int]] = mapped_column(JSONB, nullable=False, default=dict)
+
+    def __repr__(self) -> str:
+        return f"<ConversationDailyStats(agency_id={self.agency_id}, day={self.day})>"
@@ -6,3 +6,9 @@ from enum import Enum
 class ConversationPurpose(str, Enum):
     VIEWING = "viewing"
     VALUATION = "valuation"
+
+
+class OutboxStatus(str, Enum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"
@@ -1,6 +1,6 @@
 import uuid
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import UUID, String
+from sqlalchemy import UUID, Index, String, text
 
 from db.models.base import Base
 
@@ -12,10 +12,37 @@ class Lead(Base):
     name: Mapped[str] = mapped_column(String(length=255), nullable=False)
     email: Mapped[str | None] = mapped_column(String(length=255), nullable=True)
     phone: Mapped[str | None] = mapped_column(String(length=50), nullable=True)
+    # Keys of the lead within its agency, see utils.contacts
+    agency_id: Mapped[str | None] = mapped_column(UUID(as_uuid=False), nullable=True)
+    email_normalized: Mapped[str | None] = mapped_column(String(length=255), nullable=True)
+    phone_normalized: Mapped[str | None] = mapped_column(String(length=50), nullable=True)
 
-    conversation: Mapped["Conversation"] = relationship(
-        back_populates="lead",
-        uselist=False,
+    conversations: Mapped[list["Conversation"]] = relationship(back_populates="lead")
+
+    # A lead is its email when it has one, otherwise its phone. Each key has one unique index,
+    # so an upsert always has a single conflict target
+    __table_args__ = (
+        Index(
+            "ux_leads_agency_id_email",
+            "agency_id",
+            "email_normalized",
+            unique=True,
+            postgresql_where=text("agency_id IS NOT NULL AND email_normalized IS NOT NULL"),
+        ),
+        Index(
+            "ux_leads_agency_id_phone",
+            "agency_id",
+            "phone_normalized",
+            unique=True,
+            postgresql_where=text("agency_id IS NOT NULL AND email_normalized IS NULL AND phone_normalized IS NOT NULL"),
+        ),
+        # Callers are looked up by phone whether or not their lead has an email
+        Index(
+            "ix_leads_agency_id_phone",
+            "agency_id",
+            "phone_normalized",
+            postgresql_where=text("phone_normalized IS NOT NULL"),
+        ),
     )
 
     def __repr__(self) -> str:
@@ -0,0 +1,19 @@
+from typing import Any
+
+from sqlalchemy import LargeBinary, TypeDecorator
+
+from utils.transcript import pack_transcript, unpack_transcript
+
+
+class PackedTranscript(TypeDecorator):
+    """Transcript turns stored as bytea, see utils.transcript."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value: list[dict] | bytes | None, dialect: Any) -> bytes | None:
+        # Bytes are already packed
+        return value if isinstance(value, bytes) else pack_transcript(value)
+
+    def process_result_value(self, value: bytes | None, dialect: Any) -> list[dict] | None:
+        return unpack_transcript(value)
@@ -0,0 +1,226 @@
+#####################################################################################################
+"""
+Monthly range partitions of the conversations table.
+
+Partitions are named conversations_yYYYYmMM and hold the UTC month of started_at. Upcoming
+months are created ahead of time, expired months are detached and dropped (or moved to the
+archive schema) as a whole instead of deleting their rows. Rows of a month without a partition
+(a skewed clock, maintenance down at a month boundary) land in conversations_default instead
+of failing the insert. Maintenance creates the partitions of their months and moves them there. Functions take a sync Connection,
+for use with AsyncConnection.run_sync.
+
+A table created before partitioning is converted once with:
+    uv run python -m db.partitioning migrate
+"""
+import re
+from datetime import datetime, timezone
+from typing import Final
+
+from sqlalchemy import Connection, text
+
+from db.models.base import add_missing_columns
+from db.models.conversation import Conversation
+
+#####################################################################################################
+
+ARCHIVE_SCHEMA: Final = 'conversation_archive'
+
+_TABLE: Final = Conversation.__tablename__
+_LEGACY_TABLE: Final = f'{_TABLE}_unpartitioned'
+DEFAULT_PARTITION: Final = f'{_TABLE}_default'
+_PARTITION_RE: Final = re.compile(rf'^{_TABLE}_y(\d{{4}})m(\d{{2}})$')
+
+#####################################################################################################
+
+def month_start(moment: datetime) -> datetime:
+    """First instant of the UTC month of the moment."""
+    moment = moment.astimezone(timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+def partition_name(month: datetime) -> str:
+    return f'{_TABLE}_y{month.year:04d}m{month.month:02d}'
+
+#####################################################################################################
+
+def is_partitioned(connection: Connection) -> bool:
+    relkind = connection.execute(
+        text('SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)'),
+        {'table': _TABLE},
+    ).scalar()
+    return relkind == 'p'
+
+def list_partitions(connection: Connection) -> list[datetime]:
+    """Months of the attached partitions, oldest first."""
+    names = connection.execute(
+        text("""
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(:table)
+        """),
+        {'table': _TABLE},
+    ).scalars()
+    months = []
+    for name in names:
+        match = _PARTITION_RE.match(name)
+        if match:
+            months.append(datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc))
+    return sorted(months)
+
+def create_default_partition(connection: Connection) -> None:
+    connection.execute(text(f'CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {_TABLE} DEFAULT'))
+
+def count_default_rows(connection: Connection) -> int:
+    """Rows in the default partition, they wait for the partitions of their months."""
+    if connection.execute(text('SELECT to_regclass(:table)'), {'table': DEFAULT_PARTITION}).scalar() is None:
+        return 0
+    return connection.execute(text(f'SELECT count(*) FROM {DEFAULT_PARTITION}')).scalar()
+
+def _default_row_months(connection: Connection) -> list[datetime]:
+    months = connection.execute(text(
+        f"SELECT DISTINCT date_trunc('month', started_at AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION}"
+    )).scalars()
+    return sorted(month.replace(tzinfo=timezone.utc) for month in months)
+
+def create_partitions(connection: Connection, first: datetime, last: datetime) -> list[str]:
+    """
+    Creates missing partitions for the months from first to last inclusive and moves rows of
+    their months out of the default partition. Returns the created ones.
+    """
+    existing = set(list_partitions(connection))
+    default_has_rows = count_default_rows(connection) > 0
+    created = []
+    month = month_start(first)
+    while month <= last:
+        if month not in existing:
+            name = partition_name(month)
+            in_month = f"started_at >= '{month.isoformat()}' AND started_at < '{add_months(month, 1).isoformat()}'"
+            # A partition can not be created while the default one holds rows of its month
+            moved = default_has_rows and connection.execute(text(
+                f'SELECT EXISTS (SELECT FROM {DEFAULT_PARTITION} WHERE {in_month})'
+            )).scalar()
+            if moved:
+                connection.execute(text(f'ALTER TABLE {_TABLE} DETACH PARTITION {DEFAULT_PARTITION}'))
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {_TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            ))
+            if moved:
+                columns = ', '.join(column.name for column in Conversation.__table__.columns)
+                connection.execute(text(
+                    f'INSERT INTO {_TABLE} ({columns}) SELECT {columns} FROM {DEFAULT_PARTITION} WHERE {in_month}'
+                ))
+                connection.execute(text(f'DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}'))
+                connection.execute(text(f'ALTER TABLE {_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT'))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+def ensure_partitions(connection: Connection, months_ahead: int, now: datetime | None = None) -> list[str] | None:
+    """
+    Creates the default partition, partitions of the current month and months_ahead months
+    after it and of the months of rows in the default partition.
+    Returns the created ones, None when the table is not partitioned yet.
+    """
+    if not is_partitioned(connection):
+        return None
+    create_default_partition(connection)
+    current = month_start(now or datetime.now(timezone.utc))
+    created = create_partitions(connection, current, add_months(current, months_ahead))
+    for month in _default_row_months(connection):
+        created.extend(create_partitions(connection, month, month))
+    return created
+
+def drop_partitions_before(connection: Connection, before: datetime, archive: bool = False) -> list[str]:
+    """
+    Detaches partitions of the months ending by before and drops them, or moves them to the
+    archive schema. Returns the names of the removed partitions.
+    """
+    removed = []
+    if archive:
+        connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}'))
+    for month in list_partitions(connection):
+        if add_months(month, 1) > before:
+            break
+        name = partition_name(month)
+        connection.execute(text(f'ALTER TABLE {_TABLE} DETACH PARTITION {name}'))
+        if archive:
+            connection.execute(text(f'ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}'))
+        else:
+            connection.execute(text(f'DROP TABLE {name}'))
+        removed.append(name)
+    return removed
+
+#####################################################################################################
+
+def migrate_to_partitions(connection: Connection, months_ahead: int) -> int | None:
+    """
+    Converts the conversations table created before partitioning. Call in one transaction:
+    the old table is renamed, a partitioned one is created with partitions from its oldest
+    month, rows are copied over and the old table is dropped.
+    Returns the number of copied rows, None when there was nothing to convert.
+    """
+    if connection.execute(text('SELECT to_regclass(:table)'), {'table': _TABLE}).scalar() is None:
+        return None
+    if is_partitioned(connection):
+        return None
+    missing_started_at = connection.execute(text(f'SELECT count(*) FROM {_TABLE} WHERE started_at IS NULL')).scalar()
+    if missing_started_at:
+        raise RuntimeError(f'{missing_started_at} conversations have no started_at, they can not be partitioned')
+
+    add_missing_columns(connection)
+    # Names of indexes and the sequence would clash with the new table
+    connection.execute(text(f'ALTER TABLE {_TABLE} RENAME TO {_LEGACY_TABLE}'))
+    connection.execute(text(f'ALTER TABLE {_LEGACY_TABLE} RENAME CONSTRAINT {_TABLE}_pkey TO {_LEGACY_TABLE}_pkey'))
+    connection.execute(text(f'ALTER TABLE {_LEGACY_TABLE} DROP CONSTRAINT IF EXISTS {_TABLE}_lead_id_key'))
+    connection.execute(text(f'ALTER SEQUENCE IF EXISTS {_TABLE}_id_seq RENAME TO {_LEGACY_TABLE}_id_seq'))
+    for index in Conversation.__table__.indexes:
+        connection.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+
+    Conversation.__table__.create(connection)
+    oldest = connection.execute(text(f'SELECT min(started_at) FROM {_LEGACY_TABLE}')).scalar()
+    current = month_start(datetime.now(timezone.utc))
+    create_partitions(connection, min(oldest, current) if oldest else current, add_months(current, months_ahead))
+    create_default_partition(connection)
+
+    columns = ', '.join(column.name for column in Conversation.__table__.columns)
+    copied = connection.execute(text(
+        f'INSERT INTO {_TABLE} ({columns}) SELECT {columns} FROM {_LEGACY_TABLE}'
+    )).rowcount
+    connection.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{_TABLE}', 'id'), "
+        f"coalesce(max(id), 1), max(id) IS NOT NULL) FROM {_TABLE}"
+    ))
+    connection.execute(text(f'DROP TABLE {_LEGACY_TABLE}'))
+    return copied
+
+#####################################################################################################
+
+async def _migrate() -> None:
+    from dotenv import load_dotenv
+
+    from configs.settings import AppSettings
+    from db.connection.engine import create_db_engine
+
+    load_dotenv()
+    app_settings = AppSettings()
+    engine = create_db_engine(app_settings)
+    try:
+        async with engine.begin() as connection:
+            copied = await connection.run_sync(migrate_to_partitions, app_settings.conversation_partitions_ahead)
+    finally:
+        await engine.dispose()
+    print('Nothing to migrate' if copied is None else f'Moved {copied} conversations into monthly partitions')
+
+if __name__ == '__main__':
+    import asyncio
+    from sys import argv
+
+    if argv[1:] != ['migrate']:
+        raise SystemExit('Usage: python -m db.partitioning migrate')
+    asyncio.run(_migrate())
+
+#####################################################################################################
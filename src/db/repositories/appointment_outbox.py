@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Sequence
+
+from sqlalchemy import func, select, update
+
+from db.models.appointment_outbox import AppointmentOutbox
+from db.models.enums import OutboxStatus
+from db.repositories.base import AbstractRepository
+from db.repositories.lead import LeadRepository
+from schema.lead import LeadInfo
+
+
+class AppointmentOutboxRepository(AbstractRepository):
+
+    async def create(self, payload: dict, lead_id: Any | None = None) -> AppointmentOutbox:
+        entry = AppointmentOutbox(payload=payload, lead_id=lead_id)
+        self.session.add(entry)
+        await self.session.commit()
+        return entry
+
+    async def create_with_lead(
+        self,
+        payload: dict,
+        lead: LeadInfo,
+        agency_id: str | None,
+    ) -> tuple[str, AppointmentOutbox]:
+        """
+        Stores the lead, or updates the known one with the same contact, and its pending
+        appointment in one transaction. Returns id of the lead and the entry.
+        """
+        lead_id = await LeadRepository(self.session).upsert(lead, agency_id)
+        entry = AppointmentOutbox(payload=payload, lead_id=lead_id)
+        self.session.add(entry)
+        await self.session.commit()
+        return lead_id, entry
+
+    async def get_by_id(self, id: Any) -> AppointmentOutbox | None:
+        stmt = select(AppointmentOutbox).where(AppointmentOutbox.id == id)
+        entry = await self.session.execute(stmt)
+        return entry.scalar_one_or_none()
+
+    async def get_list(self, limit: int = 10, offset: int = 0) -> Sequence[AppointmentOutbox]:
+        stmt = select(AppointmentOutbox).order_by(AppointmentOutbox.id.desc()).offset(offset).limit(limit)
+        entries = await self.session.execute(stmt)
+        return entries.scalars().all()
+
+    async def claim_batch(self, limit: int, lease: timedelta) -> Sequence[AppointmentOutbox]:
+        """
+        Takes due pending entries and moves their next attempt forward by the lease, so other
+        workers skip them while they are being delivered. Row locks are released on commit.
+        """
+        now = datetime.now(timezone.utc)
+        due = (
+            select(AppointmentOutbox.id)
+            .where(AppointmentOutbox.status == OutboxStatus.PENDING, AppointmentOutbox.next_attempt_at <= now)
+            .order_by(AppointmentOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(AppointmentOutbox)
+            .where(AppointmentOutbox.id.in_(due.scalar_subquery()))
+            .values(next_attempt_at=now + lease, attempts=AppointmentOutbox.attempts + 1)
+            .returning(AppointmentOutbox)
+        )
+        entries = await self.session.execute(stmt)
+        claimed = entries.scalars().all()
+        await self.session.commit()
+        return claimed
+
+    async def mark_delivered(self, ids: Sequence[int]) -> None:
+        if not ids:
+            return
+        stmt = (
+            update(AppointmentOutbox)
+            .where(AppointmentOutbox.id.in_(ids))
+            .values(status=OutboxStatus.DELIVERED, delivered_at=datetime.now(timezone.utc), last_error=None)
+        )
+        await self.session.execute(stmt)
+
+    async def mark_attempt_failed(self, id: int, error: str, next_attempt_at: datetime | None) -> None:
+        """Schedules a retry, or marks the entry as failed when next_attempt_at is None."""
+        values: dict[str, Any] = {'last_error': error}
+        if next_attempt_at is None:
+            values['status'] = OutboxStatus.FAILED
+        else:
+            values['next_attempt_at'] = next_attempt_at
+        stmt = update(AppointmentOutbox).where(AppointmentOutbox.id == id).values(**values)
+        await self.session.execute(stmt)
+
+    async def get_status_summary(self) -> tuple[dict[OutboxStatus, int], datetime | None]:
+        """Count of entries per status and creation time of the oldest pending entry."""
+        counts_stmt = select(AppointmentOutbox.status, func.count()).group_by(AppointmentOutbox.status)
+        counts = {OutboxStatus(status): count for status, count in (await self.session.execute(counts_stmt)).all()}
+        oldest_stmt = select(func.min(AppointmentOutbox.created_at)).where(
+            AppointmentOutbox.status == OutboxStatus.PENDING
+        )
+        oldest = (await self.session.execute(oldest_stmt)).scalar_one_or_none()
+        return counts, oldest
+
+    async def delete(self, id: Any):
+        pass
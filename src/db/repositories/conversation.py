@@ -1,12 +1,14 @@
 from datetime import datetime
-from typing import Any
+from typing import Any, AsyncIterator, Mapping
 
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from sqlalchemy import Row, delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.orm import joinedload, undefer
 from typing import Sequence
 
 from db.models.conversation import Conversation
+from db.models.conversation_search import ConversationSearch
 from db.models.enums import ConversationPurpose
+from db.models.lead import Lead
 from db.repositories.base import AbstractRepository
 
 
@@ -21,7 +23,8 @@ class ConversationRepository(AbstractRepository):
         lead_created: bool,
         tool_calls: list[str],
         transcript: list[dict],
-        lead_id: int
+        lead_id: int,
+        agency_id: str | None = None,
     ) -> Conversation:
         conversation = Conversation(
             duration=duration,
@@ -30,19 +33,34 @@ class ConversationRepository(AbstractRepository):
             purpose=purpose,
             lead_created=lead_created,
             tool_calls=tool_calls,
-            transcript=transcript,
+            transcript_packed=transcript,
             lead_id=lead_id,
+            agency_id=agency_id,
         )
         self.session.add(conversation)
         await self.session.commit()
         return conversation
 
-    async def get_by_id(self, id: Any) -> Conversation | None:
+    async def create_many(self, conversations: Sequence[Mapping[str, Any]]) -> list[int]:
+        """
+        Inserts the conversations (column values) with multi-row statements without commit.
+        Returns their ids in the order of the conversations.
+        """
+        if not conversations:
+            return []
+        stmt = insert(Conversation).returning(Conversation.id, sort_by_parameter_order=True)
+        ids = await self.session.execute(stmt, list(conversations))
+        return list(ids.scalars())
+
+    async def get_by_id(self, id: Any, started_at: datetime | None = None) -> Conversation | None:
+        """With started_at only its monthly partition is searched, not every one."""
         stmt = (
             select(Conversation)
             .where(Conversation.id == id)
-            .options(joinedload(Conversation.lead))
+            .options(joinedload(Conversation.lead), undefer(Conversation.transcript))
         )
+        if started_at is not None:
+            stmt = stmt.where(Conversation.started_at == started_at)
         conversation = await self.session.execute(stmt)
         return conversation.scalar_one_or_none()
 
@@ -57,5 +75,136 @@ class ConversationRepository(AbstractRepository):
         conversations = await self.session.execute(stmt)
         return conversations.scalars().all()
 
+    async def get_page(
+        self,
+        limit: int,
+        after: tuple[datetime, int] | None = None,
+        purpose: ConversationPurpose | None = None,
+        lead_created: bool | None = None,
+        started_from: datetime | None = None,
+        started_to: datetime | None = None,
+        include_transcript: bool = False,
+    ) -> Sequence[Row]:
+        """
+        Newest first page of conversations after the (started_at, id) keyset. Only list columns
+        and the lead are selected, transcript only when asked for.
+        """
+        columns = [
+            Conversation.id,
+            Conversation.duration,
+            Conversation.started_at,
+            Conversation.topic,
+            Conversation.purpose,
+            Conversation.lead_created,
+            Conversation.tool_calls,
+            Conversation.agency_id,
+            Lead.id.label('lead_id'),
+            Lead.name.label('lead_name'),
+            Lead.email.label('lead_email'),
+            Lead.phone.label('lead_phone'),
+        ]
+        if include_transcript:
+            columns.append(Conversation.transcript)
+        stmt = select(*columns).outerjoin(Lead, Conversation.lead_id == Lead.id)
+        if after is not None:
+            stmt = stmt.where(tuple_(Conversation.started_at, Conversation.id) < tuple_(*after))
+        if purpose is not None:
+            stmt = stmt.where(Conversation.purpose == purpose)
+        if lead_created is not None:
+            stmt = stmt.where(Conversation.lead_created == lead_created)
+        if started_from is not None:
+            stmt = stmt.where(Conversation.started_at >= started_from)
+        if started_to is not None:
+            stmt = stmt.where(Conversation.started_at < started_to)
+        stmt = stmt.order_by(Conversation.started_at.desc(), Conversation.id.desc()).limit(limit)
+        conversations = await self.session.execute(stmt)
+        return conversations.all()
+
+    async def stream_for_stats(
+        self,
+        started_from: datetime | None,
+        started_to: datetime | None,
+        batch_size: int,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """Batches of the columns the analytics rollups are built from, read by a server-side cursor."""
+        stmt = select(
+            Conversation.agency_id,
+            Conversation.started_at,
+            Conversation.duration,
+            Conversation.purpose,
+            Conversation.lead_created,
+            Conversation.tool_calls,
+        ).where(Conversation.agency_id.is_not(None))
+        if started_from is not None:
+            stmt = stmt.where(Conversation.started_at >= started_from)
+        if started_to is not None:
+            stmt = stmt.where(Conversation.started_at < started_to)
+        result = await self.session.stream(stmt.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+
+    async def get_unindexed(self, after_id: int, limit: int) -> Sequence[Row]:
+        """Conversations (id, agency_id, started_at, transcript) without a search document, by id."""
+        stmt = (
+            select(Conversation.id, Conversation.agency_id, Conversation.started_at, Conversation.transcript)
+            .outerjoin(ConversationSearch, ConversationSearch.conversation_id == Conversation.id)
+            .where(ConversationSearch.conversation_id.is_(None), Conversation.id > after_id)
+            .order_by(Conversation.id)
+            .limit(limit)
+        )
+        conversations = await self.session.execute(stmt)
+        return conversations.all()
+
+    async def get_unpacked(self, after_id: int, limit: int) -> Sequence[Row]:
+        """
+        Conversations (id, started_at, transcript, stored_bytes) with a plain JSON transcript,
+        by id. stored_bytes is the size the transcript takes on disk.
+        """
+        stmt = (
+            select(
+                Conversation.id,
+                Conversation.started_at,
+                Conversation.transcript_json.label('transcript'),
+                func.pg_column_size(Conversation.transcript_json).label('stored_bytes'),
+            )
+            .where(
+                Conversation.transcript_json.is_not(None),
+                # JSON null was written by packing before the column kept None as SQL NULL
+                func.json_typeof(Conversation.transcript_json) != 'null',
+                Conversation.id > after_id,
+            )
+            .order_by(Conversation.id)
+            .limit(limit)
+        )
+        conversations = await self.session.execute(stmt)
+        return conversations.all()
+
+    async def set_packed_transcripts(self, transcripts: Sequence[tuple[int, datetime, bytes]]) -> None:
+        """Replaces plain transcripts of the conversations (id, started_at, packed) without commit."""
+        if transcripts:
+            await self.session.execute(update(Conversation), [
+                {'id': id, 'started_at': started_at, 'transcript_packed': packed, 'transcript_json': None}
+                for id, started_at, packed in transcripts
+            ])
+
+    async def delete_started_before(
+        self,
+        before: datetime,
+        agency_ids: Sequence[str] | None = None,
+        keep_agency_ids: Sequence[str] = (),
+    ) -> int:
+        """
+        Deletes rows started before the moment without commit, of the agencies when given,
+        otherwise of all agencies but the kept ones (rows without agency included).
+        Returns the number of deleted rows.
+        """
+        stmt = delete(Conversation).where(Conversation.started_at < before)
+        if agency_ids is not None:
+            stmt = stmt.where(Conversation.agency_id.in_(agency_ids))
+        elif keep_agency_ids:
+            stmt = stmt.where(or_(Conversation.agency_id.is_(None), Conversation.agency_id.not_in(keep_agency_ids)))
+        result = await self.session.execute(stmt)
+        return result.rowcount
+
     async def delete(self, id: Any):
         pass
@@ -0,0 +1,100 @@
+from datetime import datetime
+from typing import Any, Mapping, Sequence
+
+from sqlalchemy import Row, Select, delete, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert, to_tsquery, ts_headline
+
+from db.models.conversation_search import ConversationSearch
+from db.repositories.base import AbstractRepository
+from utils.search import SEARCH_CONFIG
+
+_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=20, MinWords=8, MaxFragments=2, FragmentDelimiter=" … "'
+
+
+class ConversationSearchRepository(AbstractRepository):
+
+    async def create(self, rows: Sequence[Mapping[str, Any]]) -> None:
+        """Inserts search documents (conversation_id, agency_id, started_at, user_text, assistant_text) without commit."""
+        if rows:
+            await self.session.execute(insert(ConversationSearch).values(list(rows)).on_conflict_do_nothing())
+
+    @staticmethod
+    def search_statement(
+        tsquery: str,
+        limit: int,
+        after: tuple[datetime, int] | None = None,
+        snippet_from: str | None = None,
+        agency_id: str | None = None,
+        started_from: datetime | None = None,
+        started_to: datetime | None = None,
+    ) -> Select:
+        """
+        Newest first page of matching conversations with highlighted snippets. tsquery is
+        to_tsquery text, see utils.search.build_tsquery. Snippets come from snippet_from
+        ('user_text' or 'assistant_text') or from both texts.
+        """
+        query = to_tsquery(SEARCH_CONFIG, tsquery)
+        page = select(
+            ConversationSearch.conversation_id,
+            ConversationSearch.agency_id,
+            ConversationSearch.started_at,
+            ConversationSearch.user_text,
+            ConversationSearch.assistant_text,
+        ).where(ConversationSearch.document.bool_op('@@')(query))
+        if after is not None:
+            page = page.where(tuple_(ConversationSearch.started_at, ConversationSearch.conversation_id) < tuple_(*after))
+        if agency_id is not None:
+            page = page.where(ConversationSearch.agency_id == agency_id)
+        if started_from is not None:
+            page = page.where(ConversationSearch.started_at >= started_from)
+        if started_to is not None:
+            page = page.where(ConversationSearch.started_at < started_to)
+        page = (
+            page.order_by(ConversationSearch.started_at.desc(), ConversationSearch.conversation_id.desc())
+            .limit(limit)
+            .subquery()
+        )
+        # Snippets are costly, they are made only for the rows of the page
+        if snippet_from is not None:
+            text = page.c[snippet_from]
+        else:
+            text = page.c.user_text + '\n' + page.c.assistant_text
+        return select(
+            page.c.conversation_id.label('id'),
+            page.c.agency_id,
+            page.c.started_at,
+            ts_headline(SEARCH_CONFIG, text, query, _HEADLINE_OPTIONS).label('snippet'),
+        ).order_by(page.c.started_at.desc(), page.c.conversation_id.desc())
+
+    async def search(self, tsquery: str, limit: int, **filters: Any) -> Sequence[Row]:
+        """Rows (id, agency_id, started_at, snippet), see search_statement for the arguments."""
+        hits = await self.session.execute(self.search_statement(tsquery, limit, **filters))
+        return hits.all()
+
+    async def get_by_id(self, id: Any) -> ConversationSearch | None:
+        return await self.session.get(ConversationSearch, id)
+
+    async def get_list(self, *args, **kwargs):
+        pass
+
+    async def delete_started_before(
+        self,
+        before: datetime,
+        agency_ids: Sequence[str] | None = None,
+        keep_agency_ids: Sequence[str] = (),
+    ) -> int:
+        """
+        Deletes rows started before the moment without commit, of the agencies when given,
+        otherwise of all agencies but the kept ones (rows without agency included).
+        Returns the number of deleted rows.
+        """
+        stmt = delete(ConversationSearch).where(ConversationSearch.started_at < before)
+        if agency_ids is not None:
+            stmt = stmt.where(ConversationSearch.agency_id.in_(agency_ids))
+        elif keep_agency_ids:
+            stmt = stmt.where(or_(ConversationSearch.agency_id.is_(None), ConversationSearch.agency_id.not_in(keep_agency_ids)))
+        result = await self.session.execute(stmt)
+        return result.rowcount
+
+    async def delete(self, id: Any):
+        pass
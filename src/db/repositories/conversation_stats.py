@@ -0,0 +1,83 @@
+from datetime import date
+from typing import Any, Mapping, Sequence
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from db.models.conversation_stats import ConversationDailyStats
+from db.repositories.base import AbstractRepository
+
+# Element-wise sum of the bucket arrays and per key sum of the tool call counters
+_ADD_DURATION_BUCKETS = text(
+    "ARRAY(SELECT coalesce(a, 0) + coalesce(b, 0)"
+    " FROM unnest(conversation_daily_stats.duration_buckets, excluded.duration_buckets)"
+    " WITH ORDINALITY AS t(a, b, n) ORDER BY n)"
+)
+_ADD_TOOL_CALLS = text(
+    "(SELECT coalesce(jsonb_object_agg(key, total), '{}'::jsonb) FROM ("
+    "SELECT key, sum(value::int) AS total FROM ("
+    "SELECT * FROM jsonb_each_text(conversation_daily_stats.tool_calls)"
+    " UNION ALL SELECT * FROM jsonb_each_text(excluded.tool_calls)"
+    ") AS calls GROUP BY key) AS totals)"
+)
+
+
+class ConversationStatsRepository(AbstractRepository):
+
+    async def create(self, rows: Sequence[Mapping[str, Any]]) -> None:
+        """Inserts rollup rows without commit."""
+        if rows:
+            await self.session.execute(insert(ConversationDailyStats).values(list(rows)))
+
+    async def increment(self, rows: Sequence[Mapping[str, Any]]) -> None:
+        """Adds the rows to the stored rollups, missing ones are created. Keys must be unique. No commit."""
+        if not rows:
+            return
+        stmt = insert(ConversationDailyStats).values(list(rows))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ConversationDailyStats.agency_id, ConversationDailyStats.day],
+            set_={
+                'conversations': ConversationDailyStats.conversations + stmt.excluded.conversations,
+                'duration_sum': ConversationDailyStats.duration_sum + stmt.excluded.duration_sum,
+                'duration_buckets': _ADD_DURATION_BUCKETS,
+                'viewing': ConversationDailyStats.viewing + stmt.excluded.viewing,
+                'valuation': ConversationDailyStats.valuation + stmt.excluded.valuation,
+                'leads_created': ConversationDailyStats.leads_created + stmt.excluded.leads_created,
+                'tool_calls': _ADD_TOOL_CALLS,
+            },
+        )
+        await self.session.execute(stmt)
+
+    async def lock_for_rebuild(self) -> None:
+        """
+        Blocks increments until commit. Writers that are not done yet wait, and their
+        conversations are not visible to the rebuild, so nothing is counted twice.
+        """
+        await self.session.execute(text("LOCK TABLE conversation_daily_stats IN EXCLUSIVE MODE"))
+
+    async def delete_range(self, date_from: date | None, date_to: date | None) -> None:
+        stmt = delete(ConversationDailyStats)
+        if date_from is not None:
+            stmt = stmt.where(ConversationDailyStats.day >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(ConversationDailyStats.day <= date_to)
+        await self.session.execute(stmt)
+
+    async def get_by_id(self, id: tuple[str, date]) -> ConversationDailyStats | None:
+        return await self.session.get(ConversationDailyStats, id)
+
+    async def get_list(self, agency_id: str, date_from: date, date_to: date) -> Sequence[ConversationDailyStats]:
+        stmt = (
+            select(ConversationDailyStats)
+            .where(
+                ConversationDailyStats.agency_id == agency_id,
+                ConversationDailyStats.day >= date_from,
+                ConversationDailyStats.day <= date_to,
+            )
+            .order_by(ConversationDailyStats.day)
+        )
+        stats = await self.session.execute(stmt)
+        return stats.scalars().all()
+
+    async def delete(self, id: Any):
+        pass
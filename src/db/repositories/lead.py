@@ -1,19 +1,144 @@
-
-
-from typing import Any
-from sqlalchemy import select
+import uuid
+from typing import Any, Sequence
+from sqlalchemy import ColumnElement, Row, and_, func, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from db.models.conversation import Conversation
 from db.models.lead import Lead
 from db.repositories.base import AbstractRepository
+from schema.lead import LeadInfo
+from utils.contacts import normalize_email, normalize_phone
+
+
+def _merge(stored: dict | None, row: dict) -> dict:
+    # One row per key, a statement can not update the same lead twice. Later details win
+    if stored is None:
+        return row
+    return {**stored, **{column: value for column, value in row.items() if value is not None}}
 
 
 class LeadRepository(AbstractRepository):
 
     async def create(self, name: str, email: str | None, phone: str | None) -> Lead:
-        lead = Lead(name=name, email=email, phone=phone)
+        lead = Lead(
+            name=name,
+            email=email,
+            phone=phone,
+            email_normalized=normalize_email(email),
+            phone_normalized=normalize_phone(phone),
+        )
         self.session.add(lead)
         await self.session.commit()
         return lead
 
+    async def upsert(self, lead: LeadInfo, agency_id: str | None) -> str:
+        """Stores the lead or updates the one of the agency with the same email or phone without commit. Returns its id."""
+        return (await self.upsert_many([lead], [agency_id]))[0]
+
+    async def upsert_many(self, leads: Sequence[LeadInfo], agency_ids: Sequence[str | None]) -> list[str]:
+        """
+        Stores the leads without commit, a lead of the agency with the same email (or phone
+        when there is no email) gets the new details instead. One statement per kind of key.
+        Returns ids of the leads in the same order.
+        """
+        by_email: dict[tuple, dict] = {}
+        by_phone: dict[tuple, dict] = {}
+        keyless = []
+        keys = []
+        for lead, agency_id in zip(leads, agency_ids):
+            # Ids are generated here, so new leads need not be matched back from RETURNING
+            row = {
+                'id': str(uuid.uuid4()),
+                'name': lead.name,
+                'email': lead.email,
+                'phone': lead.phone,
+                'agency_id': agency_id,
+                'email_normalized': normalize_email(lead.email),
+                'phone_normalized': normalize_phone(lead.phone),
+            }
+            if agency_id is not None and row['email_normalized'] is not None:
+                key = ('email', agency_id, row['email_normalized'])
+                by_email[key] = _merge(by_email.get(key), row)
+            elif agency_id is not None and row['phone_normalized'] is not None:
+                key = ('phone', agency_id, row['phone_normalized'])
+                by_phone[key] = _merge(by_phone.get(key), row)
+            else:
+                key = row['id']
+                keyless.append(row)
+            keys.append(key)
+
+        ids: dict[Any, str] = {row['id']: row['id'] for row in keyless}
+        if keyless:
+            await self.session.execute(insert(Lead), keyless)
+        if by_email:
+            ids.update(await self._upsert(
+                'email',
+                by_email,
+                Lead.email_normalized,
+                # Predicates of the partial unique indexes, see the model
+                and_(Lead.agency_id.is_not(None), Lead.email_normalized.is_not(None)),
+            ))
+        if by_phone:
+            ids.update(await self._upsert(
+                'phone',
+                by_phone,
+                Lead.phone_normalized,
+                and_(Lead.agency_id.is_not(None), Lead.email_normalized.is_(None), Lead.phone_normalized.is_not(None)),
+            ))
+        return [ids[key] for key in keys]
+
+    async def _upsert(self, kind: str, rows: dict[tuple, dict], key_column, index_where: ColumnElement) -> dict[tuple, str]:
+        stmt = pg_insert(Lead).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Lead.agency_id, key_column],
+            index_where=index_where,
+            set_={
+                'name': stmt.excluded.name,
+                'email': func.coalesce(stmt.excluded.email, Lead.email),
+                'phone': func.coalesce(stmt.excluded.phone, Lead.phone),
+                'phone_normalized': func.coalesce(stmt.excluded.phone_normalized, Lead.phone_normalized),
+            },
+        ).returning(Lead.id, Lead.agency_id, key_column)
+        result = await self.session.execute(stmt)
+        return {(kind, agency_id, key): id for id, agency_id, key in result.tuples()}
+
+    async def find_by_contact(
+        self,
+        agency_id: str,
+        email_normalized: str | None,
+        phone_normalized: str | None,
+        limit: int,
+    ) -> Sequence[Row]:
+        """
+        Leads of the agency with the email or phone and their latest conversations, newest
+        first. Rows are (lead_id, name, email, phone, conversation_id, started_at, topic,
+        purpose), conversation columns are None for leads without conversations.
+        """
+        contact = []
+        if email_normalized is not None:
+            contact.append(Lead.email_normalized == email_normalized)
+        if phone_normalized is not None:
+            contact.append(Lead.phone_normalized == phone_normalized)
+        if not contact:
+            return []
+        stmt = (
+            select(
+                Lead.id.label('lead_id'),
+                Lead.name,
+                Lead.email,
+                Lead.phone,
+                Conversation.id.label('conversation_id'),
+                Conversation.started_at,
+                Conversation.topic,
+                Conversation.purpose,
+            )
+            .outerjoin(Conversation, Conversation.lead_id == Lead.id)
+            .where(Lead.agency_id == agency_id, or_(*contact))
+            .order_by(Conversation.started_at.desc().nulls_last())
+            .limit(limit)
+        )
+        rows = await self.session.execute(stmt)
+        return rows.all()
+
     async def get_by_id(self, id: Any) -> Lead | None:
         stmt = select(Lead).where(Lead.id == id)
         lead = await self.session.execute(stmt)
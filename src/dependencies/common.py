@@ -1,4 +1,4 @@
-from fastapi import Depends, Request, WebSocket
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import App
@@ -13,10 +13,5 @@ async def get_db(request: Request) -> AsyncSession:
     async with session_manager.connect() as session:
         yield session
 
-async def get_ws_db(websocket: WebSocket) -> AsyncSession:
-    session_manager = websocket.app.db_manager
-    async with session_manager.connect() as session:
-        yield session
-
 async def conv_repository(db_session: AsyncSession = Depends(get_db)) -> ConversationRepository:
     return ConversationRepository(db_session)
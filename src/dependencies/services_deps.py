@@ -1,9 +1,44 @@
-from fastapi import Depends
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from dependencies.common import get_db
 from services.agency import AgencyService
+from services.analytics import AnalyticsService
+from services.appointment_outbox import AppointmentOutboxService
+from services.conversation_detail import ConversationDetailCache
+from services.conversation_export import ConversationExportService
+from services.conversation_search import ConversationSearchService
+from services.prompts import PromptService
+from services.transcript_storage import TranscriptStorageService
 
 
-def get_agency_service(session: AsyncSession = Depends(get_db)) -> AgencyService:
-    return AgencyService(session=session)
+def get_agency_service(request: Request, session: AsyncSession = Depends(get_db)) -> AgencyService:
+    return AgencyService(session=session, prompt_builder=request.app.prompt_service.builder)
+
+
+def get_appointment_outbox_service(request: Request) -> AppointmentOutboxService:
+    return request.app.appointment_outbox
+
+
+def get_prompt_service(request: Request) -> PromptService:
+    return request.app.prompt_service
+
+
+def get_conversation_export_service(request: Request) -> ConversationExportService:
+    return request.app.conversation_export
+
+
+def get_analytics_service(request: Request) -> AnalyticsService:
+    return request.app.analytics
+
+
+def get_conversation_search_service(request: Request) -> ConversationSearchService:
+    return request.app.conversation_search
+
+
+def get_transcript_storage_service(request: Request) -> TranscriptStorageService:
+    return request.app.transcript_storage
+
+
+def get_conversation_detail_cache(request: Request) -> ConversationDetailCache:
+    return request.app.conversation_detail
@@ -3,12 +3,13 @@ from typing import Final
 
 import uvicorn
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 
 from api.routes import setup_routes
 from app import App
 from configs.logger import setup_logging
 from configs.settings import AppSettings
+from db.connection.engine import create_db_engine
 
 #####################################################################################################
 
@@ -21,8 +22,7 @@ async def run_server() -> None:
     load_dotenv()
     app_settings = AppSettings()
     LOGGER.info(app_settings)
-    # db_engine = create_async_engine(url=app_settings.postgres_async_dsn, echo=app_settings.dev_mode)
-    db_engine = create_async_engine(url=app_settings.postgres_async_dsn, echo=False)
+    db_engine = create_db_engine(app_settings)
     session_maker = async_sessionmaker(
             db_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
         )
@@ -104,14 +104,31 @@ class DeepgramAgentSettingsIn(BaseModel):
 
 #####################################################################################################
 
+class PromptSize(BaseModel):
+    """Estimated tokens the LLM gets on every turn before the conversation itself."""
+    instructions_tokens: int
+    functions_tokens: int
+    context_tokens: int
+    total_tokens: int
+
+#####################################################################################################
+
 class AgencySettings(BaseModel):
     audio: AudioSettings
     agent: DeepgramAgentSettings
+    # Not a part of Deepgram settings. Phrases spoken while a slow tool call is running
+    filler_phrases: list[str] | None = Field(default=None)
+    # Not a part of Deepgram settings. Estimated on agency build
+    prompt_size: PromptSize | None = Field(default=None)
+    # Not a part of Deepgram settings. Months of conversations to keep, app default when not set
+    retention_months: int | None = Field(default=None, ge=1)
 
 #####################################################################################################
 
 class AgencySettingsIn(BaseModel):
     agent: DeepgramAgentSettingsIn
+    filler_phrases: list[str] | None = Field(default=None)
+    retention_months: int | None = Field(default=None, ge=1)
 
 #####################################################################################################
 
@@ -153,3 +170,43 @@ class AgencyDetail(AgencyIn):
 
 class AgencyOut(AgencyIn):
     pass
+
+#####################################################################################################
+
+class AgencyListItemOut(BaseAgency):
+    # Only when asked for, settings hold the whole prompt
+    settings: AgencySettingsIn | None = None
+
+#####################################################################################################
+
+class AgencyPageOut(BaseModel):
+    items: list[AgencyListItemOut]
+    next_cursor: str | None
+
+#####################################################################################################
+
+class AgencyConfiguration(BaseModel):
+    """Everything a voice session needs from the agency on start."""
+    settings: dict[str, Any]
+    filler_phrases: list[str] | None = Field(default=None)
+
+#####################################################################################################
+
+class AgencySessionSettings(BaseModel):
+    """What a voice session sends to Deepgram on start, see utils.settings_frame."""
+    settings_frame: str
+    filler_phrases: list[str] | None = Field(default=None)
+
+#####################################################################################################
+
+class AgencyPromptSizeOut(BaseModel):
+    agency_id: UUID4
+    agency_name: str
+    prompt_size: PromptSize
+    over_threshold: bool
+
+#####################################################################################################
+
+class PromptSizeReportOut(BaseModel):
+    warning_threshold: int
+    agencies: list[AgencyPromptSizeOut]
@@ -0,0 +1,42 @@
+#####################################################################################################
+
+from datetime import date
+
+from pydantic import BaseModel, UUID4
+
+#####################################################################################################
+
+class ConversationStatsOut(BaseModel):
+    conversations: int
+    avg_duration: float | None
+    # Estimated from duration buckets
+    duration_p50: float | None
+    duration_p90: float | None
+    viewing: int
+    valuation: int
+    other: int
+    leads_created: int
+    lead_conversion_rate: float | None
+    tool_calls: dict[str, int]
+
+#####################################################################################################
+
+class DailyConversationStatsOut(ConversationStatsOut):
+    day: date
+
+#####################################################################################################
+
+class AgencyAnalyticsOut(BaseModel):
+    agency_id: UUID4
+    date_from: date
+    date_to: date
+    total: ConversationStatsOut
+    days: list[DailyConversationStatsOut]
+
+#####################################################################################################
+
+class AnalyticsBackfillOut(BaseModel):
+    conversations: int
+    days: int
+
+#####################################################################################################
@@ -0,0 +1,33 @@
+#####################################################################################################
+
+from datetime import datetime
+
+from pydantic import BaseModel, UUID4
+
+from db.models.enums import OutboxStatus
+
+#####################################################################################################
+
+class OutboxStatusOut(BaseModel):
+    pending: int
+    delivered: int
+    failed: int
+    lag_seconds: float
+
+#####################################################################################################
+
+class OutboxEntryOut(BaseModel):
+    id: int
+    idempotency_key: UUID4
+    lead_id: UUID4 | None
+    status: OutboxStatus
+    attempts: int
+    last_error: str | None
+    created_at: datetime
+    next_attempt_at: datetime
+    delivered_at: datetime | None
+
+    class Config:
+        from_attributes = True
+
+#####################################################################################################
@@ -10,3 +10,6 @@ class ClientJsonMessage(BaseModel):
     client_id: UUID4 | None
     dev_mode: bool = False
     dev_options: _DevOptions | None = None
+    # Contact of the caller when the client knows it (e.g. caller ID), for returning callers
+    caller_phone: str | None = None
+    caller_email: str | None = None
@@ -6,7 +6,7 @@ from typing import Literal
 from pydantic import BaseModel
 
 from db.models.enums import ConversationPurpose
-from schema.lead import LeadInfo, LeadOut
+from schema.lead import LeadInfo, LeadOut, ReturningCaller
 
 
 #####################################################################################################
@@ -21,12 +21,57 @@ class ConversationOut(BaseModel):
     tool_calls: list[str]
     transcript: list[dict]
     lead: LeadOut | None
+    agency_id: str | None = None
 
     class Config:
         from_attributes = True
 
 #####################################################################################################
 
+class ConversationListItemOut(BaseModel):
+    id: int
+    duration: int
+    started_at: datetime
+    topic: str | None
+    purpose: ConversationPurpose | None
+    lead_created: bool
+    tool_calls: list[str] | None
+    lead: LeadOut | None
+    agency_id: str | None
+    # Only when asked for, transcripts are large
+    transcript: list[dict] | None = None
+
+#####################################################################################################
+
+class ConversationPageOut(BaseModel):
+    items: list[ConversationListItemOut]
+    next_cursor: str | None
+
+#####################################################################################################
+
+class ConversationSearchHitOut(BaseModel):
+    id: int
+    agency_id: str | None
+    started_at: datetime
+    # Matches are wrapped in <mark></mark>
+    snippet: str
+
+#####################################################################################################
+
+class ConversationSearchPageOut(BaseModel):
+    items: list[ConversationSearchHitOut]
+    next_cursor: str | None
+
+#####################################################################################################
+
+class TranscriptPackReportOut(BaseModel):
+    conversations: int
+    # On disk, plain JSON may already be compressed by PostgreSQL when large
+    stored_bytes_before: int
+    stored_bytes_after: int
+
+#####################################################################################################
+
 class ConversationState(BaseModel):
     started_at: datetime
     topic: str | None = None
@@ -35,6 +80,10 @@ class ConversationState(BaseModel):
     tool_calls: set[str] = set()
     transcript: list[dict] = []
     lead_info: LeadInfo | None = None
+    # Set when the lead was already stored together with its appointment
+    lead_id: str | None = None
+    # Found by the contact the client sent on start
+    returning_caller: ReturningCaller | None = None
 
     def set_purpose_by_event_type(self, event_type: Literal['Viewing', 'Valuation']) -> None:
         match event_type:
@@ -1,5 +1,9 @@
+from datetime import datetime
+
 from pydantic import BaseModel, UUID4
 
+from db.models.enums import ConversationPurpose
+
 
 class LeadInfo(BaseModel):
     name: str
@@ -12,3 +16,17 @@ class LeadOut(LeadInfo):
 
     class Config:
         from_attributes = True
+
+
+class PriorConversation(BaseModel):
+    id: int
+    lead_id: UUID4
+    started_at: datetime
+    topic: str | None
+    purpose: ConversationPurpose | None
+
+
+class ReturningCaller(BaseModel):
+    """Known leads of a caller and their latest conversations, newest first."""
+    leads: list[LeadOut]
+    conversations: list[PriorConversation]
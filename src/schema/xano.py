@@ -35,6 +35,23 @@ class SearchPropertyResponse(BaseModel):
 class SearchPropertyAgentFormat(BaseModel):
     items: list[SearchPropertyItemAgentFormat]
 
+
+class PropertySyncItem(SearchPropertyItemXanoFormat):
+    updated_at: int | None = None
+    deleted: bool = False
+
+
+class PropertySyncRequest(BaseModel):
+    agency_id: str
+    updated_after: int | None
+    page: int
+    per_page: int
+
+
+class PropertySyncResponse(BaseModel):
+    items: list[PropertySyncItem]
+    nextPage: int | None = None
+
 #####################################################################################################
 
 class TimeSlot(BaseModel):
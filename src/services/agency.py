@@ -5,10 +5,13 @@
 #####################################################################################################
 
 from datetime import datetime
-from typing import Final, Any
+from uuid import UUID
+from typing import Final
 
+import orjson
 from fastapi import HTTPException
-from sqlalchemy import delete, select
+from pydantic import ValidationError
+from sqlalchemy import delete, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from app_types.exceptions import AgencyNotFound
 from schema.agency import (
@@ -24,11 +27,31 @@ from schema.agency import (
     ThinkProvider,
     ThinkSettings,
     AgencyOut,
+    AgencyListItemOut,
+    AgencyPageOut,
+    AgencyConfiguration,
+    AgencyPromptSizeOut,
+    PromptSize,
+    PromptSizeReportOut,
     )
 from services.base import BaseService
 from db.models.agency import Agency as AgencyModel
-from services.func_tools import FUNCTION_DEFINITIONS
-from utils.prompt import PromptTemplateBuilder
+from services.func_tools import build_function_definitions
+from utils.pagination import decode_cursor, encode_cursor
+from utils.prompt import PromptTemplateBuilder, compile_prompt, estimate_tokens
+from utils.settings_frame import placeholder
+
+#####################################################################################################
+
+AGENCY_CHANGED_CHANNEL: Final = 'agency_changed'
+
+# Stands for the current time in prepared instructions
+NOW_PLACEHOLDER: Final = placeholder('now')
+
+#####################################################################################################
+
+def format_now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 #####################################################################################################
 
@@ -39,21 +62,29 @@ class AgencyService(BaseService):
     )
     _DEFAULT_THINK_MODEL: Final = 'gpt-4o-mini'
 
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(self, session: AsyncSession, prompt_builder: PromptTemplateBuilder | None = None) -> None:
         self._session = session
+        self._prompt_builder = prompt_builder
 
-    def _create_instructions(self, view_task: bool, valuation_task: bool) -> str:
+    @staticmethod
+    def _create_tasks(view_task: bool, valuation_task: bool) -> list[str]:
         tasks = []
         if view_task:
             tasks.append('viewing')
         if valuation_task:
             tasks.append('valuation')
-        prompt_template_builder = PromptTemplateBuilder()
-        return prompt_template_builder.build_instructions(tasks=tasks)
+        return tasks
+
+    def _create_instructions(self, view_task: bool, valuation_task: bool) -> str:
+        tasks = self._create_tasks(view_task, valuation_task)
+        if self._prompt_builder is None:
+            self._prompt_builder = PromptTemplateBuilder()
+            self._prompt_builder.reload()
+        return self._prompt_builder.build_instructions(tasks=tasks)
 
     def _create_functions(self, view_task: bool, valuation_task: bool) -> list[Function]:
-        # FIXME
-        return [Function.model_validate(func) for func in FUNCTION_DEFINITIONS]
+        tasks = self._create_tasks(view_task, valuation_task)
+        return [Function.model_validate(func) for func in build_function_definitions(tasks)]
 
     def _create_think_settings(
         self,
@@ -71,10 +102,30 @@ class AgencyService(BaseService):
             functions=functions,
         )
 
-    async def get_agency_list(self, limit: int = 10, offset: int = 0) -> list[AgencyOut]:
-        stmt = select(AgencyModel).offset(offset).limit(limit)
-        agencies = await self._session.execute(stmt)
-        return [AgencyOut.model_validate(agency, from_attributes=True) for agency in agencies]
+    async def get_agency_list(
+        self,
+        limit: int = 10,
+        cursor: str | None = None,
+        include_settings: bool = False,
+    ) -> AgencyPageOut:
+        """Page of agencies ordered by id, settings are not selected unless asked for. Raises InvalidCursor."""
+        columns = [
+            AgencyModel.id,
+            AgencyModel.assistant_name,
+            AgencyModel.agency_name,
+            AgencyModel.agency_location,
+            AgencyModel.agency_timezone,
+            AgencyModel.agency_description,
+        ]
+        if include_settings:
+            columns.append(AgencyModel.settings)
+        stmt = select(*columns).order_by(AgencyModel.id).limit(limit + 1)
+        if cursor is not None:
+            stmt = stmt.where(AgencyModel.id > decode_cursor(cursor, UUID)[0])
+        rows = (await self._session.execute(stmt)).mappings().all()
+        items = [AgencyListItemOut.model_validate(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(str(rows[limit - 1]['id'])) if len(rows) > limit else None
+        return AgencyPageOut(items=items, next_cursor=next_cursor)
 
     async def create_agency(self, agency: AgencyCreate) -> AgencyOut:
         deepgram_agent_settings = DeepgramAgentSettings(
@@ -88,6 +139,8 @@ class AgencyService(BaseService):
         advanced_settings = AgencySettings(
             audio=self._DEFAULT_AUDIO_SETTINGS,
             agent=deepgram_agent_settings,
+            filler_phrases=agency.settings.filler_phrases,
+            retention_months=agency.settings.retention_months,
         )
 
         agency_schema = Agency(
@@ -99,8 +152,10 @@ class AgencyService(BaseService):
             agency_description=agency.agency_description,
             settings=advanced_settings,
         )
+        agency_schema.settings.prompt_size = self.estimate_prompt_size(agency_schema)
         agency_db = AgencyModel(**agency_schema.model_dump())
         self._session.add(agency_db)
+        await self.notify_agency_changed(agency_db.id)
         await self._session.commit()
         return AgencyOut.model_validate(agency_schema, from_attributes=True)
     
@@ -117,37 +172,110 @@ class AgencyService(BaseService):
 
     async def delete_agency(self, agency_id: str) -> bool:
         stmt = delete(AgencyModel).where(AgencyModel.id == agency_id)
-        await self._session.execute(stmt)
-        res = await self._session.commit()
+        res = await self._session.execute(stmt)
+        await self.notify_agency_changed(agency_id)
+        await self._session.commit()
         return res.rowcount > 0
     
-    async def get_agency_configuration(self, agency_id: str) -> dict[str, Any]:
+    async def load_agency(self, agency_id: str) -> Agency:
         stmt = select(AgencyModel).where(AgencyModel.id == agency_id)
         agency_db = await self._session.execute(stmt)
         agency_db = agency_db.scalar_one_or_none()
         if not agency_db:
             raise AgencyNotFound()
-        agency = Agency.model_validate(agency_db)
-        agency.settings.agent.think.instructions = agency.settings.agent.think.instructions.format(
+        return Agency.model_validate(agency_db, from_attributes=True)
+
+    async def load_agencies(self) -> list[Agency]:
+        """All agencies with valid settings. Invalid ones are skipped."""
+        agencies = await self._session.execute(select(AgencyModel))
+        result = []
+        for agency_db in agencies.scalars():
+            try:
+                result.append(Agency.model_validate(agency_db, from_attributes=True))
+            except ValidationError:
+                continue
+        return result
+
+    async def get_prompt_size_report(self, warning_threshold: int) -> PromptSizeReportOut:
+        agencies = []
+        for agency in await self.load_agencies():
+            # Agencies built before the estimate was stored get it computed on the fly
+            prompt_size = agency.settings.prompt_size or self.estimate_prompt_size(agency)
+            agencies.append(AgencyPromptSizeOut(
+                agency_id=agency.id,
+                agency_name=agency.agency_name,
+                prompt_size=prompt_size,
+                over_threshold=prompt_size.total_tokens > warning_threshold,
+            ))
+        agencies.sort(key=lambda item: item.prompt_size.total_tokens, reverse=True)
+        return PromptSizeReportOut(warning_threshold=warning_threshold, agencies=agencies)
+
+    @classmethod
+    def estimate_prompt_size(cls, agency: Agency) -> PromptSize:
+        think = cls.prepare_configuration(agency).settings['agent']['think']
+        functions = [
+            {key: value for key, value in function.items() if value is not None}
+            for function in think.get('functions') or ()
+        ]
+        instructions_tokens = estimate_tokens(think['instructions'])
+        functions_tokens = estimate_tokens(orjson.dumps(functions).decode()) if functions else 0
+        context_tokens = estimate_tokens(cls._create_greeting(agency))
+        return PromptSize(
+            instructions_tokens=instructions_tokens,
+            functions_tokens=functions_tokens,
+            context_tokens=context_tokens,
+            total_tokens=instructions_tokens + functions_tokens + context_tokens,
+        )
+
+    async def notify_agency_changed(self, agency_id: str) -> None:
+        """Delivered to all listening workers when the current transaction commits."""
+        await self._session.execute(
+            text("SELECT pg_notify(:channel, :agency_id)"),
+            {"channel": AGENCY_CHANGED_CHANNEL, "agency_id": str(agency_id)},
+        )
+
+    async def get_agency_configuration(self, agency_id: str) -> AgencyConfiguration:
+        agency = await self.load_agency(agency_id)
+        return self.render_configuration(self.prepare_configuration(agency))
+
+    @staticmethod
+    def prepare_configuration(agency: Agency) -> AgencyConfiguration:
+        """
+        Configuration with everything known in advance already filled in. The instructions
+        keep NOW_PLACEHOLDER in place of the current time, see render_configuration.
+        """
+        settings = agency.settings.model_dump(exclude={'filler_phrases', 'prompt_size', 'retention_months'})
+        settings['agent']['think']['instructions'] = compile_prompt(agency.settings.agent.think.instructions).render(
             assistant_name=agency.assistant_name,
             agency_name=agency.agency_name,
             location=agency.agency_location,
-            now=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            now=NOW_PLACEHOLDER,
         )
-        settings = agency.settings.model_dump()
-        context = {
+        settings["context"] = {
             "messages": [
                 {
                     "role": "assistant",
-                    "content": f"Welcome to {agency.agency_name}. I’m {agency.assistant_name},"
-                               f" your AI assistant. How may I help you today?"
+                    "content": AgencyService._create_greeting(agency),
                 }
             ],
 
             "replay": True,
         }
-        print(agency.settings.agent.think.instructions)  # FIXME!
-        settings["context"] = context
-        return agency.model_dump()
+        return AgencyConfiguration(settings=settings, filler_phrases=agency.settings.filler_phrases)
+
+    @staticmethod
+    def _create_greeting(agency: Agency) -> str:
+        return (
+            f"Welcome to {agency.agency_name}. I’m {agency.assistant_name},"
+            f" your AI assistant. How may I help you today?"
+        )
+
+    @staticmethod
+    def render_configuration(prepared: AgencyConfiguration) -> AgencyConfiguration:
+        """Puts the current time into the prepared configuration without changing it."""
+        think = dict(prepared.settings['agent']['think'])
+        think['instructions'] = think['instructions'].replace(NOW_PLACEHOLDER, format_now())
+        settings = {**prepared.settings, 'agent': {**prepared.settings['agent'], 'think': think}}
+        return AgencyConfiguration.model_construct(settings=settings, filler_phrases=prepared.filler_phrases)
 
 #####################################################################################################
@@ -0,0 +1,190 @@
+#####################################################################################################
+
+from asyncio import CancelledError, Event, Task, create_task, sleep
+from dataclasses import dataclass
+from logging import Logger
+from time import monotonic, perf_counter
+from typing import Final
+
+import asyncpg
+
+from configs.settings import AppSettings
+from db.connection.session import DatabaseManager
+from schema.agency import Agency, AgencySessionSettings
+from services.agency import AGENCY_CHANGED_CHANNEL, AgencyService, format_now
+from services.base import BaseService
+from utils.metrics import Counter, Gauge, Histogram
+from utils.settings_frame import SettingsFrameTemplate
+
+#####################################################################################################
+
+_CACHE_LOOKUPS: Final = Counter(
+    'voice_agency_config_cache_lookups_total',
+    'Agency configuration lookups on call start',
+    ('result',),
+)
+_CACHE_ENTRIES: Final = Gauge(
+    'voice_agency_config_cache_entries',
+    'Agency configurations held in the process cache',
+)
+_CACHE_INVALIDATIONS: Final = Counter(
+    'voice_agency_config_cache_invalidations_total',
+    'Agency configurations dropped from the process cache',
+    ('reason',),
+)
+_CONFIG_LOOKUP_DURATION: Final = Histogram(
+    'voice_agency_config_lookup_duration_seconds',
+    'Time to get the agency configuration on call start',
+    ('result',),
+)
+
+#####################################################################################################
+
+@dataclass(frozen=True, slots=True)
+class _CacheEntry:
+    frame: SettingsFrameTemplate
+    filler_phrases: list[str] | None
+    loaded_at: float
+
+    @classmethod
+    def from_agency(cls, agency: Agency, loaded_at: float) -> '_CacheEntry':
+        configuration = AgencyService.prepare_configuration(agency)
+        return cls(
+            frame=SettingsFrameTemplate.compile(configuration.settings),
+            filler_phrases=configuration.filler_phrases,
+            loaded_at=loaded_at,
+        )
+
+    def render(self) -> AgencySessionSettings:
+        return AgencySessionSettings.model_construct(
+            settings_frame=self.frame.render(now=format_now()),
+            filler_phrases=self.filler_phrases,
+        )
+
+#####################################################################################################
+
+class AgencyConfigCache(BaseService):
+    """
+    Per-process cache of compiled agency settings messages.
+
+    Call start only splices the current time into an already serialized settings message
+    instead of reading and validating the agency row and serializing the options. Workers drop entries on NOTIFY sent by AgencyService
+    on every change; the TTL bounds staleness if a notification is lost. While the listener
+    connection is down nothing is trusted beyond the TTL and the cache is cleared on reconnect.
+    """
+
+    _RECONNECT_DELAY: Final = 5.0
+
+    def __init__(self, app_settings: AppSettings, db_manager: DatabaseManager, logger: Logger) -> None:
+        self._app_settings: Final = app_settings
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+        self._enabled: Final = app_settings.agency_config_cache_enabled
+        self._ttl: Final = app_settings.agency_config_cache_ttl
+        self._entries: dict[str, _CacheEntry] = {}
+        # Bumped on every invalidation, so a load that raced with it is not cached
+        self._generation = 0
+        self._listen_task: Task | None = None
+        self._hit_metric: Final = _CACHE_LOOKUPS.labels('hit')
+        self._miss_metric: Final = _CACHE_LOOKUPS.labels('miss')
+        self._hit_duration: Final = _CONFIG_LOOKUP_DURATION.labels('hit')
+        self._miss_duration: Final = _CONFIG_LOOKUP_DURATION.labels('miss')
+
+    async def start(self) -> None:
+        if not self._enabled or self._listen_task is not None:
+            return
+        try:
+            await self.warm()
+        except Exception as ex:
+            self._logger.error('Failed to warm agency configuration cache', exc_info=ex)
+        self._listen_task = create_task(self._listen_loop(), name='agency-config-listener')
+
+    async def stop(self) -> None:
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except CancelledError:
+                pass
+            self._listen_task = None
+
+    async def warm(self) -> None:
+        async with self._db_manager.connect() as session:
+            agencies = await AgencyService(session=session).load_agencies()
+        loaded_at = monotonic()
+        for agency in agencies:
+            try:
+                self._entries[str(agency.id)] = _CacheEntry.from_agency(agency, loaded_at)
+            except ValueError as ex:
+                self._logger.error(f'Invalid settings of agency "{agency.id}": {ex}')
+        _CACHE_ENTRIES.set(len(self._entries))
+        self._logger.info(f'Agency configuration cache warmed with {len(agencies)} agencies')
+
+    async def get(self, agency_id: str) -> AgencySessionSettings:
+        """Settings ready to be sent to Deepgram. Raises AgencyNotFound."""
+        started = perf_counter()
+        agency_id = str(agency_id)
+        entry = self._entries.get(agency_id)
+        if entry is not None and monotonic() - entry.loaded_at <= self._ttl:
+            self._hit_metric.inc()
+            settings = entry.render()
+            self._hit_duration.observe(perf_counter() - started)
+            return settings
+
+        self._miss_metric.inc()
+        generation = self._generation
+        async with self._db_manager.connect() as session:
+            agency = await AgencyService(session=session).load_agency(agency_id)
+        entry = _CacheEntry.from_agency(agency, monotonic())
+        if self._enabled and generation == self._generation:
+            self._entries[agency_id] = entry
+            _CACHE_ENTRIES.set(len(self._entries))
+        settings = entry.render()
+        self._miss_duration.observe(perf_counter() - started)
+        return settings
+
+    def invalidate(self, agency_id: str | None = None) -> None:
+        """Drops a single agency or, without agency_id, the whole cache."""
+        self._generation += 1
+        if agency_id is None:
+            self._entries.clear()
+            _CACHE_INVALIDATIONS.labels('all').inc()
+        elif self._entries.pop(agency_id, None) is not None:
+            _CACHE_INVALIDATIONS.labels('notify').inc()
+        _CACHE_ENTRIES.set(len(self._entries))
+
+    async def _listen_loop(self) -> None:
+        # Dedicated connection outside of the pool, LISTEN needs it for the whole process life
+        reconnect = False
+        while True:
+            connection: asyncpg.Connection | None = None
+            try:
+                connection = await asyncpg.connect(
+                    user=self._app_settings.postgres_user,
+                    password=self._app_settings.postgres_password,
+                    host=self._app_settings.postgres_host,
+                    port=self._app_settings.postgres_port,
+                    database=self._app_settings.postgres_db,
+                )
+                closed = Event()
+                connection.add_termination_listener(lambda _connection: closed.set())
+                await connection.add_listener(AGENCY_CHANGED_CHANNEL, self._on_notification)
+                if reconnect:
+                    # Changes made while not listening are unknown
+                    self.invalidate()
+                await closed.wait()
+                self._logger.warning('Agency configuration listener connection was closed')
+            except CancelledError:
+                raise
+            except Exception as ex:
+                self._logger.error('Agency configuration listener failed', exc_info=ex)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            reconnect = True
+            await sleep(self._RECONNECT_DELAY)
+
+    def _on_notification(self, _connection: asyncpg.Connection, _pid: int, _channel: str, payload: str) -> None:
+        self.invalidate(payload)
+
+#####################################################################################################
@@ -0,0 +1,198 @@
+#####################################################################################################
+"""
+Per agency and day conversation analytics.
+
+Rollups live in conversation_daily_stats and are incremented in the same transaction that
+stores the conversations, so reading a date range is a primary key range scan. Days are UTC.
+Conversations without an agency (dev mode) are not rolled up. backfill() rebuilds days from
+the conversations table, for history written before the rollups existed.
+"""
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from logging import Logger
+from typing import Any, Final, Iterable
+
+from db.connection.session import DatabaseManager
+from db.models.enums import ConversationPurpose
+from db.repositories.conversation import ConversationRepository
+from db.repositories.conversation_stats import ConversationStatsRepository
+from schema.analytics import AgencyAnalyticsOut, AnalyticsBackfillOut, ConversationStatsOut, DailyConversationStatsOut
+from services.base import BaseService
+
+#####################################################################################################
+
+# Upper bounds of duration buckets in seconds, one more bucket holds longer calls
+DURATION_BUCKETS: Final = (15, 30, 60, 90, 120, 180, 240, 300, 450, 600, 900, 1200, 1800)
+
+#####################################################################################################
+
+@dataclass(slots=True)
+class DailyStats:
+    agency_id: str
+    day: date
+    conversations: int = 0
+    duration_sum: int = 0
+    duration_buckets: list[int] = field(default_factory=lambda: [0] * (len(DURATION_BUCKETS) + 1))
+    viewing: int = 0
+    valuation: int = 0
+    leads_created: int = 0
+    tool_calls: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_row(cls, row: Any) -> 'DailyStats':
+        return cls(
+            agency_id=str(row.agency_id),
+            day=row.day,
+            conversations=row.conversations,
+            duration_sum=row.duration_sum,
+            duration_buckets=list(row.duration_buckets),
+            viewing=row.viewing,
+            valuation=row.valuation,
+            leads_created=row.leads_created,
+            tool_calls=dict(row.tool_calls),
+        )
+
+    def to_row(self) -> dict[str, Any]:
+        return {
+            'agency_id': self.agency_id,
+            'day': self.day,
+            'conversations': self.conversations,
+            'duration_sum': self.duration_sum,
+            'duration_buckets': self.duration_buckets,
+            'viewing': self.viewing,
+            'valuation': self.valuation,
+            'leads_created': self.leads_created,
+            'tool_calls': self.tool_calls,
+        }
+
+    def add(
+        self,
+        duration: int,
+        purpose: ConversationPurpose | str | None,
+        lead_created: bool,
+        tool_calls: Iterable[str] | None,
+    ) -> None:
+        self.conversations += 1
+        self.duration_sum += duration
+        self.duration_buckets[bisect_left(DURATION_BUCKETS, duration)] += 1
+        if purpose == ConversationPurpose.VIEWING:
+            self.viewing += 1
+        elif purpose == ConversationPurpose.VALUATION:
+            self.valuation += 1
+        if lead_created:
+            self.leads_created += 1
+        for tool in tool_calls or ():
+            self.tool_calls[tool] = self.tool_calls.get(tool, 0) + 1
+
+    def merge(self, other: 'DailyStats') -> None:
+        self.conversations += other.conversations
+        self.duration_sum += other.duration_sum
+        self.duration_buckets = [a + b for a, b in zip(self.duration_buckets, other.duration_buckets)]
+        self.viewing += other.viewing
+        self.valuation += other.valuation
+        self.leads_created += other.leads_created
+        for tool, count in other.tool_calls.items():
+            self.tool_calls[tool] = self.tool_calls.get(tool, 0) + count
+
+    def percentile(self, q: float) -> float | None:
+        """Duration percentile, interpolated inside its bucket. Calls longer than the last bound count as the bound."""
+        if not self.conversations:
+            return None
+        target = q * self.conversations
+        seen = 0
+        lower = 0
+        for bound, count in zip(DURATION_BUCKETS, self.duration_buckets):
+            if count and seen + count >= target:
+                return lower + (bound - lower) * (target - seen) / count
+            seen += count
+            lower = bound
+        return float(DURATION_BUCKETS[-1])
+
+    def to_out(self) -> dict[str, Any]:
+        conversations = self.conversations
+        return {
+            'conversations': conversations,
+            'avg_duration': self.duration_sum / conversations if conversations else None,
+            'duration_p50': self.percentile(0.5),
+            'duration_p90': self.percentile(0.9),
+            'viewing': self.viewing,
+            'valuation': self.valuation,
+            'other': conversations - self.viewing - self.valuation,
+            'leads_created': self.leads_created,
+            'lead_conversion_rate': self.leads_created / conversations if conversations else None,
+            'tool_calls': self.tool_calls,
+        }
+
+#####################################################################################################
+
+def rollup(conversations: Iterable[Any], into: dict[tuple[str, date], DailyStats] | None = None) -> dict[tuple[str, date], DailyStats]:
+    """
+    Adds conversations (anything with agency_id, started_at, duration, purpose, lead_created
+    and tool_calls) to per agency and day stats.
+    """
+    stats = into if into is not None else {}
+    for conversation in conversations:
+        if conversation.agency_id is None:
+            continue
+        agency_id = str(conversation.agency_id)
+        day = conversation.started_at.astimezone(timezone.utc).date()
+        daily = stats.get((agency_id, day))
+        if daily is None:
+            daily = stats[(agency_id, day)] = DailyStats(agency_id=agency_id, day=day)
+        daily.add(conversation.duration, conversation.purpose, conversation.lead_created, conversation.tool_calls)
+    return stats
+
+#####################################################################################################
+
+class AnalyticsService(BaseService):
+
+    # Rows per INSERT of a backfill, far below the bind parameter limit
+    _BACKFILL_INSERT_SIZE: Final = 1000
+    _BACKFILL_FETCH_SIZE: Final = 2000
+
+    def __init__(self, db_manager: DatabaseManager, logger: Logger) -> None:
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+
+    async def get_agency_analytics(self, agency_id: str, date_from: date, date_to: date) -> AgencyAnalyticsOut:
+        async with self._db_manager.connect() as session:
+            rows = await ConversationStatsRepository(session).get_list(agency_id, date_from, date_to)
+        total = DailyStats(agency_id=agency_id, day=date_from)
+        days = []
+        for row in rows:
+            daily = DailyStats.from_row(row)
+            total.merge(daily)
+            days.append(DailyConversationStatsOut(day=daily.day, **daily.to_out()))
+        return AgencyAnalyticsOut(
+            agency_id=agency_id,
+            date_from=date_from,
+            date_to=date_to,
+            total=ConversationStatsOut(**total.to_out()),
+            days=days,
+        )
+
+    async def backfill(self, date_from: date | None = None, date_to: date | None = None) -> AnalyticsBackfillOut:
+        """
+        Rebuilds rollups of the days from date_from to date_to inclusive (all days by default)
+        from the conversations table. Conversation writes wait until it commits.
+        """
+        started_from = datetime.combine(date_from, time(), tzinfo=timezone.utc) if date_from else None
+        started_to = datetime.combine(date_to + timedelta(days=1), time(), tzinfo=timezone.utc) if date_to else None
+        stats: dict[tuple[str, date], DailyStats] = {}
+        conversations = 0
+        async with self._db_manager.connect() as session:
+            stats_repository = ConversationStatsRepository(session)
+            await stats_repository.lock_for_rebuild()
+            await stats_repository.delete_range(date_from, date_to)
+            batches = ConversationRepository(session).stream_for_stats(started_from, started_to, self._BACKFILL_FETCH_SIZE)
+            async for rows in batches:
+                conversations += len(rows)
+                rollup(rows, into=stats)
+            rows = [daily.to_row() for daily in stats.values()]
+            for start in range(0, len(rows), self._BACKFILL_INSERT_SIZE):
+                await stats_repository.create(rows[start:start + self._BACKFILL_INSERT_SIZE])
+        self._logger.info(f'Analytics backfill rebuilt {len(stats)} days from {conversations} conversations')
+        return AnalyticsBackfillOut(conversations=conversations, days=len(stats))
+
+#####################################################################################################
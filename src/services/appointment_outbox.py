@@ -0,0 +1,204 @@
+#####################################################################################################
+
+from asyncio import CancelledError, Event, Task, create_task, gather, wait_for
+from datetime import datetime, timedelta, timezone
+from logging import Logger
+from typing import Final
+
+from configs.settings import AppSettings
+from db.connection.session import DatabaseManager
+from db.models.appointment_outbox import AppointmentOutbox
+from db.models.enums import OutboxStatus
+from db.repositories.appointment_outbox import AppointmentOutboxRepository
+from schema.appointment import OutboxEntryOut, OutboxStatusOut
+from schema.lead import LeadInfo
+from schema.xano import CreateAppointmentRequest
+from services.base import BaseService
+from services.xano import XanoService
+from utils.metrics import Counter, Gauge, Histogram
+
+#####################################################################################################
+
+_OUTBOX_PENDING: Final = Gauge(
+    'voice_appointment_outbox_pending',
+    'Appointments waiting for delivery to Xano',
+)
+_OUTBOX_LAG: Final = Gauge(
+    'voice_appointment_outbox_lag_seconds',
+    'Age of the oldest appointment waiting for delivery to Xano',
+)
+_OUTBOX_DELIVERIES: Final = Counter(
+    'voice_appointment_outbox_deliveries_total',
+    'Attempts to deliver appointments to Xano',
+    ('result',),
+)
+_OUTBOX_DELIVERY_DELAY: Final = Histogram(
+    'voice_appointment_outbox_delivery_delay_seconds',
+    'Time from booking on the call to successful delivery to Xano',
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0),
+)
+
+#####################################################################################################
+
+class AppointmentOutboxService(BaseService):
+    """
+    Durable hand-off of booked appointments to Xano.
+
+    The call only stores the appointment in the outbox table, which is a fast local insert.
+    A background loop claims due entries in batches, delivers them with an idempotency key
+    and retries failures with exponential backoff until the attempts are exhausted.
+    Claims use SKIP LOCKED and a lease, so several workers can run the loop side by side.
+    """
+
+    # Longer than any Xano request, otherwise an entry could be claimed again while in flight
+    _CLAIM_LEASE: Final = timedelta(seconds=120)
+
+    def __init__(
+        self,
+        app_settings: AppSettings,
+        xano_service: XanoService,
+        db_manager: DatabaseManager,
+        logger: Logger,
+    ) -> None:
+        self._xano_service: Final = xano_service
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+        self._batch_size: Final = app_settings.appointment_outbox_batch_size
+        self._poll_interval: Final = app_settings.appointment_outbox_poll_interval
+        self._max_attempts: Final = app_settings.appointment_outbox_max_attempts
+        self._retry_base_delay: Final = app_settings.appointment_outbox_retry_base_delay
+        self._retry_max_delay: Final = app_settings.appointment_outbox_retry_max_delay
+        self._wake_event: Final = Event()
+        self._deliver_task: Task | None = None
+        self._delivered_metric: Final = _OUTBOX_DELIVERIES.labels('delivered')
+        self._retry_metric: Final = _OUTBOX_DELIVERIES.labels('retry')
+        self._failed_metric: Final = _OUTBOX_DELIVERIES.labels('failed')
+
+    def start(self) -> None:
+        if self._deliver_task is None:
+            self._deliver_task = create_task(self._deliver_loop(), name='appointment-outbox')
+
+    async def stop(self) -> None:
+        # Undelivered entries stay in the table and are picked up after restart
+        if self._deliver_task is not None:
+            self._deliver_task.cancel()
+            try:
+                await self._deliver_task
+            except CancelledError:
+                pass
+            self._deliver_task = None
+
+    async def enqueue(
+        self,
+        payload: CreateAppointmentRequest,
+        lead_info: LeadInfo,
+        agency_id: str | None = None,
+    ) -> tuple[str, int]:
+        """Stores the lead and the appointment. Returns ids of the lead and of the outbox entry."""
+        async with self._db_manager.connect() as session:
+            lead_id, entry = await AppointmentOutboxRepository(session).create_with_lead(
+                payload=payload.model_dump(),
+                lead=lead_info,
+                agency_id=agency_id,
+            )
+        self._wake_event.set()
+        return str(lead_id), entry.id
+
+    async def get_status(self) -> OutboxStatusOut:
+        async with self._db_manager.connect() as session:
+            counts, oldest_pending = await AppointmentOutboxRepository(session).get_status_summary()
+        return OutboxStatusOut(
+            pending=counts.get(OutboxStatus.PENDING, 0),
+            delivered=counts.get(OutboxStatus.DELIVERED, 0),
+            failed=counts.get(OutboxStatus.FAILED, 0),
+            lag_seconds=self._lag_seconds(oldest_pending),
+        )
+
+    async def get_entry(self, entry_id: int) -> OutboxEntryOut | None:
+        async with self._db_manager.connect() as session:
+            entry = await AppointmentOutboxRepository(session).get_by_id(entry_id)
+        return OutboxEntryOut.model_validate(entry) if entry is not None else None
+
+    async def _deliver_loop(self) -> None:
+        while True:
+            # Cleared before the delivery, so an entry enqueued meanwhile wakes the next round
+            self._wake_event.clear()
+            try:
+                # Keep going without waiting while full batches are coming
+                while await self.deliver_batch() >= self._batch_size:
+                    pass
+                await self._update_gauges()
+            except CancelledError:
+                raise
+            except Exception as ex:
+                self._logger.error('Appointment outbox delivery failed', exc_info=ex)
+            try:
+                await wait_for(self._wake_event.wait(), timeout=self._poll_interval)
+            except TimeoutError:
+                pass
+
+    async def deliver_batch(self) -> int:
+        """Delivers one batch of due entries. Returns the number of claimed entries."""
+        async with self._db_manager.connect() as session:
+            entries = await AppointmentOutboxRepository(session).claim_batch(self._batch_size, self._CLAIM_LEASE)
+        if not entries:
+            return 0
+        # Xano takes a single appointment per request, so the batch is sent concurrently
+        results = await gather(*(self._deliver(entry) for entry in entries), return_exceptions=True)
+
+        delivered: list[int] = []
+        failures: list[tuple[AppointmentOutbox, str, datetime | None]] = []
+        for entry, result in zip(entries, results):
+            if result is True:
+                delivered.append(entry.id)
+            else:
+                error = str(result) if isinstance(result, BaseException) else 'Xano rejected the appointment'
+                failures.append((entry, error, self._next_attempt_at(entry)))
+
+        # One transaction for the results of the whole batch, committed by connect()
+        async with self._db_manager.connect() as session:
+            repository = AppointmentOutboxRepository(session)
+            await repository.mark_delivered(delivered)
+            for entry, error, next_attempt_at in failures:
+                await repository.mark_attempt_failed(entry.id, error, next_attempt_at)
+
+        now = datetime.now(timezone.utc)
+        for entry in entries:
+            if entry.id in delivered:
+                self._delivered_metric.inc()
+                _OUTBOX_DELIVERY_DELAY.observe((now - entry.created_at).total_seconds())
+        for entry, error, next_attempt_at in failures:
+            if next_attempt_at is None:
+                self._failed_metric.inc()
+                self._logger.error(f'Appointment outbox entry {entry.id} failed after {entry.attempts} attempts: {error}')
+            else:
+                self._retry_metric.inc()
+                self._logger.warning(f'Appointment outbox entry {entry.id} will be retried: {error}')
+        return len(entries)
+
+    async def _deliver(self, entry: AppointmentOutbox) -> bool:
+        return await self._xano_service.create_appointment(
+            CreateAppointmentRequest(**entry.payload),
+            idempotency_key=str(entry.idempotency_key),
+        )
+
+    def _next_attempt_at(self, entry: AppointmentOutbox) -> datetime | None:
+        # attempts is already incremented by the claim
+        if entry.attempts >= self._max_attempts:
+            return None
+        delay = min(self._retry_base_delay * 2 ** (entry.attempts - 1), self._retry_max_delay)
+        return datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+    async def _update_gauges(self) -> None:
+        async with self._db_manager.connect() as session:
+            counts, oldest_pending = await AppointmentOutboxRepository(session).get_status_summary()
+        _OUTBOX_PENDING.set(counts.get(OutboxStatus.PENDING, 0))
+        _OUTBOX_LAG.set(self._lag_seconds(oldest_pending))
+
+    @staticmethod
+    def _lag_seconds(oldest_pending: datetime | None) -> float:
+        if oldest_pending is None:
+            return 0.0
+        return max((datetime.now(timezone.utc) - oldest_pending).total_seconds(), 0.0)
+
+#####################################################################################################
@@ -0,0 +1,126 @@
+#####################################################################################################
+
+from asyncio import Task, create_task, gather, shield
+from dataclasses import dataclass, field
+from datetime import datetime
+from logging import Logger
+from typing import Final, Iterable, Literal
+
+from configs.constants import CALENDAR_SLOTS_WINDOW
+from schema.xano import CalendarSlotsRequest, TimeSlot
+from services.xano import XanoService
+from utils.metrics import Counter
+
+#####################################################################################################
+
+_PREFETCH_REQUESTS: Final = Counter(
+    'voice_calendar_prefetch_requests_total',
+    'Speculative calendar slot requests sent to Xano',
+)
+_PREFETCH_LOOKUPS: Final = Counter(
+    'voice_calendar_prefetch_lookups_total',
+    'getFreeCalendarSlots calls checked against speculative results',
+    ('result',),
+)
+_PREFETCH_WASTED: Final = Counter(
+    'voice_calendar_prefetch_wasted_total',
+    'Speculative calendar slot requests whose result was never used',
+)
+
+#####################################################################################################
+
+def _to_ms(dt: datetime) -> int:
+    return int(dt.timestamp()) * 1000
+
+#####################################################################################################
+
+@dataclass(slots=True)
+class _Speculation:
+    from_ts: int
+    to_ts: int
+    task: Task
+    used: bool = field(default=False)
+
+#####################################################################################################
+
+class CalendarPrefetcher:
+    """
+    Per-session speculative fetch of calendar slots.
+
+    After a property search the agent almost always asks for free slots of the found property,
+    so the request is started right away for the default window from now. A later
+    getFreeCalendarSlots call is served from it when the requested window is covered.
+    """
+
+    def __init__(self, xano_service: XanoService, logger: Logger, max_entries: int) -> None:
+        self._xano_service: Final = xano_service
+        self._logger: Final = logger
+        self._max_entries: Final = max_entries
+        self._speculations: dict[tuple[str, str], _Speculation] = {}
+        self._hit_metric: Final = _PREFETCH_LOOKUPS.labels('hit')
+        self._miss_metric: Final = _PREFETCH_LOOKUPS.labels('miss')
+
+    def speculate(self, postcodes: Iterable[str], event_type: Literal['Viewing', 'Valuation']) -> None:
+        from_dt = datetime.now().replace(second=0, microsecond=0)
+        from_ts = _to_ms(from_dt)
+        to_ts = _to_ms(from_dt + CALENDAR_SLOTS_WINDOW)
+        for postcode in postcodes:
+            if not postcode.split():
+                continue
+            key = (postcode.split()[0].upper(), event_type)
+            if key in self._speculations:
+                continue
+            if len(self._speculations) >= self._max_entries:
+                return
+            payload = CalendarSlotsRequest(
+                from_ts=from_ts,
+                to_ts=to_ts,
+                prop_postcode=key[0],
+                event_type=event_type,
+            )
+            task = create_task(self._xano_service.get_calendar_slots(payload), name=f'calendar-prefetch:{key[0]}')
+            self._speculations[key] = _Speculation(from_ts=from_ts, to_ts=to_ts, task=task)
+            _PREFETCH_REQUESTS.inc()
+
+    async def lookup(self, payload: CalendarSlotsRequest, limit: int) -> list[TimeSlot] | None:
+        """Returns slots for the request if the speculative result fully answers it, otherwise None."""
+        speculation = self._speculations.get((payload.prop_postcode.upper(), payload.event_type))
+        if speculation is None or not speculation.from_ts <= payload.from_ts <= speculation.to_ts:
+            self._miss_metric.inc()
+            return None
+        try:
+            # Shielded: the speculative result stays usable if this tool call is cancelled
+            slots = await shield(speculation.task)
+        except Exception as ex:
+            self._logger.warning(f'Speculative calendar request failed: {ex}')
+            slots = None
+        matched = self._filter_slots(slots, payload) if slots is not None else None
+        # Slots after the end of speculative window are unknown, so it is enough only if there are
+        # as many slots as the caller is going to show
+        if matched is None or (payload.to_ts > speculation.to_ts and len(matched) < limit):
+            self._miss_metric.inc()
+            return None
+        speculation.used = True
+        self._hit_metric.inc()
+        return matched
+
+    @staticmethod
+    def _filter_slots(slots: list[TimeSlot], payload: CalendarSlotsRequest) -> list[TimeSlot] | None:
+        try:
+            starts = [(_to_ms(datetime.fromisoformat(slot.start)), slot) for slot in slots]
+        except ValueError:
+            return None
+        starts.sort(key=lambda pair: pair[0])
+        return [slot for start, slot in starts if payload.from_ts <= start < payload.to_ts]
+
+    async def cancel(self) -> None:
+        for speculation in self._speculations.values():
+            if not speculation.used:
+                _PREFETCH_WASTED.inc()
+            speculation.task.cancel()
+        tasks = [speculation.task for speculation in self._speculations.values()]
+        self._speculations.clear()
+        if tasks:
+            await gather(*tasks, return_exceptions=True)
+
+#####################################################################################################
@@ -0,0 +1,93 @@
+#####################################################################################################
+
+from asyncio import timeout
+from logging import Logger
+from time import perf_counter
+from typing import Final
+
+from configs.settings import AppSettings
+from db.connection.session import DatabaseManager
+from db.repositories.lead import LeadRepository
+from schema.lead import LeadOut, PriorConversation, ReturningCaller
+from services.base import BaseService
+from utils.contacts import normalize_email, normalize_phone
+from utils.metrics import Counter, Histogram
+from utils.tracing import TRACER, SpanKind
+
+#####################################################################################################
+
+_CALLER_LOOKUPS: Final = Counter(
+    'voice_returning_caller_lookups_total',
+    'Returning caller lookups on call start',
+    ('result',),
+)
+_CALLER_LOOKUP_DURATION: Final = Histogram(
+    'voice_returning_caller_lookup_duration_seconds',
+    'Time to look up a returning caller on call start',
+)
+
+#####################################################################################################
+
+class CallerLookupService(BaseService):
+    """
+    Recognises returning callers on call start by the normalized phone or email the client
+    sent, see utils.contacts. One indexed query gets the known leads and their latest
+    conversations. The call never waits for it longer than the timeout.
+    """
+
+    def __init__(self, app_settings: AppSettings, db_manager: DatabaseManager, logger: Logger) -> None:
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+        self._enabled: Final = app_settings.returning_caller_lookup_enabled
+        self._timeout: Final = app_settings.returning_caller_lookup_timeout
+        self._max_conversations: Final = app_settings.returning_caller_max_conversations
+        self._found_metric: Final = _CALLER_LOOKUPS.labels('found')
+        self._unknown_metric: Final = _CALLER_LOOKUPS.labels('unknown')
+        self._skipped_metric: Final = _CALLER_LOOKUPS.labels('skipped')
+        self._timeout_metric: Final = _CALLER_LOOKUPS.labels('timeout')
+        self._error_metric: Final = _CALLER_LOOKUPS.labels('error')
+
+    async def find(self, agency_id: str | None, phone: str | None, email: str | None) -> ReturningCaller | None:
+        """Known leads of the caller, None for new callers and when the lookup failed."""
+        phone_normalized = normalize_phone(phone)
+        email_normalized = normalize_email(email)
+        if not self._enabled or agency_id is None or (phone_normalized is None and email_normalized is None):
+            self._skipped_metric.inc()
+            return None
+        started = perf_counter()
+        try:
+            with TRACER.span('db caller lookup', kind=SpanKind.CLIENT):
+                async with timeout(self._timeout):
+                    async with self._db_manager.connect() as session:
+                        rows = await LeadRepository(session).find_by_contact(
+                            agency_id, email_normalized, phone_normalized, self._max_conversations,
+                        )
+        except TimeoutError:
+            self._timeout_metric.inc()
+            self._logger.warning(f'Returning caller lookup timed out for agency "{agency_id}"')
+            return None
+        except Exception as ex:
+            self._error_metric.inc()
+            self._logger.error('Returning caller lookup failed', exc_info=ex)
+            return None
+        _CALLER_LOOKUP_DURATION.observe(perf_counter() - started)
+        if not rows:
+            self._unknown_metric.inc()
+            return None
+        self._found_metric.inc()
+        leads = {}
+        conversations = []
+        for row in rows:
+            if row.lead_id not in leads:
+                leads[row.lead_id] = LeadOut(id=row.lead_id, name=row.name, email=row.email, phone=row.phone)
+            if row.conversation_id is not None:
+                conversations.append(PriorConversation(
+                    id=row.conversation_id,
+                    lead_id=row.lead_id,
+                    started_at=row.started_at,
+                    topic=row.topic,
+                    purpose=row.purpose,
+                ))
+        return ReturningCaller(leads=list(leads.values()), conversations=conversations)
+
+#####################################################################################################
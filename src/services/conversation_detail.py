@@ -0,0 +1,135 @@
+#####################################################################################################
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from logging import Logger
+from time import monotonic
+from typing import Final
+
+from configs.settings import AppSettings
+from db.connection.session import DatabaseManager
+from db.repositories.conversation import ConversationRepository
+from schema.conversation import ConversationOut
+from services.base import BaseService
+from utils.http_cache import strong_etag
+from utils.metrics import Counter, Gauge
+
+#####################################################################################################
+
+_DETAIL_REQUESTS: Final = Counter(
+    'voice_conversation_detail_requests_total',
+    'Conversation detail requests by how they were served',
+    ('result',),
+)
+_DETAIL_BYTES_SAVED: Final = Counter(
+    'voice_conversation_detail_bytes_saved_total',
+    'Response bytes not built from the database (cache hits) or not sent at all (304)',
+    ('reason',),
+)
+_DETAIL_CACHE_BYTES: Final = Gauge(
+    'voice_conversation_detail_cache_bytes',
+    'Serialized conversation details held in the process cache',
+)
+_DETAIL_CACHE_ENTRIES: Final = Gauge(
+    'voice_conversation_detail_cache_entries',
+    'Conversation details held in the process cache',
+)
+_DETAIL_CACHE_EVICTIONS: Final = Counter(
+    'voice_conversation_detail_cache_evictions_total',
+    'Conversation details dropped from the process cache',
+    ('reason',),
+)
+
+#####################################################################################################
+
+@dataclass(frozen=True, slots=True)
+class ConversationDetail:
+    body: bytes
+    etag: str
+    started_at: datetime
+    loaded_at: float
+
+#####################################################################################################
+
+class ConversationDetailCache(BaseService):
+    """
+    Serialized conversation details by id, least recently used dropped first.
+
+    Finished conversations do not change, only their lead may get new contact details and
+    retention removes them, so entries live for ttl. The cache is bounded by the total size
+    of the bodies, not by their number, as transcripts differ a lot in length. Bodies larger
+    than an eighth of the limit are not cached.
+    """
+
+    def __init__(self, app_settings: AppSettings, db_manager: DatabaseManager, logger: Logger) -> None:
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+        self._max_bytes: Final = app_settings.conversation_detail_cache_max_bytes
+        self._ttl: Final = app_settings.conversation_detail_cache_ttl
+        self._entries: Final[OrderedDict[int, ConversationDetail]] = OrderedDict()
+        self._bytes = 0
+        self._hit_metric: Final = _DETAIL_REQUESTS.labels('hit')
+        self._miss_metric: Final = _DETAIL_REQUESTS.labels('miss')
+        self._not_modified_metric: Final = _DETAIL_REQUESTS.labels('not_modified')
+        self._hit_bytes_metric: Final = _DETAIL_BYTES_SAVED.labels('hit')
+        self._not_modified_bytes_metric: Final = _DETAIL_BYTES_SAVED.labels('not_modified')
+        self._expired_metric: Final = _DETAIL_CACHE_EVICTIONS.labels('expired')
+        self._size_metric: Final = _DETAIL_CACHE_EVICTIONS.labels('size')
+
+    def peek(self, conversation_id: int, started_at: datetime | None = None) -> ConversationDetail | None:
+        """Cached detail without loading it."""
+        detail = self._entries.get(conversation_id)
+        if detail is None:
+            return None
+        if monotonic() - detail.loaded_at > self._ttl:
+            self._remove(conversation_id)
+            self._expired_metric.inc()
+            return None
+        if started_at is not None and started_at != detail.started_at:
+            return None
+        self._entries.move_to_end(conversation_id)
+        return detail
+
+    async def get(self, conversation_id: int, started_at: datetime | None = None) -> ConversationDetail | None:
+        """Cached or loaded detail, None when there is no such conversation."""
+        detail = self.peek(conversation_id, started_at)
+        if detail is not None:
+            self._hit_metric.inc()
+            self._hit_bytes_metric.inc(len(detail.body))
+            return detail
+        self._miss_metric.inc()
+        async with self._db_manager.connect() as session:
+            conversation = await ConversationRepository(session).get_by_id(conversation_id, started_at)
+            if conversation is None:
+                return None
+            body = ConversationOut.model_validate(conversation).model_dump_json().encode()
+        detail = ConversationDetail(body=body, etag=strong_etag(body), started_at=conversation.started_at, loaded_at=monotonic())
+        self._put(conversation_id, detail)
+        return detail
+
+    def not_modified(self, detail: ConversationDetail) -> None:
+        """Counts a 304 sent instead of the detail."""
+        self._not_modified_metric.inc()
+        self._not_modified_bytes_metric.inc(len(detail.body))
+
+    def _put(self, conversation_id: int, detail: ConversationDetail) -> None:
+        if len(detail.body) > self._max_bytes // 8:
+            return
+        self._remove(conversation_id)
+        self._entries[conversation_id] = detail
+        self._bytes += len(detail.body)
+        while self._bytes > self._max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._size_metric.inc()
+        _DETAIL_CACHE_ENTRIES.set(len(self._entries))
+        _DETAIL_CACHE_BYTES.set(self._bytes)
+
+    def _remove(self, conversation_id: int) -> None:
+        detail = self._entries.pop(conversation_id, None)
+        if detail is not None:
+            self._bytes -= len(detail.body)
+            _DETAIL_CACHE_ENTRIES.set(len(self._entries))
+            _DETAIL_CACHE_BYTES.set(self._bytes)
+
+#####################################################################################################
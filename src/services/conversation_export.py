@@ -0,0 +1,244 @@
+#####################################################################################################
+"""
+Bulk export of conversations.
+
+Rows come from a server-side cursor (SQLAlchemy stream() over asyncpg) in batches of a fixed
+size. Every batch is encoded, optionally gzipped and handed to the response before the next
+one is fetched, so memory stays bounded by the batch size whatever the number of rows.
+"""
+import csv
+import zlib
+from datetime import datetime
+from io import StringIO
+from logging import Logger
+from time import perf_counter
+from typing import Any, AsyncIterator, Final, Protocol, Sequence
+
+import orjson
+from sqlalchemy import Select, select
+
+from app_types.enums import ExportFormat
+from configs.settings import AppSettings
+from db.connection.session import DatabaseManager
+from db.models.conversation import Conversation
+from db.models.enums import ConversationPurpose
+from db.models.lead import Lead
+from services.base import BaseService
+from utils.metrics import Counter, Histogram
+
+#####################################################################################################
+
+_EXPORT_ROWS: Final = Counter(
+    'voice_conversation_export_rows_total',
+    'Conversations written by exports',
+    ('format',),
+)
+_EXPORT_DURATION: Final = Histogram(
+    'voice_conversation_export_duration_seconds',
+    'Duration of conversation exports',
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+
+#####################################################################################################
+
+CSV_COLUMNS: Final = (
+    'id',
+    'agency_id',
+    'started_at',
+    'duration',
+    'topic',
+    'purpose',
+    'lead_created',
+    'tool_calls',
+    'lead_id',
+    'lead_name',
+    'lead_email',
+    'lead_phone',
+    'transcript',
+)
+
+#####################################################################################################
+
+class ExportEncoder(Protocol):
+    media_type: str
+
+    def header(self) -> bytes: ...
+
+    def encode(self, rows: Sequence[Any]) -> bytes: ...
+
+#####################################################################################################
+
+class NdjsonEncoder:
+    """One JSON object per line, the lead is nested like in ConversationOut."""
+
+    media_type: Final = 'application/x-ndjson'
+
+    def header(self) -> bytes:
+        return b''
+
+    def encode(self, rows: Sequence[Any]) -> bytes:
+        dumps = orjson.dumps
+        return b''.join(dumps(self._record(row), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+    @staticmethod
+    def _record(row: Any) -> dict[str, Any]:
+        lead = None
+        if row.lead_id is not None:
+            lead = {'id': row.lead_id, 'name': row.lead_name, 'email': row.lead_email, 'phone': row.lead_phone}
+        return {
+            'id': row.id,
+            'agency_id': row.agency_id,
+            'started_at': row.started_at,
+            'duration': row.duration,
+            'topic': row.topic,
+            'purpose': row.purpose,
+            'lead_created': row.lead_created,
+            'tool_calls': row.tool_calls,
+            'lead': lead,
+            'transcript': row.transcript,
+        }
+
+#####################################################################################################
+
+class CsvEncoder:
+    """Flat rows, the lead is split into columns and lists are written as JSON."""
+
+    media_type: Final = 'text/csv'
+
+    def header(self) -> bytes:
+        return self._write([CSV_COLUMNS])
+
+    def encode(self, rows: Sequence[Any]) -> bytes:
+        return self._write(self._record(row) for row in rows)
+
+    @staticmethod
+    def _record(row: Any) -> tuple:
+        return (
+            row.id,
+            row.agency_id,
+            row.started_at.isoformat() if row.started_at is not None else None,
+            row.duration,
+            row.topic,
+            row.purpose,
+            row.lead_created,
+            orjson.dumps(row.tool_calls).decode(),
+            row.lead_id,
+            row.lead_name,
+            row.lead_email,
+            row.lead_phone,
+            orjson.dumps(row.transcript).decode(),
+        )
+
+    @staticmethod
+    def _write(records) -> bytes:
+        buffer = StringIO()
+        csv.writer(buffer).writerows(records)
+        return buffer.getvalue().encode()
+
+#####################################################################################################
+
+ENCODERS: Final[dict[ExportFormat, ExportEncoder]] = {
+    ExportFormat.NDJSON: NdjsonEncoder(),
+    ExportFormat.CSV: CsvEncoder(),
+}
+
+#####################################################################################################
+
+async def encode_stream(
+    batches: AsyncIterator[Sequence[Any]],
+    encoder: ExportEncoder,
+    compress: bool = False,
+) -> AsyncIterator[bytes]:
+    """Encoded chunks of the batches, gzipped when compress is set. Empty chunks are skipped."""
+    # wbits 31 writes the gzip header and trailer
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def output(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor is not None else data
+
+    chunk = output(encoder.header())
+    if chunk:
+        yield chunk
+    async for rows in batches:
+        chunk = output(encoder.encode(rows))
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+#####################################################################################################
+
+class ConversationExportService(BaseService):
+    """Streams conversations with transcripts and leads as NDJSON or CSV."""
+
+    def __init__(self, app_settings: AppSettings, db_manager: DatabaseManager, logger: Logger) -> None:
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+        self._batch_size: Final = app_settings.conversation_export_batch_size
+        self._rows_metrics: Final = {export_format: _EXPORT_ROWS.labels(export_format.value) for export_format in ExportFormat}
+
+    @staticmethod
+    def statement(
+        started_from: datetime | None = None,
+        started_to: datetime | None = None,
+        agency_id: str | None = None,
+        purpose: ConversationPurpose | None = None,
+    ) -> Select:
+        stmt = select(
+            Conversation.id,
+            Conversation.agency_id,
+            Conversation.started_at,
+            Conversation.duration,
+            Conversation.topic,
+            Conversation.purpose,
+            Conversation.lead_created,
+            Conversation.tool_calls,
+            Lead.id.label('lead_id'),
+            Lead.name.label('lead_name'),
+            Lead.email.label('lead_email'),
+            Lead.phone.label('lead_phone'),
+            Conversation.transcript,
+        ).outerjoin(Lead, Conversation.lead_id == Lead.id)
+        if started_from is not None:
+            stmt = stmt.where(Conversation.started_at >= started_from)
+        if started_to is not None:
+            stmt = stmt.where(Conversation.started_at < started_to)
+        if agency_id is not None:
+            stmt = stmt.where(Conversation.agency_id == agency_id)
+        if purpose is not None:
+            stmt = stmt.where(Conversation.purpose == purpose)
+        # Same order as the list, read through the (started_at, id) indexes
+        return stmt.order_by(Conversation.started_at, Conversation.id)
+
+    def export(
+        self,
+        export_format: ExportFormat,
+        compress: bool = False,
+        started_from: datetime | None = None,
+        started_to: datetime | None = None,
+        agency_id: str | None = None,
+        purpose: ConversationPurpose | None = None,
+    ) -> AsyncIterator[bytes]:
+        """Chunks of the export. The query runs when the first chunk is requested."""
+        stmt = self.statement(started_from, started_to, agency_id, purpose)
+        return encode_stream(self._fetch(export_format, stmt), ENCODERS[export_format], compress)
+
+    async def _fetch(self, export_format: ExportFormat, stmt: Select) -> AsyncIterator[Sequence[Any]]:
+        rows_metric = self._rows_metrics[export_format]
+        started = perf_counter()
+        count = 0
+        try:
+            async with self._db_manager.engine.connect() as connection:
+                result = await connection.stream(stmt.execution_options(yield_per=self._batch_size))
+                async for rows in result.partitions():
+                    count += len(rows)
+                    rows_metric.inc(len(rows))
+                    yield rows
+        except Exception as ex:
+            # Headers are already sent, the client only sees a truncated body
+            self._logger.error(f'Conversation export failed after {count} rows', exc_info=ex)
+            raise
+        _EXPORT_DURATION.observe(perf_counter() - started)
+        self._logger.info(f'Exported {count} conversations as {export_format.value} in {perf_counter() - started:.1f}s')
+
+#####################################################################################################
@@ -0,0 +1,175 @@
+#####################################################################################################
+
+from asyncio import CancelledError, Task, create_task, sleep
+from datetime import datetime, timezone
+from logging import Logger
+from typing import Final
+
+from sqlalchemy import select
+
+from configs.settings import AppSettings
+from db.connection.session import DatabaseManager
+from db.models.agency import Agency
+from db.partitioning import (
+    DEFAULT_PARTITION,
+    add_months,
+    count_default_rows,
+    drop_partitions_before,
+    ensure_partitions,
+    month_start,
+)
+from db.repositories.conversation import ConversationRepository
+from db.repositories.conversation_search import ConversationSearchRepository
+from services.base import BaseService
+from utils.metrics import Counter, Gauge
+
+#####################################################################################################
+
+_PARTITIONS_CREATED: Final = Counter(
+    'voice_conversation_partitions_created_total',
+    'Monthly conversation partitions created ahead of time',
+)
+_PARTITIONS_REMOVED: Final = Counter(
+    'voice_conversation_partitions_removed_total',
+    'Expired monthly conversation partitions',
+    ('action',),
+)
+_RETENTION_DELETED: Final = Counter(
+    'voice_conversation_retention_deleted_total',
+    'Conversations deleted for agencies keeping them shorter than the partitions',
+)
+_MAINTENANCE_FAILURES: Final = Counter(
+    'voice_conversation_maintenance_failures_total',
+    'Failed runs of the conversation partition maintenance',
+)
+_DEFAULT_PARTITION_ROWS: Final = Gauge(
+    'voice_conversation_default_partition_rows',
+    'Conversations found in the default partition on the last maintenance run, their month had no partition',
+)
+_RETENTION_HORIZON: Final = Gauge(
+    'voice_conversation_retention_horizon_months',
+    'Months of conversations kept in partitions, 0 when kept forever',
+)
+
+#####################################################################################################
+
+class ConversationPartitionService(BaseService):
+    """
+    Maintenance of the monthly conversation partitions, see db.partitioning.
+
+    start() makes sure partitions for the current and upcoming months exist before any
+    conversation is written. A background loop repeats that and applies retention. Retention
+    is counted in whole UTC months. Partitions older than the longest retention of any agency
+    are detached and dropped, or moved to the archive schema. Agencies keeping conversations
+    for less have them deleted with one statement per agency, limited to the expired months,
+    so only their partitions are scanned. Conversations without agency follow the default.
+    Analytics rollups are kept.
+    """
+
+    def __init__(self, app_settings: AppSettings, db_manager: DatabaseManager, logger: Logger) -> None:
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+        self._months_ahead: Final = app_settings.conversation_partitions_ahead
+        self._default_retention: Final = app_settings.conversation_retention_months
+        self._archive: Final = app_settings.conversation_retention_archive
+        self._interval: Final = app_settings.conversation_maintenance_interval
+        self._maintenance_task: Task | None = None
+        self._removed_metric: Final = _PARTITIONS_REMOVED.labels('archived' if self._archive else 'dropped')
+
+    async def start(self) -> None:
+        if self._maintenance_task is not None:
+            return
+        try:
+            await self.ensure_partitions()
+        except Exception as ex:
+            _MAINTENANCE_FAILURES.inc()
+            self._logger.error('Failed to create conversation partitions', exc_info=ex)
+        if self._interval > 0:
+            self._maintenance_task = create_task(self._maintenance_loop(), name='conversation-partitions')
+
+    async def stop(self) -> None:
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except CancelledError:
+                pass
+            self._maintenance_task = None
+
+    async def ensure_partitions(self) -> list[str]:
+        async with self._db_manager.engine.begin() as connection:
+            default_rows = await connection.run_sync(count_default_rows)
+            created = await connection.run_sync(ensure_partitions, self._months_ahead)
+        _DEFAULT_PARTITION_ROWS.set(default_rows)
+        if default_rows:
+            self._logger.warning(
+                f'{default_rows} conversations were written to {DEFAULT_PARTITION}, their months had no'
+                ' partition. Moved them to partitions of their months, check the clock of the writers'
+            )
+        if created is None:
+            self._logger.warning(
+                'Conversations table is not partitioned, run "python -m db.partitioning migrate"'
+            )
+            return []
+        if created:
+            _PARTITIONS_CREATED.inc(len(created))
+            self._logger.info(f'Created conversation partitions {", ".join(created)}')
+        return created
+
+    async def apply_retention(self, now: datetime | None = None) -> dict[str, int]:
+        """Removes expired conversations. Returns numbers of removed partitions and deleted rows."""
+        current = month_start(now or datetime.now(timezone.utc))
+        async with self._db_manager.connect() as session:
+            overrides = dict((await session.execute(
+                select(Agency.id, Agency.settings['retention_months'].as_integer())
+                .where(Agency.settings['retention_months'].as_integer().is_not(None))
+            )).tuples().all())
+
+        # 0 keeps forever, so does the horizon once anything is kept forever
+        retentions = [self._default_retention, *overrides.values()]
+        horizon = 0 if 0 in retentions else max(retentions)
+        _RETENTION_HORIZON.set(horizon)
+
+        removed = []
+        if horizon:
+            async with self._db_manager.engine.begin() as connection:
+                removed = await connection.run_sync(
+                    drop_partitions_before, add_months(current, -horizon), self._archive,
+                )
+            if removed:
+                self._removed_metric.inc(len(removed))
+                self._logger.info(f'Removed expired conversation partitions {", ".join(removed)}')
+
+        deleted = 0
+        async with self._db_manager.connect() as session:
+            conversations = ConversationRepository(session)
+            search = ConversationSearchRepository(session)
+            if horizon:
+                # Search rows are not partitioned, those of the removed months go in one statement
+                await search.delete_started_before(add_months(current, -horizon))
+            for agency_id, months in overrides.items():
+                if months != horizon and months != self._default_retention:
+                    before = add_months(current, -months)
+                    deleted += await conversations.delete_started_before(before, agency_ids=[agency_id])
+                    await search.delete_started_before(before, agency_ids=[agency_id])
+            if self._default_retention and self._default_retention != horizon:
+                before = add_months(current, -self._default_retention)
+                keep = [agency_id for agency_id in overrides if overrides[agency_id] != self._default_retention]
+                deleted += await conversations.delete_started_before(before, keep_agency_ids=keep)
+                await search.delete_started_before(before, keep_agency_ids=keep)
+        if deleted:
+            _RETENTION_DELETED.inc(deleted)
+            self._logger.info(f'Deleted {deleted} expired conversations')
+        return {'partitions': len(removed), 'conversations': deleted}
+
+    async def _maintenance_loop(self) -> None:
+        while True:
+            try:
+                await self.ensure_partitions()
+                await self.apply_retention()
+            except Exception as ex:
+                _MAINTENANCE_FAILURES.inc()
+                self._logger.error('Conversation partition maintenance failed', exc_info=ex)
+            await sleep(self._interval)
+
+#####################################################################################################
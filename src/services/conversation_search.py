@@ -0,0 +1,102 @@
+#####################################################################################################
+
+from datetime import datetime
+from logging import Logger
+from typing import Any, Final, Literal
+
+from app_types.exceptions import InvalidSearchQuery
+from db.connection.session import DatabaseManager
+from db.repositories.conversation import ConversationRepository
+from db.repositories.conversation_search import ConversationSearchRepository
+from schema.conversation import ConversationSearchHitOut, ConversationSearchPageOut
+from services.base import BaseService
+from utils.pagination import decode_cursor, encode_cursor
+from utils.search import build_tsquery, transcript_texts
+
+#####################################################################################################
+
+# Weights of the roles in the search document and the text their snippets come from
+_ROLES: Final = {
+    'user': ('A', 'user_text'),
+    'assistant': ('B', 'assistant_text'),
+}
+
+#####################################################################################################
+
+def search_document(
+    conversation_id: int,
+    agency_id: str | None,
+    started_at: datetime,
+    transcript: list[dict] | None,
+) -> dict[str, Any]:
+    """Search table row of a conversation."""
+    user_text, assistant_text = transcript_texts(transcript)
+    return {
+        'conversation_id': conversation_id,
+        'agency_id': agency_id,
+        'started_at': started_at,
+        'user_text': user_text,
+        'assistant_text': assistant_text,
+    }
+
+#####################################################################################################
+
+class ConversationSearchService(BaseService):
+    """Full-text search over transcripts, see db.models.conversation_search."""
+
+    _BACKFILL_BATCH_SIZE: Final = 500
+
+    def __init__(self, db_manager: DatabaseManager, logger: Logger) -> None:
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 20,
+        cursor: str | None = None,
+        role: Literal['user', 'assistant'] | None = None,
+        agency_id: str | None = None,
+        started_from: datetime | None = None,
+        started_to: datetime | None = None,
+    ) -> ConversationSearchPageOut:
+        """Newest matching conversations first. Raises InvalidSearchQuery and InvalidCursor."""
+        weights, snippet_from = _ROLES[role] if role else ('', None)
+        try:
+            tsquery = build_tsquery(query, weights)
+        except ValueError as ex:
+            raise InvalidSearchQuery(str(ex)) from ex
+        after = decode_cursor(cursor, datetime, int) if cursor else None
+        async with self._db_manager.connect() as session:
+            hits = await ConversationSearchRepository(session).search(
+                tsquery,
+                limit + 1,
+                after=after,
+                snippet_from=snippet_from,
+                agency_id=agency_id,
+                started_from=started_from,
+                started_to=started_to,
+            )
+        items = [ConversationSearchHitOut.model_validate(hit, from_attributes=True) for hit in hits[:limit]]
+        next_cursor = encode_cursor(items[-1].started_at, items[-1].id) if len(hits) > limit else None
+        return ConversationSearchPageOut(items=items, next_cursor=next_cursor)
+
+    async def backfill(self) -> int:
+        """Indexes conversations stored before the search existed. Returns their number."""
+        indexed = 0
+        after_id = 0
+        while True:
+            async with self._db_manager.connect() as session:
+                conversations = await ConversationRepository(session).get_unindexed(after_id, self._BACKFILL_BATCH_SIZE)
+                if not conversations:
+                    break
+                await ConversationSearchRepository(session).create([
+                    search_document(conversation.id, conversation.agency_id, conversation.started_at, conversation.transcript)
+                    for conversation in conversations
+                ])
+            indexed += len(conversations)
+            after_id = conversations[-1].id
+        self._logger.info(f'Search backfill indexed {indexed} conversations')
+        return indexed
+
+#####################################################################################################
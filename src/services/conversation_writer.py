@@ -0,0 +1,246 @@
+#####################################################################################################
+
+from asyncio import CancelledError, Queue, Task, create_task, get_running_loop, sleep, wait_for
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from logging import Logger
+from time import perf_counter
+from typing import Final, Sequence
+
+from configs.settings import AppSettings
+from db.connection.session import DatabaseManager
+from db.models.enums import ConversationPurpose
+from db.repositories.conversation import ConversationRepository
+from db.repositories.conversation_search import ConversationSearchRepository
+from db.repositories.conversation_stats import ConversationStatsRepository
+from db.repositories.lead import LeadRepository
+from schema.conversation import ConversationState
+from schema.lead import LeadInfo
+from services.analytics import rollup
+from services.base import BaseService
+from services.conversation_search import search_document
+from utils.metrics import Counter, Gauge, Histogram
+from utils.tracing import TRACER, Span
+
+#####################################################################################################
+
+_WRITER_QUEUE_DEPTH: Final = Gauge(
+    'voice_conversation_writer_queue_depth',
+    'Finished conversations waiting to be written',
+)
+_WRITER_BATCH_SIZE: Final = Histogram(
+    'voice_conversation_writer_batch_size',
+    'Conversations written per transaction',
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+_WRITER_FLUSH_DURATION: Final = Histogram(
+    'voice_conversation_writer_flush_duration_seconds',
+    'Duration of a successful batch write',
+)
+_WRITER_CONVERSATIONS: Final = Counter(
+    'voice_conversation_writer_conversations_total',
+    'Finished conversations handled by the writer',
+    ('result',),
+)
+
+#####################################################################################################
+
+@dataclass(frozen=True, slots=True)
+class FinishedConversation:
+    agency_id: str | None
+    started_at: datetime
+    duration: int
+    topic: str | None
+    purpose: ConversationPurpose | None
+    lead_created: bool
+    tool_calls: list[str]
+    transcript: list[dict]
+    # Set when the lead was already stored together with its appointment
+    lead_id: str | None
+    lead_info: LeadInfo | None
+    # From submit until written, when the session is traced
+    trace_span: Span | None = None
+
+    @classmethod
+    def from_state(
+        cls,
+        state: ConversationState,
+        agency_id: str | None,
+        trace_span: Span | None = None,
+    ) -> 'FinishedConversation':
+        lead_id = state.lead_id
+        if lead_id is None and not state.lead_created and state.returning_caller is not None:
+            # Calls of a returning caller without a new lead are attributed to the known one
+            lead_id = str(state.returning_caller.leads[0].id)
+        return cls(
+            agency_id=agency_id,
+            started_at=state.started_at,
+            duration=int((datetime.now(timezone.utc) - state.started_at).total_seconds()),
+            topic=state.topic,
+            purpose=state.purpose,
+            lead_created=state.lead_created,
+            tool_calls=list(state.tool_calls),
+            transcript=state.transcript,
+            lead_id=lead_id,
+            lead_info=state.lead_info,
+            trace_span=trace_span,
+        )
+
+    @property
+    def needs_lead(self) -> bool:
+        return self.lead_created and self.lead_id is None and self.lead_info is not None
+
+def _end_spans(batch: Sequence[FinishedConversation], error: Exception | None = None) -> None:
+    for conversation in batch:
+        if conversation.trace_span is not None:
+            conversation.trace_span.set_attribute('db.batch.size', len(batch))
+            TRACER.end_span(conversation.trace_span, error)
+
+#####################################################################################################
+
+class ConversationWriter(BaseService):
+    """
+    Write-behind persistence of finished calls.
+
+    Hangup only puts the conversation into a bounded queue. A background loop writes it
+    together with others in one transaction: a multi-row upsert of the new leads, multi-row
+    INSERTs of the conversations and their search documents and an upsert of their analytics
+    rollups. A batch is written when it is full or when its oldest conversation waited
+    flush_interval. A full queue makes submit() wait, so a slow database slows hangups
+    down instead of growing memory. Failed batches are retried with backoff; after the last
+    attempt conversations are written one by one, so a single bad row does not drop the rest.
+    stop() writes everything queued before it returns.
+    """
+
+    def __init__(self, app_settings: AppSettings, db_manager: DatabaseManager, logger: Logger) -> None:
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+        self._batch_size: Final = app_settings.conversation_writer_batch_size
+        self._flush_interval: Final = app_settings.conversation_writer_flush_interval
+        self._max_attempts: Final = app_settings.conversation_writer_max_attempts
+        self._retry_base_delay: Final = app_settings.conversation_writer_retry_base_delay
+        # None is the stop marker, everything queued before it is written
+        self._queue: Final[Queue[FinishedConversation | None]] = Queue(maxsize=app_settings.conversation_writer_queue_size)
+        self._flush_task: Task | None = None
+        self._written_metric: Final = _WRITER_CONVERSATIONS.labels('written')
+        self._retried_metric: Final = _WRITER_CONVERSATIONS.labels('retried')
+        self._dropped_metric: Final = _WRITER_CONVERSATIONS.labels('dropped')
+
+    def start(self) -> None:
+        if self._flush_task is None:
+            self._flush_task = create_task(self._flush_loop(), name='conversation-writer')
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            task, self._flush_task = self._flush_task, None
+            await self._queue.put(None)
+            try:
+                await task
+            except CancelledError:
+                pass
+
+    async def submit(self, conversation: FinishedConversation) -> None:
+        """Queues the conversation for writing. Waits while the queue is full."""
+        if self._flush_task is None:
+            # Not running or shutting down, calls ending now are written right away
+            await self._write([conversation])
+            return
+        await self._queue.put(conversation)
+        _WRITER_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def _flush_loop(self) -> None:
+        loop = get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self._flush_interval
+            while len(batch) < self._batch_size:
+                try:
+                    conversation = await wait_for(self._queue.get(), timeout=max(deadline - loop.time(), 0))
+                except TimeoutError:
+                    break
+                if conversation is None:
+                    stopping = True
+                    break
+                batch.append(conversation)
+            _WRITER_QUEUE_DEPTH.set(self._queue.qsize())
+            try:
+                await self._write(batch)
+            except Exception as ex:
+                self._logger.error(f'Failed to write {len(batch)} conversations', exc_info=ex)
+
+    async def _write(self, batch: list[FinishedConversation]) -> None:
+        for attempt in range(1, self._max_attempts + 1):
+            started = perf_counter()
+            try:
+                await self.write_batch(batch)
+            except Exception as ex:
+                if attempt == self._max_attempts:
+                    await self._write_one_by_one(batch, ex)
+                    return
+                self._retried_metric.inc(len(batch))
+                self._logger.warning(f'Writing {len(batch)} conversations failed, attempt {attempt}: {ex}')
+                await sleep(self._retry_base_delay * 2 ** (attempt - 1))
+            else:
+                _WRITER_FLUSH_DURATION.observe(perf_counter() - started)
+                _WRITER_BATCH_SIZE.observe(len(batch))
+                self._written_metric.inc(len(batch))
+                _end_spans(batch)
+                return
+
+    async def _write_one_by_one(self, batch: list[FinishedConversation], error: Exception) -> None:
+        if len(batch) == 1:
+            self._dropped_metric.inc()
+            self._logger.error(f'Dropped conversation started at {batch[0].started_at}', exc_info=error)
+            _end_spans(batch, error)
+            return
+        for conversation in batch:
+            try:
+                await self.write_batch([conversation])
+            except Exception as ex:
+                self._dropped_metric.inc()
+                self._logger.error(f'Dropped conversation started at {conversation.started_at}', exc_info=ex)
+                _end_spans([conversation], ex)
+            else:
+                _WRITER_BATCH_SIZE.observe(1)
+                self._written_metric.inc()
+                _end_spans([conversation])
+
+    async def write_batch(self, batch: Sequence[FinishedConversation]) -> list[int]:
+        """
+        Writes new leads, the conversations, their search documents and analytics rollups
+        in one transaction.
+        Returns ids of the conversations.
+        """
+        async with self._db_manager.connect() as session:
+            new_leads = [conversation for conversation in batch if conversation.needs_lead]
+            lead_ids = await LeadRepository(session).upsert_many(
+                [conversation.lead_info for conversation in new_leads],
+                [conversation.agency_id for conversation in new_leads],
+            )
+            created_lead_ids = {id(conversation): lead_id for conversation, lead_id in zip(new_leads, lead_ids)}
+            ids = await ConversationRepository(session).create_many([
+                {
+                    'agency_id': conversation.agency_id,
+                    'started_at': conversation.started_at,
+                    'duration': conversation.duration,
+                    'topic': conversation.topic,
+                    'purpose': conversation.purpose,
+                    'lead_created': conversation.lead_created,
+                    'tool_calls': conversation.tool_calls,
+                    'transcript_packed': conversation.transcript,
+                    'lead_id': created_lead_ids.get(id(conversation), conversation.lead_id),
+                }
+                for conversation in batch
+            ])
+            await ConversationSearchRepository(session).create([
+                search_document(conversation_id, conversation.agency_id, conversation.started_at, conversation.transcript)
+                for conversation_id, conversation in zip(ids, batch)
+            ])
+            await ConversationStatsRepository(session).increment([daily.to_row() for daily in rollup(batch).values()])
+            return ids
+
+#####################################################################################################
@@ -1,4 +1,5 @@
-from typing import Final
+import copy
+from typing import Any, Final, Iterable
 
 FUNCTION_DEFINITIONS: Final = [
     {
@@ -81,10 +82,6 @@ FUNCTION_DEFINITIONS: Final = [
                 "property_id": {
                     "type": "string",
                     "description": "ID of the property involved"
-                },
-                "additional_information": {
-                    "type": "string",
-                    "description": "Any extra info about the appointment"
                 }
             },
             "required": ["start", "end", "name", "address", "agent_id", "event_type", "property_id", "email", "phone"],
@@ -92,19 +89,8 @@ FUNCTION_DEFINITIONS: Final = [
     },
     {
         "name": "end_call",
-        "description": """End the conversation and close the connection. Call this function when:
-     - User says goodbye, thank you, etc.
-     - User indicates they're done ("that's all I need", "I'm all set", etc.)
-     - User wants to end the conversation
-
-     Examples of triggers:
-     - "Thank you, bye!"
-     - "That's all I needed, thanks"
-     - "Have a good day"
-     - "Goodbye"
-     - "I'm done"
-
-     Do not call this function if the user is just saying thanks but continuing the conversation.""",
+        "description": "End the call when the user says goodbye or is done (\"Thank you, bye!\", \"That's all I"
+                       " needed\"). Do not call it if the user thanks you but continues the conversation.",
         "parameters": {
             "type": "object",
             "properties": {
@@ -118,3 +104,37 @@ FUNCTION_DEFINITIONS: Final = [
         },
     },
 ]
+
+# Functions needed by each agency task, functions of no task are always available
+TASK_FUNCTIONS: Final = {
+    'viewing': ('searchForProperties', 'getFreeCalendarSlots', 'createAppointment'),
+    'valuation': ('getFreeCalendarSlots', 'createAppointment'),
+}
+_TASK_EVENT_TYPES: Final = {
+    'viewing': 'Viewing',
+    'valuation': 'Valuation',
+}
+
+
+def build_function_definitions(tasks: Iterable[str]) -> list[dict[str, Any]]:
+    """
+    Definitions of the functions the tasks need, as sent to the LLM on every turn.
+    Whitespace of descriptions is collapsed and event types of disabled tasks are removed.
+    """
+    tasks = set(tasks)
+    task_bound = {name for names in TASK_FUNCTIONS.values() for name in names}
+    enabled = {name for task in tasks for name in TASK_FUNCTIONS.get(task, ())}
+    event_types = [_TASK_EVENT_TYPES[task] for task in _TASK_EVENT_TYPES if task in tasks]
+    definitions = []
+    for definition in FUNCTION_DEFINITIONS:
+        if definition['name'] in task_bound and definition['name'] not in enabled:
+            continue
+        definition = copy.deepcopy(definition)
+        definition['description'] = ' '.join(definition['description'].split())
+        for name, prop in definition.get('parameters', {}).get('properties', {}).items():
+            if 'description' in prop:
+                prop['description'] = ' '.join(prop['description'].split())
+            if name == 'event_type' and 'enum' in prop:
+                prop['enum'] = [value for value in prop['enum'] if value in event_types]
+        definitions.append(definition)
+    return definitions
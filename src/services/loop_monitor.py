@@ -0,0 +1,132 @@
+#####################################################################################################
+
+import asyncio
+import sys
+import traceback
+from asyncio import AbstractEventLoop, CancelledError, Task, create_task, current_task, get_running_loop, sleep
+from logging import Logger
+from os.path import dirname
+from threading import Event, Thread, get_ident
+from time import monotonic
+from typing import Final
+
+from configs.settings import AppSettings
+from services.base import BaseService
+from utils.metrics import Counter, Histogram
+
+#####################################################################################################
+
+_ASYNCIO_DIR: Final = dirname(asyncio.__file__)
+
+_LOOP_LAG: Final = Histogram(
+    'voice_event_loop_lag_seconds',
+    'How much later than scheduled the loop woke up the lag sampler',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+_LOOP_STALLS: Final = Counter(
+    'voice_event_loop_stalls_total',
+    'Loop stalls longer than the threshold by whether their stack was logged',
+    ('report',),
+)
+
+#####################################################################################################
+
+class LoopLagMonitor(BaseService):
+    """
+    Finds code that blocks the event loop, which delays audio of every call on the worker.
+
+    A task sleeps for the sample interval and records how much later it woke up. It also
+    leaves a heartbeat, which a watchdog thread checks: while the heartbeat is older than the
+    threshold, the loop is stuck in one callback. The watchdog then logs the Python stack of
+    the loop thread and the name of the running task, once per stall and at most once per
+    report interval, so a node that keeps blocking does not flood the log.
+    """
+
+    def __init__(self, app_settings: AppSettings, logger: Logger) -> None:
+        self._logger: Final = logger
+        self._enabled: Final = app_settings.loop_monitor_enabled
+        self._interval: Final = app_settings.loop_monitor_interval
+        self._threshold: Final = app_settings.loop_monitor_stall_threshold
+        self._report_interval: Final = app_settings.loop_monitor_report_interval
+        self._sample_task: Task | None = None
+        self._watchdog: Thread | None = None
+        self._stop_event: Final = Event()
+        self._loop: AbstractEventLoop | None = None
+        self._loop_thread_id = 0
+        # Written by the loop, read by the watchdog. A float assignment is atomic under the GIL
+        self._heartbeat = 0.0
+        self._reported_metric: Final = _LOOP_STALLS.labels('reported')
+        self._suppressed_metric: Final = _LOOP_STALLS.labels('suppressed')
+
+    def start(self) -> None:
+        if not self._enabled or self._sample_task is not None:
+            return
+        self._loop = get_running_loop()
+        self._loop_thread_id = get_ident()
+        self._heartbeat = monotonic()
+        self._stop_event.clear()
+        self._sample_task = create_task(self._sample_loop(), name='loop-lag-sampler')
+        self._watchdog = Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._sample_task is not None:
+            self._sample_task.cancel()
+            try:
+                await self._sample_task
+            except CancelledError:
+                pass
+            self._sample_task = None
+        if self._watchdog is not None:
+            self._stop_event.set()
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _sample_loop(self) -> None:
+        while True:
+            scheduled = monotonic() + self._interval
+            await sleep(self._interval)
+            now = monotonic()
+            _LOOP_LAG.observe(max(now - scheduled, 0.0))
+            self._heartbeat = now
+
+    def _watch(self) -> None:
+        # Stalls are checked a few times per threshold, so one is seen soon after it begins
+        period = min(self._threshold / 4, self._interval)
+        stalled_since = None
+        last_report = float('-inf')
+        while not self._stop_event.wait(period):
+            heartbeat = self._heartbeat
+            stalled_for = monotonic() - heartbeat - self._interval
+            if stalled_for < self._threshold:
+                stalled_since = None
+                continue
+            if stalled_since == heartbeat:
+                # Same stall as on the previous check, it has been counted already
+                continue
+            stalled_since = heartbeat
+            if monotonic() - last_report < self._report_interval:
+                self._suppressed_metric.inc()
+                continue
+            last_report = monotonic()
+            self._reported_metric.inc()
+            self._report(stalled_for)
+
+    def _report(self, stalled_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        frames = traceback.extract_stack(frame) if frame is not None else traceback.StackSummary()
+        # Frames of the loop itself only say that a callback is running
+        for index in range(len(frames) - 1, -1, -1):
+            if frames[index].filename.startswith(_ASYNCIO_DIR):
+                if index + 1 < len(frames):
+                    frames = traceback.StackSummary.from_list(frames[index + 1:])
+                break
+        stack = ''.join(frames.format()) or 'not available\n'
+        task = current_task(self._loop)
+        task_name = task.get_name() if task is not None else 'none, a callback is running'
+        self._logger.warning(
+            f'Event loop is blocked for at least {stalled_for:.3f}s, task: {task_name}\n'
+            f'Stack of the loop thread:\n{stack}'
+        )
+
+#####################################################################################################
@@ -0,0 +1,64 @@
+#####################################################################################################
+
+from asyncio import CancelledError, Task, create_task, sleep
+from logging import Logger
+from typing import Final
+
+from configs.settings import AppSettings
+from services.base import BaseService
+from utils.metrics import Counter
+from utils.prompt import PromptTemplateBuilder
+
+#####################################################################################################
+
+_PROMPT_RELOADS: Final = Counter(
+    'voice_prompt_reloads_total',
+    'Reloads of prompt files',
+    ('result',),
+)
+
+#####################################################################################################
+
+class PromptService(BaseService):
+    """Keeps prompt templates in memory and reloads them in the background when files change."""
+
+    def __init__(self, app_settings: AppSettings, logger: Logger) -> None:
+        self._logger: Final = logger
+        self._reload_interval: Final = app_settings.prompt_reload_interval
+        self._reload_task: Task | None = None
+        self.builder: Final = PromptTemplateBuilder()
+        self.reload()
+
+    def start(self) -> None:
+        if self._reload_interval > 0 and self._reload_task is None:
+            self._reload_task = create_task(self._reload_loop(), name='prompt-reload')
+
+    async def stop(self) -> None:
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            try:
+                await self._reload_task
+            except CancelledError:
+                pass
+            self._reload_task = None
+
+    def reload(self) -> list[str]:
+        version = self.builder.version
+        errors = self.builder.reload()
+        for error in errors:
+            _PROMPT_RELOADS.labels('error').inc()
+            self._logger.error(f'Failed to reload prompt template {error}')
+        if self.builder.version != version:
+            _PROMPT_RELOADS.labels('ok').inc()
+            self._logger.info(f'Prompt templates reloaded, version {self.builder.version}')
+        return errors
+
+    async def _reload_loop(self) -> None:
+        while True:
+            await sleep(self._reload_interval)
+            try:
+                self.reload()
+            except Exception as ex:
+                self._logger.error('Prompt reload failed', exc_info=ex)
+
+#####################################################################################################
@@ -0,0 +1,293 @@
+#####################################################################################################
+
+import re
+from asyncio import CancelledError, Task, create_task, sleep
+from collections import Counter as TokenCounter
+from logging import Logger
+from time import monotonic, time
+from typing import Final, Iterable
+
+from sqlalchemy import select
+
+from configs.settings import AppSettings
+from db.connection.session import DatabaseManager
+from db.models.agency import Agency as AgencyModel
+from schema.xano import PropertySyncItem, PropertySyncRequest, SearchPropertyItemXanoFormat
+from services.base import BaseService
+from services.xano import XanoService
+from utils.metrics import Counter, Gauge
+
+#####################################################################################################
+
+_INDEX_DOCUMENTS: Final = Gauge(
+    'voice_property_index_documents',
+    'Number of properties in the local catalog index',
+    ('agency',),
+)
+_INDEX_LAST_SYNC: Final = Gauge(
+    'voice_property_index_last_sync_timestamp_seconds',
+    'Unix time of the last successful catalog sync',
+    ('agency',),
+)
+_INDEX_LOOKUPS: Final = Counter(
+    'voice_property_index_lookups_total',
+    'Property lookups answered by the local index',
+    ('result',),
+)
+
+_TOKEN_RE: Final = re.compile(r'[a-z0-9]+')
+_POSTCODE_RE: Final = re.compile(r'\b([a-z]{1,2}[0-9][a-z0-9]?)\s*([0-9][a-z]{2})?\b')
+_ABBREVIATIONS: Final = {
+    'street': 'st',
+    'road': 'rd',
+    'avenue': 'ave',
+    'drive': 'dr',
+    'lane': 'ln',
+    'place': 'pl',
+    'terrace': 'ter',
+    'crescent': 'cres',
+    'court': 'ct',
+    'gardens': 'gdns',
+    'square': 'sq',
+}
+
+#####################################################################################################
+
+def _tokenize(text: str) -> list[str]:
+    return [_ABBREVIATIONS.get(token, token) for token in _TOKEN_RE.findall(text.lower())]
+
+def _trigrams(token: str) -> set[str]:
+    padded = f' {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _compact_postcode(postcode: str) -> str:
+    return ''.join(postcode.lower().split())
+
+#####################################################################################################
+
+class PropertyIndex:
+    """
+    In-memory search index of a single agency catalog.
+
+    Token and trigram inverted indexes over address, city and postcode, plus a map from every
+    prefix of the compacted postcode to the properties. Lookups are pure python dict/set work.
+    """
+
+    _MIN_TOKEN_SIMILARITY: Final = 0.5
+    _MIN_SCORE: Final = 0.6
+    _POSTCODE_BONUS: Final = 1.0
+    _POSTCODE_PREFIX_BONUS: Final = 0.5
+
+    def __init__(self) -> None:
+        self._documents: dict[str, SearchPropertyItemXanoFormat] = {}
+        self._document_tokens: dict[str, tuple[set[str], set[str], str]] = {}
+        self._tokens: dict[str, set[str]] = {}
+        self._trigrams: dict[str, set[str]] = {}
+        self._postcode_prefixes: dict[str, set[str]] = {}
+        self.cursor: int | None = None
+        self.synced_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def upsert(self, item: SearchPropertyItemXanoFormat) -> None:
+        self.remove(item.external_id)
+        doc_id = item.external_id
+        tokens = set(_tokenize(f'{item.address} {item.city} {item.postcode}'))
+        trigrams = {trigram for token in tokens for trigram in _trigrams(token)}
+        postcode = _compact_postcode(item.postcode)
+        self._documents[doc_id] = item
+        self._document_tokens[doc_id] = (tokens, trigrams, postcode)
+        for token in tokens:
+            self._tokens.setdefault(token, set()).add(doc_id)
+        for trigram in trigrams:
+            self._trigrams.setdefault(trigram, set()).add(doc_id)
+        for end in range(2, len(postcode) + 1):
+            self._postcode_prefixes.setdefault(postcode[:end], set()).add(doc_id)
+
+    def remove(self, doc_id: str) -> None:
+        if doc_id not in self._documents:
+            return
+        del self._documents[doc_id]
+        tokens, trigrams, postcode = self._document_tokens.pop(doc_id)
+        self._discard(self._tokens, tokens, doc_id)
+        self._discard(self._trigrams, trigrams, doc_id)
+        self._discard(self._postcode_prefixes, (postcode[:end] for end in range(2, len(postcode) + 1)), doc_id)
+
+    @staticmethod
+    def _discard(index: dict[str, set[str]], keys: Iterable[str], doc_id: str) -> None:
+        for key in keys:
+            postings = index.get(key)
+            if postings is None:
+                continue
+            postings.discard(doc_id)
+            if not postings:
+                del index[key]
+
+    def search(self, query: str, limit: int = 5) -> list[SearchPropertyItemXanoFormat]:
+        query_tokens = _tokenize(query)
+        if not query_tokens:
+            return []
+        scores: TokenCounter[str] = TokenCounter()
+        for token in set(query_tokens):
+            scores.update(self._match_token(token))
+
+        for outward, inward in _POSTCODE_RE.findall(query.lower()):
+            full = f'{outward}{inward}'
+            for doc_id in self._postcode_prefixes.get(full, ()):
+                scores[doc_id] += self._POSTCODE_BONUS if inward else self._POSTCODE_PREFIX_BONUS
+
+        threshold = self._MIN_SCORE * len(set(query_tokens))
+        ranked = sorted(
+            ((score, doc_id) for doc_id, score in scores.items() if score >= threshold),
+            key=lambda pair: (-pair[0], pair[1]),
+        )
+        return [self._documents[doc_id] for _score, doc_id in ranked[:limit]]
+
+    def _match_token(self, token: str) -> dict[str, float]:
+        exact = self._tokens.get(token)
+        if exact:
+            # Known word, trigram scan would only add noise and cost
+            return dict.fromkeys(exact, 1.0)
+        matches: dict[str, float] = {}
+        query_trigrams = _trigrams(token)
+        hits: TokenCounter[str] = TokenCounter()
+        for trigram in query_trigrams:
+            hits.update(self._trigrams.get(trigram, ()))
+        for doc_id, count in hits.items():
+            similarity = count / len(query_trigrams)
+            if similarity >= self._MIN_TOKEN_SIMILARITY:
+                matches[doc_id] = similarity
+        return matches
+
+#####################################################################################################
+
+class PropertyCatalog(BaseService):
+    """
+    Keeps a PropertyIndex per agency in sync with Xano in the background.
+
+    Sync is incremental by the updated_at cursor, with a periodic full rebuild that also drops
+    deleted properties. Agencies over the size limit are not indexed and always go to Xano.
+    """
+
+    _PAGE_SIZE: Final = 500
+
+    def __init__(
+        self,
+        app_settings: AppSettings,
+        xano_service: XanoService,
+        db_manager: DatabaseManager,
+        logger: Logger,
+    ) -> None:
+        self._xano_service: Final = xano_service
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+        self._enabled: Final = app_settings.property_index_enabled
+        self._sync_interval: Final = app_settings.property_index_sync_interval
+        self._full_resync_interval: Final = app_settings.property_index_full_resync_interval
+        self._max_staleness: Final = app_settings.property_index_max_staleness
+        self._max_documents: Final = app_settings.property_index_max_documents
+        self._indexes: dict[str, PropertyIndex] = {}
+        self._full_synced_at: dict[str, float] = {}
+        self._sync_task: Task | None = None
+        self._hit_metric: Final = _INDEX_LOOKUPS.labels('hit')
+        self._miss_metric: Final = _INDEX_LOOKUPS.labels('miss')
+        self._stale_metric: Final = _INDEX_LOOKUPS.labels('stale')
+
+    def start(self) -> None:
+        if self._enabled and self._sync_task is None:
+            self._sync_task = create_task(self._sync_loop(), name='property-catalog-sync')
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except CancelledError:
+                pass
+            self._sync_task = None
+
+    def search(self, agency_id: str, query: str, limit: int = 5) -> list[SearchPropertyItemXanoFormat] | None:
+        """Returns None when the index can not answer and Xano should be asked instead."""
+        index = self._indexes.get(agency_id)
+        if index is None or index.synced_at is None or monotonic() - index.synced_at > self._max_staleness:
+            self._stale_metric.inc()
+            return None
+        items = index.search(query, limit)
+        if not items:
+            self._miss_metric.inc()
+            return None
+        self._hit_metric.inc()
+        return items
+
+    async def _sync_loop(self) -> None:
+        while True:
+            try:
+                for agency_id in await self._load_agency_ids():
+                    await self.sync_agency(agency_id)
+            except CancelledError:
+                raise
+            except Exception as ex:
+                self._logger.error('Property catalog sync failed', exc_info=ex)
+            await sleep(self._sync_interval)
+
+    async def _load_agency_ids(self) -> list[str]:
+        async with self._db_manager.connect() as session:
+            result = await session.execute(select(AgencyModel.id))
+            return [str(agency_id) for agency_id in result.scalars()]
+
+    async def sync_agency(self, agency_id: str) -> None:
+        current = self._indexes.get(agency_id)
+        full_resync_due = monotonic() - self._full_synced_at.get(agency_id, 0) > self._full_resync_interval
+        if current is None and agency_id in self._full_synced_at and not full_resync_due:
+            # Catalog was over the limit on the last sync, a refetch now would be thrown away too
+            return
+        full = current is None or full_resync_due
+        # Full rebuild goes into a fresh index and is swapped in only when complete
+        index = PropertyIndex() if full else current
+        items = await self._fetch_changes(agency_id, None if full else index.cursor)
+        if items is None:
+            return
+        for item in items:
+            if item.deleted:
+                index.remove(item.external_id)
+            else:
+                index.upsert(item)
+            if item.updated_at is not None and (index.cursor is None or item.updated_at > index.cursor):
+                index.cursor = item.updated_at
+        if len(index) > self._max_documents:
+            self._logger.warning(
+                f'Property catalog of agency "{agency_id}" has {len(index)} items, more than'
+                f' {self._max_documents}. Agency is not indexed.'
+            )
+            self._indexes.pop(agency_id, None)
+            self._full_synced_at[agency_id] = monotonic()
+            _INDEX_DOCUMENTS.labels(agency_id).set(0)
+            return
+        index.synced_at = monotonic()
+        if full:
+            self._full_synced_at[agency_id] = index.synced_at
+        self._indexes[agency_id] = index
+        _INDEX_DOCUMENTS.labels(agency_id).set(len(index))
+        _INDEX_LAST_SYNC.labels(agency_id).set(time())
+
+    async def _fetch_changes(self, agency_id: str, updated_after: int | None) -> list[PropertySyncItem] | None:
+        items: list[PropertySyncItem] = []
+        page: int | None = 1
+        while page is not None:
+            response = await self._xano_service.get_properties_page(PropertySyncRequest(
+                agency_id=agency_id,
+                updated_after=updated_after,
+                page=page,
+                per_page=self._PAGE_SIZE,
+            ))
+            if response is None:
+                return None
+            items.extend(response.items)
+            # Stop early instead of holding an unbounded catalog in memory
+            if len(items) > self._max_documents and updated_after is None:
+                break
+            page = response.nextPage
+        return items
+
+#####################################################################################################
@@ -0,0 +1,162 @@
+#####################################################################################################
+
+from asyncio import CancelledError, Task, create_task, sleep, to_thread
+from logging import Logger
+from typing import Any, Final, Sequence
+
+from aiohttp import ClientSession, ClientTimeout
+
+from configs.constants import BASE_DIR
+from configs.settings import AppSettings
+from services.base import BaseService
+from utils.metrics import Counter
+from utils.serialization import dumps
+from utils.tracing import TRACER, Span
+
+#####################################################################################################
+
+_SPANS_EXPORTED: Final = Counter(
+    'voice_trace_spans_exported_total',
+    'Spans written by the trace exporter by destination and result',
+    ('destination', 'result'),
+)
+
+# Values of OTLP Status.StatusCode
+_STATUS_OK: Final = 1
+_STATUS_ERROR: Final = 2
+
+#####################################################################################################
+
+def _attribute_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def _attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    return [{'key': key, 'value': _attribute_value(value)} for key, value in attributes.items() if value is not None]
+
+def _span(span: Span) -> dict[str, Any]:
+    encoded = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': int(span.kind),
+        'startTimeUnixNano': str(span.start_ns),
+        'endTimeUnixNano': str(span.end_ns),
+        'attributes': _attributes(span.attributes),
+        'status': {'code': _STATUS_ERROR, 'message': span.error} if span.error else {'code': _STATUS_OK},
+    }
+    if span.parent_span_id is not None:
+        encoded['parentSpanId'] = span.parent_span_id
+    return encoded
+
+def encode_spans(spans: Sequence[Span], service_name: str, service_version: str) -> bytes:
+    """ExportTraceServiceRequest in the OTLP JSON encoding."""
+    return dumps({
+        'resourceSpans': [{
+            'resource': {'attributes': _attributes({'service.name': service_name, 'service.version': service_version})},
+            'scopeSpans': [{
+                'scope': {'name': 'pg-voice-agent'},
+                'spans': [_span(span) for span in spans],
+            }],
+        }],
+    })
+
+#####################################################################################################
+
+class TraceExporter(BaseService):
+    """
+    Periodically exports finished spans of utils.tracing in the OTLP JSON encoding: appended
+    to a file, one request per line (what the otlpjsonfile receiver of the OpenTelemetry
+    collector reads), and/or posted to an OTLP/HTTP endpoint, e.g. _otlp_standin.py. The file
+    is written in a thread, the event loop carries live audio.
+    """
+
+    def __init__(self, app_settings: AppSettings, aiohttp_client: ClientSession, logger: Logger) -> None:
+        self._aiohttp_client: Final = aiohttp_client
+        self._logger: Final = logger
+        self._interval: Final = app_settings.tracing_export_interval
+        self._path: Final = BASE_DIR / app_settings.tracing_export_path if app_settings.tracing_export_path else None
+        self._endpoint: Final = (
+            f'{app_settings.tracing_otlp_endpoint.rstrip("/")}/v1/traces' if app_settings.tracing_otlp_endpoint else None
+        )
+        self._service_name: Final = app_settings.app_name
+        self._service_version: Final = app_settings.app_version
+        self._export_task: Task | None = None
+        self._file_ok_metric: Final = _SPANS_EXPORTED.labels('file', 'ok')
+        self._file_failed_metric: Final = _SPANS_EXPORTED.labels('file', 'failed')
+        self._otlp_ok_metric: Final = _SPANS_EXPORTED.labels('otlp', 'ok')
+        self._otlp_failed_metric: Final = _SPANS_EXPORTED.labels('otlp', 'failed')
+        # Without a destination there is nothing to sample for
+        TRACER.configure(
+            sample_rate=app_settings.tracing_sample_rate if self._path or self._endpoint else 0.0,
+            max_queued_spans=app_settings.tracing_max_queued_spans,
+        )
+
+    def start(self) -> None:
+        if self._export_task is None and TRACER.sample_rate > 0:
+            self._export_task = create_task(self._export_loop(), name='trace-exporter')
+
+    async def stop(self) -> None:
+        if self._export_task is not None:
+            self._export_task.cancel()
+            try:
+                await self._export_task
+            except CancelledError:
+                pass
+            self._export_task = None
+            # Spans of the sessions which finished on shutdown
+            await self.export()
+
+    async def _export_loop(self) -> None:
+        while True:
+            await sleep(self._interval)
+            try:
+                await self.export()
+            except Exception as ex:
+                self._logger.error('Failed to export spans', exc_info=ex)
+
+    async def export(self) -> int:
+        """Exports spans finished since the last export. Returns how many there were."""
+        spans = TRACER.drain()
+        if not spans:
+            return 0
+        payload = encode_spans(spans, self._service_name, self._service_version)
+        if self._path is not None:
+            try:
+                await to_thread(self._append, payload)
+            except OSError as ex:
+                self._file_failed_metric.inc(len(spans))
+                self._logger.warning(f'Failed to write {len(spans)} spans to {self._path}: {ex}')
+            else:
+                self._file_ok_metric.inc(len(spans))
+        if self._endpoint is not None:
+            await self._post(payload, len(spans))
+        return len(spans)
+
+    def _append(self, payload: bytes) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._path, 'ab') as file:
+            file.write(payload + b'\n')
+
+    async def _post(self, payload: bytes, count: int) -> None:
+        try:
+            async with self._aiohttp_client.post(
+                self._endpoint,
+                data=payload,
+                headers={'Content-Type': 'application/json'},
+                timeout=ClientTimeout(total=5),
+            ) as response:
+                if response.status >= 300:
+                    raise RuntimeError(f'status {response.status}')
+        except Exception as ex:
+            self._otlp_failed_metric.inc(count)
+            self._logger.warning(f'Failed to post {count} spans to {self._endpoint}: {ex}')
+        else:
+            self._otlp_ok_metric.inc(count)
+
+#####################################################################################################
@@ -0,0 +1,73 @@
+#####################################################################################################
+
+from logging import Logger
+from typing import Final
+
+from db.connection.session import DatabaseManager
+from db.repositories.conversation import ConversationRepository
+from schema.conversation import TranscriptPackReportOut
+from services.base import BaseService
+from utils.metrics import Counter
+from utils.transcript import pack_transcript
+
+#####################################################################################################
+
+_TRANSCRIPTS_PACKED: Final = Counter(
+    'voice_transcripts_packed_total',
+    'Plain JSON transcripts re-encoded into the packed format',
+)
+_TRANSCRIPT_BYTES: Final = Counter(
+    'voice_transcripts_packed_bytes_total',
+    'Stored size of re-encoded transcripts',
+    ('format',),
+)
+
+#####################################################################################################
+
+class TranscriptStorageService(BaseService):
+    """
+    Re-encodes transcripts of conversations written before they were packed, see
+    utils.transcript. Both formats are read the same way, so it can run any time. Every batch
+    is its own transaction. Disk space is given back to PostgreSQL by the next (auto)vacuum.
+    """
+
+    _BATCH_SIZE: Final = 500
+
+    def __init__(self, db_manager: DatabaseManager, logger: Logger) -> None:
+        self._db_manager: Final = db_manager
+        self._logger: Final = logger
+        self._plain_bytes_metric: Final = _TRANSCRIPT_BYTES.labels('plain')
+        self._packed_bytes_metric: Final = _TRANSCRIPT_BYTES.labels('packed')
+
+    async def pack_existing(self) -> TranscriptPackReportOut:
+        report = TranscriptPackReportOut(conversations=0, stored_bytes_before=0, stored_bytes_after=0)
+        after_id = 0
+        while True:
+            async with self._db_manager.connect() as session:
+                repository = ConversationRepository(session)
+                conversations = await repository.get_unpacked(after_id, self._BATCH_SIZE)
+                if not conversations:
+                    break
+                # A row without a transcript has nothing to pack, writing it would clear the packed one
+                plain = [conversation for conversation in conversations if conversation.transcript is not None]
+                packed = [
+                    (conversation.id, conversation.started_at, pack_transcript(conversation.transcript))
+                    for conversation in plain
+                ]
+                await repository.set_packed_transcripts(packed)
+            plain_bytes = sum(conversation.stored_bytes for conversation in plain)
+            packed_bytes = sum(len(transcript) for _, _, transcript in packed)
+            report.conversations += len(packed)
+            report.stored_bytes_before += plain_bytes
+            report.stored_bytes_after += packed_bytes
+            _TRANSCRIPTS_PACKED.inc(len(packed))
+            self._plain_bytes_metric.inc(plain_bytes)
+            self._packed_bytes_metric.inc(packed_bytes)
+            after_id = conversations[-1].id
+        self._logger.info(
+            f'Packed {report.conversations} transcripts, '
+            f'{report.stored_bytes_before} bytes before, {report.stored_bytes_after} after'
+        )
+        return report
+
+#####################################################################################################
@@ -1,9 +1,8 @@
 #####################################################################################################
-import json
-from asyncio import Event
+from asyncio import Event, create_task, gather
 from datetime import datetime, timezone
 from logging import Logger
-from pathlib import Path
+from typing import Awaitable, Callable, Final
 
 from fastapi import WebSocketDisconnect
 from deepgram import (
@@ -24,26 +23,68 @@ from deepgram import (
 )
 from deepgram.utils import verboselogs
 from pydantic import ValidationError
-from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.websockets import WebSocket, WebSocketState
 
-from commands.commands import (
-    CreateAppointmentCommand,
-    EndCallCommand,
-    GetFreeCalendarSlotsCommand,
-    SearchPropertiesCommand,
-)
+from commands.commands import DEFAULT_FILLER_PHRASES, CommandContext
+from commands.dispatcher import ToolCallDispatcher
+from commands.registry import CommandRegistry
 from configs.settings import AppSettings
-from db.repositories.conversation import ConversationRepository
-from db.repositories.lead import LeadRepository
 from schema.client import ClientJsonMessage
 from schema.conversation import ConversationState
-from services.agency import AgencyService
-from services.func_tools import FUNCTION_DEFINITIONS
+from services.agency_cache import AgencyConfigCache
+from services.calendar_prefetch import CalendarPrefetcher
+from services.caller_lookup import CallerLookupService
+from services.conversation_writer import ConversationWriter, FinishedConversation
+from services.func_tools import TASK_FUNCTIONS, build_function_definitions
 from services.xano import XanoService
 from utils.deepgram_clients import RedefinedAsyncDeepgramAgentClient
+from utils.prompt import PromptTemplateBuilder
+from utils.serialization import dumps_text, loads
+from utils.metrics import Counter, Gauge
+from utils.settings_frame import PreSerializedSettings, SettingsFrameTemplate, placeholder
+from utils.tracing import TRACER, Span, SpanKind
 
 
+#####################################################################################################
+
+# Dev mode settings frames by prompts version and dev options of the client
+_DEV_SETTINGS_FRAMES: Final[dict[tuple, SettingsFrameTemplate]] = {}
+
+# Frames to the client that never change are serialized once
+_SETTINGS_APPLIED_FRAME: Final = dumps_text({"type": "settings_applied"})
+_STARTUP_ERROR_FRAME: Final = dumps_text({"type": "error", "detail": "error on startup deepgram connection"})
+_WRONG_FORMAT_FRAME: Final = dumps_text({"type": "error", "detail": "Wrong message format"})
+_UNKNOWN_ERROR_FRAME: Final = dumps_text({"type": "error", "detail": "Unknown error occurred"})
+
+# Agency label of dev mode sessions, they have no agency
+_DEV_AGENCY: Final = 'dev'
+
+_SESSIONS_ACTIVE: Final = Gauge(
+    'voice_sessions_active',
+    'Sessions with a started Deepgram agent by agency',
+    ('agency',),
+)
+_SESSIONS_STARTED: Final = Counter(
+    'voice_sessions_started_total',
+    'Sessions whose Deepgram agent started by agency',
+    ('agency',),
+)
+_SESSIONS_FINISHED: Final = Counter(
+    'voice_sessions_finished_total',
+    'Started sessions which finished by agency',
+    ('agency',),
+)
+_AUDIO_BYTES: Final = Counter(
+    'voice_audio_bytes_total',
+    'Audio from the client to Deepgram (inbound) and from Deepgram to the client (outbound)',
+    ('direction',),
+)
+_DEEPGRAM_EVENTS: Final = Counter(
+    'voice_deepgram_events_total',
+    'Events received from Deepgram by type',
+    ('event',),
+)
+
 #####################################################################################################
 
 
@@ -53,15 +94,30 @@ class VoiceAssistant:
         app_settings: AppSettings,
         client_ws: WebSocket,
         xano_service: XanoService,
+        command_registry: CommandRegistry,
+        agency_config_cache: AgencyConfigCache,
+        prompt_builder: PromptTemplateBuilder,
+        conversation_writer: ConversationWriter,
+        caller_lookup: CallerLookupService,
         logger: Logger,
-        db_session: AsyncSession,
     ) -> None:
         self._app_settings = app_settings
         self._xano_service = xano_service
-        self._db_session = db_session
         self.client_ws = client_ws
-        self._agency_service = AgencyService(session=db_session)
+        self._agency_config_cache = agency_config_cache
+        self._conversation_writer = conversation_writer
+        self._caller_lookup = caller_lookup
         self._conv_state: ConversationState | None = None
+        self._filler_phrases: tuple[str, ...] = DEFAULT_FILLER_PHRASES
+        self._agency_id: str | None = None
+        # Agency label of the session once its Deepgram agent started
+        self._session_agency: str | None = None
+        # Bound once, they are updated on every audio frame
+        self._audio_in_metric = _AUDIO_BYTES.labels('inbound')
+        self._audio_out_metric = _AUDIO_BYTES.labels('outbound')
+        # Root span of the session and the wait for Deepgram to apply settings, when traced
+        self._trace_span: Span | None = None
+        self._settings_span: Span | None = None
 
         # TODO init it later to set up micro and speaker.
         config: DeepgramClientOptions = DeepgramClientOptions(
@@ -73,101 +129,140 @@ class VoiceAssistant:
             verbose=verboselogs.WARNING,
         )
         self.deepgram_client = DeepgramClient(app_settings.deepgram_api_key, config)
-        self._instructions_path = Path(__file__).parent.parent / 'prompts' / 'dev_instructions.txt'
+        self._prompt_builder = prompt_builder
         self.dg_connection: AsyncAgentWebSocketClient | None = None
         self._shutdown_event = Event()
         self._logger = logger
-
-    async def _save_conversation_state(self) -> None:
-        lead = None
-        if self._conv_state.lead_created:
-            lead_repo = LeadRepository(self._db_session)
-            lead = await lead_repo.create(
-                name=self._conv_state.lead_info.name,
-                email=self._conv_state.lead_info.email,
-                phone=self._conv_state.lead_info.phone,
+        self._calendar_prefetcher: CalendarPrefetcher | None = None
+        if app_settings.calendar_prefetch_enabled:
+            self._calendar_prefetcher = CalendarPrefetcher(
+                xano_service=xano_service,
+                logger=logger,
+                max_entries=app_settings.calendar_prefetch_max_per_session,
             )
+        self._tool_dispatcher = ToolCallDispatcher(
+            registry=command_registry,
+            logger=logger,
+            max_concurrency=app_settings.tool_calls_max_concurrency,
+        )
 
+    async def _save_conversation_state(self) -> None:
         if self._conv_state:
-            conversation_repo = ConversationRepository(self._db_session)
-            duration = int((datetime.now(timezone.utc) - self._conv_state.started_at).total_seconds())
-            await conversation_repo.create(
-                duration=duration,
-                started_at=self._conv_state.started_at,
-                topic=self._conv_state.topic,
-                purpose=self._conv_state.purpose,
-                lead_created=self._conv_state.lead_created,
-                tool_calls=list(self._conv_state.tool_calls),
-                transcript=self._conv_state.transcript,
-                lead_id=lead.id if lead else None
+            persist_span = TRACER.start_span('conversation persist', parent=self._trace_span, kind=SpanKind.CLIENT)
+            await self._conversation_writer.submit(
+                FinishedConversation.from_state(self._conv_state, self._agency_id, trace_span=persist_span),
             )
-        return
 
     async def _process_bytes_message(self, data: bytes) -> None:
+        self._audio_in_metric.inc(len(data))
         if self.dg_connection:
             is_send = await self.dg_connection.send(data)
 
     async def _get_configuration_options(self, message: ClientJsonMessage) -> SettingsConfigurationOptions:
         if message.dev_mode and self._app_settings.dev_mode:
-            if message.dev_options is not None:
-                speak = Speak(
-                    model=message.dev_options.voice_model,
-                    provider=message.dev_options.provider,
-                    voice_id=message.dev_options.voice_id,
-                )
-            else:
-                speak = Speak(
-                    model=None,
-                    provider='eleven_labs',
-                    voice_id='SB13jgWjPxi4e4JoTT1H',
-                )
-            # return dev mode options
-            agent = Agent(
-                think=Think(
-                    provider=Provider(
-                        type='open_ai',
-                    ),
-                    model='gpt-4o-mini',
-                    instructions=self._instructions_path.read_text().format(now=datetime.now()),
-                    functions=FUNCTION_DEFINITIONS,
-                ),
-                speak=speak
-            )
-            audio = Audio(
-                input=Input(
-                    encoding='linear32',
-                    sample_rate=48000,
-                ),
-                output=Output(
-                    encoding='linear16',
-                    sample_rate=24000,
-                    container='none',
-                )
+            dev_options = message.dev_options
+            key = (
+                self._prompt_builder.version,
+                (dev_options.voice_model, dev_options.provider, dev_options.voice_id) if dev_options else None,
             )
-            context = Context(
-                messages=[
-                    {
-                        "role": "assistant",
-                        "content": "Welcome to Pacitti Jones. I’m Margaret, your AI assistant."
-                                   " How may I help you today?"
-                    },
-                ],
-                replay=True
+            frame = _DEV_SETTINGS_FRAMES.get(key)
+            if frame is None:
+                # Frames of older prompts are not needed anymore
+                for stale_key in [k for k in _DEV_SETTINGS_FRAMES if k[0] != key[0]]:
+                    del _DEV_SETTINGS_FRAMES[stale_key]
+                frame = _DEV_SETTINGS_FRAMES[key] = self._compile_dev_settings_frame(message)
+            return PreSerializedSettings(frame.render(now=datetime.now()))
+        else:
+            settings = await self._agency_config_cache.get(message.client_id)
+            self._agency_id = str(message.client_id)
+            if settings.filler_phrases is not None:
+                self._filler_phrases = tuple(settings.filler_phrases)
+            return PreSerializedSettings(settings.settings_frame)
+
+    def _compile_dev_settings_frame(self, message: ClientJsonMessage) -> SettingsFrameTemplate:
+        if message.dev_options is not None:
+            speak = Speak(
+                model=message.dev_options.voice_model,
+                provider=message.dev_options.provider,
+                voice_id=message.dev_options.voice_id,
             )
-            return SettingsConfigurationOptions(agent=agent, audio=audio, context=context)
         else:
-            settings = await self._agency_service.get_agency_configuration(message.client_id)
-            return SettingsConfigurationOptions.from_dict(settings)
+            speak = Speak(
+                model=None,
+                provider='eleven_labs',
+                voice_id='SB13jgWjPxi4e4JoTT1H',
+            )
+        # return dev mode options
+        agent = Agent(
+            think=Think(
+                provider=Provider(
+                    type='open_ai',
+                ),
+                model='gpt-4o-mini',
+                instructions=self._prompt_builder.dev_instructions.render(now=placeholder('now')),
+                functions=build_function_definitions(TASK_FUNCTIONS),
+            ),
+            speak=speak
+        )
+        audio = Audio(
+            input=Input(
+                encoding='linear32',
+                sample_rate=48000,
+            ),
+            output=Output(
+                encoding='linear16',
+                sample_rate=24000,
+                container='none',
+            )
+        )
+        context = Context(
+            messages=[
+                {
+                    "role": "assistant",
+                    "content": "Welcome to Pacitti Jones. I’m Margaret, your AI assistant."
+                               " How may I help you today?"
+                },
+            ],
+            replay=True
+        )
+        options = SettingsConfigurationOptions(agent=agent, audio=audio, context=context)
+        return SettingsFrameTemplate.compile(options.to_dict())
 
     async def _on_start(self, message: ClientJsonMessage) -> None:
+        with TRACER.span('session bootstrap', parent=self._trace_span) as bootstrap_span:
+            await self._bootstrap(message, bootstrap_span)
+
+    async def _bootstrap(self, message: ClientJsonMessage, bootstrap_span: Span | None) -> None:
         self.dg_connection: RedefinedAsyncDeepgramAgentClient = RedefinedAsyncDeepgramAgentClient(self.deepgram_client._config) # TODO mb in init???
         self._register_handlers()
-        options = await self._get_configuration_options(message)
-        if await self.dg_connection.start(options) is False:
-            await self.client_ws.send_json(data={"type": "error", "detail": "error on startup deepgram connection"})
-        else:
-            self._conv_state = ConversationState(started_at=datetime.now(timezone.utc))
-            await self.client_ws.send_json(data={"type": "settings_applied"})
+        with TRACER.span('agency config'):
+            options = await self._get_configuration_options(message)
+        if self._trace_span is not None:
+            self._trace_span.set_attribute('agency.id', self._agency_id)
+        # Runs while the Deepgram connection is being set up
+        caller_lookup = create_task(self._caller_lookup.find(self._agency_id, message.caller_phone, message.caller_email))
+        try:
+            with TRACER.span('deepgram connect', kind=SpanKind.CLIENT):
+                started = await self.dg_connection.start(options)
+            if started is False:
+                await self.client_ws.send_text(_STARTUP_ERROR_FRAME)
+            else:
+                # Ends when Deepgram confirms the settings
+                self._settings_span = TRACER.start_span('deepgram settings applied', parent=bootstrap_span)
+                self._conv_state = ConversationState(
+                    started_at=datetime.now(timezone.utc),
+                    returning_caller=await caller_lookup,
+                )
+                await self.client_ws.send_text(_SETTINGS_APPLIED_FRAME)
+                if self._session_agency is None:
+                    self._session_agency = self._agency_id or _DEV_AGENCY
+                    _SESSIONS_ACTIVE.labels(self._session_agency).inc()
+                    _SESSIONS_STARTED.labels(self._session_agency).inc()
+        finally:
+            # When the connect failed or was cancelled, the lookup must not outlive the bootstrap with its
+            # DB session, nor leave its exception unretrieved
+            caller_lookup.cancel()
+            await gather(caller_lookup, return_exceptions=True)
 
     async def _on_finish(self) -> None:
         await self.finish()
@@ -181,7 +276,7 @@ class VoiceAssistant:
         else:
             # TODO Implement interaction with agency service
             self._logger.warning(f'Received unknown message type from client: "{message.type}"')
-            await self.client_ws.send_json({'type': 'error', "detail": f'Unknown message type: {message.type}'})
+            await self.client_ws.send_text(dumps_text({'type': 'error', "detail": f'Unknown message type: {message.type}'}))
 
     async def _handle_client_message(self) -> None:
         message = await self.client_ws.receive()
@@ -194,12 +289,14 @@ class VoiceAssistant:
                 client_message = ClientJsonMessage.model_validate_json(message["text"])
                 await self._process_json_message(client_message)
             except ValidationError:
-                await self.client_ws.send_json({"type": "error", "detail": 'Wrong message format'})
+                await self.client_ws.send_text(_WRONG_FORMAT_FRAME)
             except Exception as e:
                 self._logger.error('Error when processing text message', exc_info=e)
-                await self.client_ws.send_json({"type": "error", "detail": "Unknown error occurred"})
+                await self.client_ws.send_text(_UNKNOWN_ERROR_FRAME)
 
     async def run(self) -> None:
+        session_id, self._trace_span = TRACER.start_session('voice session')
+        self._logger.info(f'Session {session_id} started' + (', traced' if self._trace_span is not None else ''))
         try:
             while not self._shutdown_event.is_set():
                 try:
@@ -212,11 +309,8 @@ class VoiceAssistant:
             if not self._shutdown_event.is_set():
                 await self.finish()
             await self._save_conversation_state()
-            self._logger.info('Conversation was successfully saved in DB')
-
-    def _get_actual_instructions(self) -> str:
-        # TODO return depending on time zone
-        return self._instructions_path.read_text().format(now=datetime.now())
+            self._logger.info('Conversation was queued for saving in DB')
+            TRACER.end_span(self._trace_span)
 
     async def finish(self) -> None:
         if self._shutdown_event.is_set():
@@ -224,6 +318,12 @@ class VoiceAssistant:
             return
         self._logger.info("Starting Shutting down process")
         self._shutdown_event.set()
+        if self._session_agency is not None:
+            _SESSIONS_ACTIVE.labels(self._session_agency).dec()
+            _SESSIONS_FINISHED.labels(self._session_agency).inc()
+        await self._tool_dispatcher.cancel_all()
+        if self._calendar_prefetcher is not None:
+            await self._calendar_prefetcher.cancel()
 
         if self.client_ws.client_state == WebSocketState.CONNECTED:
             await self.client_ws.close()
@@ -238,27 +338,30 @@ class VoiceAssistant:
             print(f"\n\n{open}\n\n")
 
         async def on_binary_data(deepgram_agent, data, **kwargs):
+            self._audio_out_metric.inc(len(data))
             await self.client_ws.send_bytes(data)
 
         async def on_welcome(deepgram_agent, welcome, **kwargs):
             print(f"\n\n{welcome}\n\n")
 
         async def on_settings_applied(deepgram_agent, settings_applied, **kwargs):
+            TRACER.end_span(self._settings_span)
             print(f"\n\n{settings_applied}\n\n")
 
         async def on_conversation_text(deepgram_agent, conversation_text, **kwargs):
-            await self.client_ws.send_text(conversation_text.to_json(indent=4))
-            self._conv_state.transcript.append(conversation_text.to_dict())
+            turn = conversation_text.to_dict()
+            await self.client_ws.send_text(dumps_text(turn))
+            self._conv_state.transcript.append(turn)
 
         async def on_user_started_speaking(deepgram_agent, user_started_speaking, **kwargs):
-            await self.client_ws.send_text(user_started_speaking.to_json())
+            await self.client_ws.send_text(dumps_text(user_started_speaking.to_dict()))
 
         async def on_agent_thinking(deepgram_agent, agent_thinking, **kwargs):
             print(f"\n\n{agent_thinking}\n\n")
 
         async def on_function_calling(deepgram_agent, function_calling, **kwargs):
             if self._app_settings.dev_mode:
-                await self.client_ws.send_text(function_calling.to_json())
+                await self.client_ws.send_text(dumps_text(function_calling.to_dict()))
 
         async def on_function_call(
             deepgram_agent: AsyncAgentWebSocketClient,
@@ -266,34 +369,19 @@ class VoiceAssistant:
             **kwargs,
         ) -> None:
             self._logger.debug(f'Function call name: "{function_call_request.function_name}" received with params: {function_call_request.input}')
-            if not function_call_request.input:
-                await deepgram_agent.send(json.dumps({"error": "No input data provided for function call."}))
-            cmd_name = function_call_request.function_name
-            command_args = {
-                "xano_service": self._xano_service,
-                "logger": self._logger,
-                "client_ws": self.client_ws,
-                "deepgram_agent": deepgram_agent,
-                "dev_mode": self._app_settings.dev_mode,
-                "conv_state": self._conv_state,
-            }
-            match cmd_name:
-                case 'searchForProperties':
-                    cmd = SearchPropertiesCommand(**command_args)
-                    await cmd.execute(function_call_request)
-                case 'getFreeCalendarSlots':
-                    cmd = GetFreeCalendarSlotsCommand(**command_args)
-                    await cmd.execute(function_call_request)
-                case 'createAppointment':
-                    cmd = CreateAppointmentCommand(**command_args)
-                    await cmd.execute(function_call_request)
-                case 'end_call':
-                    cmd = EndCallCommand(exit_callback=self.finish, **command_args)
-                    await cmd.execute(function_call_request)
-                case _:
-                    self._logger.warning(f'Unknown function call: "{cmd_name}"')
-                    await deepgram_agent.send(json.dumps({"error": f"Unknown function call: {cmd_name}"}))
-                
+            ctx = CommandContext(
+                client_ws=self.client_ws,
+                deepgram_agent=deepgram_agent,
+                conv_state=self._conv_state,
+                exit_callback=self.finish,
+                agency_id=self._agency_id,
+                filler_phrases=self._filler_phrases,
+                calendar_prefetcher=self._calendar_prefetcher,
+                trace_span=self._trace_span,
+            )
+            # Do not await the tool here: SDK awaits handlers before reading the next upstream message
+            self._tool_dispatcher.dispatch(ctx, function_call_request)
+
         async def on_agent_started_speaking(deepgram_agent, agent_started_speaking, **kwargs):
             print(f"\n\n{agent_started_speaking}\n\n")
 
@@ -308,29 +396,35 @@ class VoiceAssistant:
 
         async def on_unhandled(deepgram_agent, unhandled, **kwargs):
             try:
-                data = json.loads(unhandled['raw'])
+                data = loads(unhandled['raw'])
                 if data.get('type') == "EndOfThought":
                     print("EndOfThought received")
             except Exception as ex:
                 print(f"\n\n{unhandled}\n\n")
 
-        self.dg_connection.on(AgentWebSocketEvents.Open, on_open)
-        self.dg_connection.on(AgentWebSocketEvents.AudioData, on_binary_data)
-        self.dg_connection.on(AgentWebSocketEvents.Welcome, on_welcome)
-        self.dg_connection.on(AgentWebSocketEvents.SettingsApplied, on_settings_applied)
-        self.dg_connection.on(AgentWebSocketEvents.ConversationText, on_conversation_text)
-        self.dg_connection.on(
-            AgentWebSocketEvents.UserStartedSpeaking, on_user_started_speaking
-        )
-        self.dg_connection.on(AgentWebSocketEvents.AgentThinking, on_agent_thinking)
-        self.dg_connection.on(AgentWebSocketEvents.FunctionCalling, on_function_calling)
-        self.dg_connection.on(AgentWebSocketEvents.FunctionCallRequest, on_function_call)
-        self.dg_connection.on(
-            AgentWebSocketEvents.AgentStartedSpeaking, on_agent_started_speaking
-        )
-        self.dg_connection.on(AgentWebSocketEvents.AgentAudioDone, on_agent_audio_done)
-        self.dg_connection.on(AgentWebSocketEvents.Close, on_close)
-        self.dg_connection.on(AgentWebSocketEvents.Error, on_error)
-        self.dg_connection.on(AgentWebSocketEvents.Unhandled, on_unhandled)
+        self._on(AgentWebSocketEvents.Open, on_open)
+        self._on(AgentWebSocketEvents.AudioData, on_binary_data)
+        self._on(AgentWebSocketEvents.Welcome, on_welcome)
+        self._on(AgentWebSocketEvents.SettingsApplied, on_settings_applied)
+        self._on(AgentWebSocketEvents.ConversationText, on_conversation_text)
+        self._on(AgentWebSocketEvents.UserStartedSpeaking, on_user_started_speaking)
+        self._on(AgentWebSocketEvents.AgentThinking, on_agent_thinking)
+        self._on(AgentWebSocketEvents.FunctionCalling, on_function_calling)
+        self._on(AgentWebSocketEvents.FunctionCallRequest, on_function_call)
+        self._on(AgentWebSocketEvents.AgentStartedSpeaking, on_agent_started_speaking)
+        self._on(AgentWebSocketEvents.AgentAudioDone, on_agent_audio_done)
+        self._on(AgentWebSocketEvents.Close, on_close)
+        self._on(AgentWebSocketEvents.Error, on_error)
+        self._on(AgentWebSocketEvents.Unhandled, on_unhandled)
+
+    def _on(self, event: AgentWebSocketEvents, handler: Callable[..., Awaitable[None]]) -> None:
+        """Registers handler of a Deepgram event, counting the events."""
+        events_metric = _DEEPGRAM_EVENTS.labels(event.value)
+
+        async def counted(deepgram_agent, *args, **kwargs):
+            events_metric.inc()
+            await handler(deepgram_agent, *args, **kwargs)
+
+        self.dg_connection.on(event, counted)
 
 #####################################################################################################
@@ -1,15 +1,31 @@
 #####################################################################################################
 
 from http import HTTPStatus
-from typing import Final
+from time import perf_counter
+from typing import Any, Final
 from logging import Logger
-from aiohttp import ClientSession
+from aiohttp import ClientResponse, ClientSession
 from pydantic import ValidationError
 
-from schema.xano import CalendarSlotsRequest, CreateAppointmentRequest, SearchPropertyResponse, \
-    TimeSlot
+from schema.xano import CalendarSlotsRequest, CreateAppointmentRequest, PropertySyncRequest, \
+    PropertySyncResponse, SearchPropertyResponse, TimeSlot
 from services.base import BaseService
 from configs.settings import AppSettings
+from utils.metrics import Counter, Histogram
+from utils.tracing import TRACER, SpanKind, trace_headers
+
+#####################################################################################################
+
+_XANO_REQUEST_DURATION: Final = Histogram(
+    'voice_xano_request_duration_seconds',
+    'Time until Xano answered with response headers by endpoint',
+    ('endpoint',),
+)
+_XANO_RESPONSES: Final = Counter(
+    'voice_xano_responses_total',
+    'Xano responses by endpoint and HTTP status, "error" when there was no response',
+    ('endpoint', 'status'),
+)
 
 #####################################################################################################
 
@@ -27,20 +43,40 @@ class XanoService(BaseService):
         self._headers = {
             'Authorization': f'Bearer {app_settings.xano_dev_api_token}'
         }
-        self._xano_api_url: Final = 'https://xgpn-deh3-dvvh.n7c.xano.io/api:7-FXIT0K'  # FIXME to env?
+        self._xano_api_url: Final = app_settings.xano_api_url.rstrip('/')
         self._calendar_slots_url: Final = f'{self._xano_api_url}/calendar_slots'
         self._search_property_url: Final = f'{self._xano_api_url}/property_search_address'
         self._create_appointment_url: Final = f'{self._xano_api_url}/calendar'
+        self._property_sync_url: Final = f'{self._xano_api_url}/property_sync'
+        self._duration_metrics: Final = {
+            endpoint: _XANO_REQUEST_DURATION.labels(endpoint)
+            for endpoint in ('calendar_slots', 'property_search_address', 'calendar', 'property_sync')
+        }
+
+    async def _post(self, endpoint: str, url: str, payload: dict[str, Any], headers: dict[str, str]) -> ClientResponse:
+        with TRACER.span(f'xano {endpoint}', kind=SpanKind.CLIENT, attributes={'http.request.method': 'POST', 'url.full': url}) as span:
+            # Lets requests of a call be found in Xano logs by its session id
+            headers = {**headers, **trace_headers()}
+            started = perf_counter()
+            try:
+                response = await self._aiohttp_client.post(json=payload, url=url, headers=headers)
+            except Exception:
+                _XANO_RESPONSES.labels(endpoint, 'error').inc()
+                raise
+            finally:
+                self._duration_metrics[endpoint].observe(perf_counter() - started)
+            _XANO_RESPONSES.labels(endpoint, str(response.status)).inc()
+            if span is not None:
+                span.set_attribute('http.response.status_code', response.status)
+                if response.status >= 400:
+                    span.error = f'HTTP {response.status}'
+            return response
 
     async def get_calendar_slots(
         self,
         payload: CalendarSlotsRequest,
     ) -> list[TimeSlot] | None:
-        response = await self._aiohttp_client.post(
-            json=payload.model_dump(),
-            url=self._calendar_slots_url,
-            headers=self._headers,
-        )
+        response = await self._post('calendar_slots', self._calendar_slots_url, payload.model_dump(), self._headers)
         if response.status != HTTPStatus.OK:
             self._logger.error(f'Failed to get calendar slots: {response.status}')
             return
@@ -56,22 +92,21 @@ class XanoService(BaseService):
     async def create_appointment(
         self,
         payload: CreateAppointmentRequest,
+        idempotency_key: str | None = None,
     ) -> bool:
-        response = await self._aiohttp_client.post(
-            json=payload.model_dump(),
-            url=self._create_appointment_url,
-            headers=self._headers,
-        )
+        headers = self._headers
+        if idempotency_key is not None:
+            # Lets Xano drop a repeated delivery of the same appointment
+            headers = {**headers, 'Idempotency-Key': idempotency_key}
+        response = await self._post('calendar', self._create_appointment_url, payload.model_dump(), headers)
         if response.status != HTTPStatus.OK:
             self._logger.error(f'Failed to create appointment. Status: {response.status}. Text: {response.text}')
             return False
         return True
 
     async def search_property(self, search_address: str) -> SearchPropertyResponse | None:
-        response = await self._aiohttp_client.post(
-            json=dict(search_address=search_address),
-            url=self._search_property_url,
-            headers=self._headers,
+        response = await self._post(
+            'property_search_address', self._search_property_url, dict(search_address=search_address), self._headers,
         )
         if response.status != HTTPStatus.OK:
             self._logger.error(f'Failed to search property: {response.status}')
@@ -86,5 +121,17 @@ class XanoService(BaseService):
             self._logger.warning(f'search_property returned empty list for address: {search_address}')
         return response
 
+    async def get_properties_page(self, payload: PropertySyncRequest) -> PropertySyncResponse | None:
+        response = await self._post('property_sync', self._property_sync_url, payload.model_dump(), self._headers)
+        if response.status != HTTPStatus.OK:
+            self._logger.error(f'Failed to get properties page: {response.status}')
+            return None
+        properties_json = await response.json()
+        try:
+            return PropertySyncResponse(**properties_json)
+        except ValidationError as e:
+            self._logger.error(f'"get_properties_page" returned invalid response structure: {e}')
+            return None
+
 #####################################################################################################
 
@@ -0,0 +1,42 @@
+#####################################################################################################
+"""
+Normalized contact details of leads, the keys a returning caller is recognised by.
+
+Phone numbers are reduced to E.164 like digits without a phone number library: separators
+and the (0) of +44 (0)... numbers are dropped, 00 becomes +, and national numbers with a
+leading 0 get DEFAULT_COUNTRY_CODE, as agencies are in the UK.
+"""
+import re
+from typing import Final
+
+#####################################################################################################
+
+DEFAULT_COUNTRY_CODE: Final = '44'
+
+_PHONE_SEPARATORS_RE: Final = re.compile(r'[\s().\-/]')
+_MIN_PHONE_DIGITS: Final = 7
+
+#####################################################################################################
+
+def normalize_email(email: str | None) -> str | None:
+    if not email:
+        return None
+    email = email.strip().lower()
+    return email if '@' in email else None
+
+def normalize_phone(phone: str | None) -> str | None:
+    if not phone:
+        return None
+    phone = _PHONE_SEPARATORS_RE.sub('', phone.replace('(0)', ''))
+    if phone.startswith('00'):
+        phone = '+' + phone[2:]
+    elif phone.startswith('0'):
+        phone = f'+{DEFAULT_COUNTRY_CODE}{phone[1:]}'
+    elif not phone.startswith('+'):
+        phone = '+' + phone
+    digits = phone[1:]
+    if not digits.isdigit() or len(digits) < _MIN_PHONE_DIGITS:
+        return None
+    return phone
+
+#####################################################################################################
@@ -0,0 +1,20 @@
+#####################################################################################################
+"""HTTP validators of cached responses."""
+from hashlib import blake2b
+
+#####################################################################################################
+
+def strong_etag(body: bytes) -> str:
+    return f'"{blake2b(body, digest_size=16).hexdigest()}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match comparison, weak as RFC 9110 requires for it, so W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+#####################################################################################################
@@ -0,0 +1,132 @@
+#####################################################################################################
+"""
+Minimal JSON-schema compiler for the LLM function parameters.
+
+Only the subset used in services.func_tools is supported: type (single or list), enum,
+properties, required, additionalProperties (bool) and items. The schema is walked once
+and turned into nested closures, so validating a call does not touch the schema dict.
+"""
+from types import NoneType
+from typing import Any, Callable, Final, Mapping
+
+#####################################################################################################
+
+SchemaError = dict[str, str]
+Validator = Callable[[Any, str, list[SchemaError]], None]
+
+_JSON_TYPES: Final[Mapping[str, tuple[type, ...]]] = {
+    'string': (str,),
+    'integer': (int,),
+    'number': (int, float),
+    'boolean': (bool,),
+    'null': (NoneType,),
+    'object': (dict,),
+    'array': (list,),
+}
+
+#####################################################################################################
+
+def compile_schema(schema: Mapping[str, Any]) -> Callable[[Any], list[SchemaError]]:
+    """Compile schema once, return function which returns list of errors (empty if valid)."""
+    validator = _compile(schema)
+
+    def validate(value: Any) -> list[SchemaError]:
+        errors: list[SchemaError] = []
+        validator(value, '', errors)
+        return errors
+
+    return validate
+
+#####################################################################################################
+
+def _compile(schema: Mapping[str, Any]) -> Validator:
+    checks: list[Validator] = []
+
+    if 'type' in schema:
+        checks.append(_compile_type(schema['type']))
+    if 'enum' in schema:
+        checks.append(_compile_enum(schema['enum']))
+    if 'properties' in schema or 'required' in schema:
+        checks.append(_compile_object(schema))
+    if 'items' in schema:
+        checks.append(_compile_items(schema['items']))
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def validate_all(value: Any, path: str, errors: list[SchemaError]) -> None:
+        count = len(errors)
+        for check in checks:
+            check(value, path, errors)
+            # Type mismatch makes the remaining checks meaningless
+            if len(errors) != count:
+                return
+
+    return validate_all
+
+#####################################################################################################
+
+def _compile_type(json_type: str | list[str]) -> Validator:
+    type_names: Final = (json_type,) if isinstance(json_type, str) else tuple(json_type)
+    python_types: Final = tuple(t for name in type_names for t in _JSON_TYPES[name])
+    allow_bool: Final = 'boolean' in type_names
+    expected: Final = ' or '.join(type_names)
+
+    def validate_type(value: Any, path: str, errors: list[SchemaError]) -> None:
+        # bool is subclass of int in python, but not an integer in json
+        if not isinstance(value, python_types) or (isinstance(value, bool) and not allow_bool):
+            errors.append({'field': path or '$', 'error': f'expected {expected}'})
+
+    return validate_type
+
+#####################################################################################################
+
+def _compile_enum(options: list[Any]) -> Validator:
+    allowed: Final = frozenset(options)
+    expected: Final = '|'.join(str(option) for option in options)
+
+    def validate_enum(value: Any, path: str, errors: list[SchemaError]) -> None:
+        if value not in allowed:
+            errors.append({'field': path or '$', 'error': f'expected one of {expected}'})
+
+    return validate_enum
+
+#####################################################################################################
+
+def _compile_object(schema: Mapping[str, Any]) -> Validator:
+    properties: Final = {
+        name: _compile(sub_schema) for name, sub_schema in schema.get('properties', {}).items()
+    }
+    required: Final = tuple(schema.get('required', ()))
+    additional_allowed: Final = schema.get('additionalProperties', True) is not False
+
+    def validate_object(value: Any, path: str, errors: list[SchemaError]) -> None:
+        if not isinstance(value, dict):
+            return
+        prefix = f'{path}.' if path else ''
+        for name in required:
+            if name not in value:
+                errors.append({'field': f'{prefix}{name}', 'error': 'required'})
+        for name, item in value.items():
+            validator = properties.get(name)
+            if validator is not None:
+                validator(item, f'{prefix}{name}', errors)
+            elif not additional_allowed:
+                errors.append({'field': f'{prefix}{name}', 'error': 'unknown field'})
+
+    return validate_object
+
+#####################################################################################################
+
+def _compile_items(schema: Mapping[str, Any]) -> Validator:
+    item_validator: Final = _compile(schema)
+
+    def validate_items(value: Any, path: str, errors: list[SchemaError]) -> None:
+        if not isinstance(value, list):
+            return
+        for index, item in enumerate(value):
+            item_validator(item, f'{path}[{index}]', errors)
+
+    return validate_items
+
+#####################################################################################################
@@ -0,0 +1,221 @@
+#####################################################################################################
+"""
+Small in-process metrics collectors.
+
+Metrics with labels hand out children through labels(). Children are cached, so hot paths
+should bind them once (e.g. in __init__) and only call inc()/observe() afterwards.
+Values owned by other objects (e.g. the DB pool) are copied into gauges by collect hooks
+right before render_text() writes the Prometheus text format.
+"""
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from math import isinf, isnan
+from typing import Callable, Final, Iterator
+
+#####################################################################################################
+
+DEFAULT_LATENCY_BUCKETS: Final = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE: Final = 'text/plain; version=0.0.4; charset=utf-8'
+
+#####################################################################################################
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+#####################################################################################################
+
+class _GaugeChild:
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+#####################################################################################################
+
+class _HistogramChild:
+    __slots__ = ('_buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self._buckets = buckets
+        # Last element is the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self._buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+#####################################################################################################
+
+class _Metric(ABC):
+    type_name: str = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name: Final = name
+        self.documentation: Final = documentation
+        self.labelnames: Final = labelnames
+        self._children: dict[tuple[str, ...], object] = {}
+        if not labelnames:
+            self._default = self._new_child()
+            self._children[()] = self._default
+        REGISTRY.register(self)
+
+    @abstractmethod
+    def _new_child(self):
+        pass
+
+    def labels(self, *values: str):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f'Metric "{self.name}" expects labels {self.labelnames}, got {values}')
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def children(self) -> Iterator[tuple[tuple[str, ...], object]]:
+        yield from tuple(self._children.items())
+
+#####################################################################################################
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+#####################################################################################################
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+#####################################################################################################
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        self.buckets: Final = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+#####################################################################################################
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._collect_hooks: list[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric "{metric.name}" is already registered')
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> _Metric | None:
+        return self._metrics.get(name)
+
+    def metrics(self) -> tuple[_Metric, ...]:
+        return tuple(self._metrics.values())
+
+    def add_collect_hook(self, hook: Callable[[], None]) -> None:
+        """hook is called before every collect(), to update gauges it does not make sense to keep current."""
+        self._collect_hooks.append(hook)
+
+    def collect(self) -> tuple[_Metric, ...]:
+        for hook in self._collect_hooks:
+            hook()
+        return self.metrics()
+
+#####################################################################################################
+
+REGISTRY: Final = MetricsRegistry()
+
+#####################################################################################################
+
+def _format_value(value: float) -> str:
+    if isnan(value):
+        return 'NaN'
+    if isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def render_text(registry: MetricsRegistry = REGISTRY) -> str:
+    """All metrics of registry in the Prometheus text exposition format 0.0.4."""
+    lines = []
+    for metric in registry.collect():
+        documentation = metric.documentation.replace('\\', '\\\\').replace('\n', '\\n')
+        lines.append(f'# HELP {metric.name} {documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type_name}')
+        for values, child in metric.children():
+            if isinstance(child, _HistogramChild):
+                cumulative = 0
+                for bound, count in zip(metric.buckets, child.counts):
+                    cumulative += count
+                    labels = _format_labels(metric.labelnames, values, f'le="{bound!r}"')
+                    lines.append(f'{metric.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(metric.labelnames, values, 'le="+Inf"')
+                lines.append(f'{metric.name}_bucket{labels} {child.count}')
+                labels = _format_labels(metric.labelnames, values)
+                lines.append(f'{metric.name}_sum{labels} {_format_value(child.sum)}')
+                lines.append(f'{metric.name}_count{labels} {child.count}')
+            else:
+                lines.append(f'{metric.name}{_format_labels(metric.labelnames, values)} {_format_value(child.value)}')
+    lines.append('')
+    return '\n'.join(lines)
+
+#####################################################################################################
@@ -0,0 +1,37 @@
+#####################################################################################################
+"""
+Opaque cursors for keyset pagination.
+
+A cursor holds the sort key of the last row of a page, the next page starts right after it.
+Unlike OFFSET, the cost of a page does not grow with its position.
+"""
+import base64
+from datetime import datetime
+from typing import Any
+
+import orjson
+
+from app_types.exceptions import InvalidCursor
+
+#####################################################################################################
+
+def encode_cursor(*values: Any) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode().rstrip('=')
+
+#####################################################################################################
+
+def decode_cursor(cursor: str, *types: type) -> tuple:
+    """Values of the cursor converted to types. Raises InvalidCursor."""
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError('unexpected number of values')
+        return tuple(
+            datetime.fromisoformat(value) if value_type is datetime else value_type(value)
+            for value, value_type in zip(values, types)
+        )
+    # UUID() raises AttributeError for values which are not strings
+    except (ValueError, TypeError, AttributeError) as ex:
+        raise InvalidCursor(str(ex)) from ex
+
+#####################################################################################################
@@ -1,43 +1,196 @@
 #####################################################################################################
+"""
+Prompt templates.
+
+Prompts are Jinja2 templates with a fixed set of variables, so literal braces in the text are
+safe. Older prompts are str.format strings with {name} placeholders and {{ }} escaped braces,
+they are upgraded on load.
+Templates are validated and compiled once, rendering on call start does no disk I/O.
+"""
 import json
-from typing import Mapping, Final
+import re
+from functools import lru_cache
+from os import stat
+from pathlib import Path
+from typing import Final, Iterable, Mapping
+
+from jinja2 import Environment, StrictUndefined, Template, TemplateSyntaxError, meta
 
+from app_types.exceptions import PromptTemplateError
 from configs.constants import BASE_DIR
 
 #####################################################################################################
 
+PROMPT_VARIABLES: Final = frozenset({'assistant_name', 'agency_name', 'location', 'now'})
+
+_ENVIRONMENT: Final = Environment(undefined=StrictUndefined, keep_trailing_newline=True, autoescape=False)
+_LEGACY_TOKEN_RE: Final = re.compile(r'\{\{|\}\}|\{(' + '|'.join(PROMPT_VARIABLES) + r')\}')
+# Statements, comments and prints of known variables, which str.format prompts do not have
+_TEMPLATE_SYNTAX_RE: Final = re.compile(r'\{[%#]|(?<!\{)\{\{\s*(?:' + '|'.join(PROMPT_VARIABLES) + r')\b')
+
+#####################################################################################################
+
+def upgrade_legacy_placeholders(source: str) -> str:
+    """
+    Turns a str.format prompt into a template: {name} placeholders of known variables become
+    {{ name }} and {{ }} escapes become literal braces. Text with braces is kept raw, so Jinja
+    does not read it. Prompts which already use template syntax are returned as they are.
+    """
+    if _TEMPLATE_SYNTAX_RE.search(source):
+        return source
+    parts: list[str] = []
+    literal: list[str] = []
+    position = 0
+    for match in _LEGACY_TOKEN_RE.finditer(source):
+        literal.append(source[position:match.start()])
+        if match.group(1) is None:
+            literal.append(match.group(0)[0])
+        else:
+            parts.append(_raw_text(''.join(literal)))
+            literal.clear()
+            parts.append(f'{{{{ {match.group(1)} }}}}')
+        position = match.end()
+    literal.append(source[position:])
+    parts.append(_raw_text(''.join(literal)))
+    return ''.join(parts)
+
+def _raw_text(text: str) -> str:
+    return f'{{% raw %}}{text}{{% endraw %}}' if '{' in text or '}' in text else text
+
+#####################################################################################################
+
+@lru_cache(maxsize=256)
+def compile_prompt(source: str) -> Template:
+    """Compiled template of the prompt. Raises PromptTemplateError for syntax errors or unknown variables."""
+    source = upgrade_legacy_placeholders(source)
+    try:
+        variables = meta.find_undeclared_variables(_ENVIRONMENT.parse(source))
+    except TemplateSyntaxError as ex:
+        raise PromptTemplateError(f'line {ex.lineno}: {ex.message}') from ex
+    unknown = variables - PROMPT_VARIABLES
+    if unknown:
+        raise PromptTemplateError(
+            f'unknown placeholders {sorted(unknown)}, allowed are {sorted(PROMPT_VARIABLES)}'
+        )
+    return _ENVIRONMENT.from_string(source)
+
+#####################################################################################################
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text and JSON, about 4 characters per token."""
+    return (len(text) + 3) // 4
+
+#####################################################################################################
+
 class PromptTemplateBuilder:
+    """
+    Instructions blueprint and dev instructions kept in memory.
+
+    Nothing is loaded until the first reload(). It compares file modification times and
+    reloads only changed files. A broken file is reported and the previous version stays
+    in use. Every successful reload bumps version.
+    """
 
     _PROMPT_STORAGE_PATH: Final = BASE_DIR / "src" / "prompts" / "instructions_blueprint.json"
+    _DEV_INSTRUCTIONS_PATH: Final = BASE_DIR / "src" / "prompts" / "dev_instructions.txt"
+
+    def __init__(
+        self,
+        blueprint_path: Path = _PROMPT_STORAGE_PATH,
+        dev_instructions_path: Path = _DEV_INSTRUCTIONS_PATH,
+    ) -> None:
+        self._blueprint_path: Final = blueprint_path
+        self._dev_instructions_path: Final = dev_instructions_path
+        self._blueprint: Mapping | None = None
+        self._dev_instructions_source: str = ''
+        self._dev_instructions: Template | None = None
+        self._mtimes: dict[Path, float] = {}
+        self._instructions_cache: dict[tuple[str, ...], str] = {}
+        self.version = 0
+
+    @property
+    def dev_instructions_path(self) -> Path:
+        return self._dev_instructions_path
 
-    def __init__(self) -> None:
-        pass
+    @property
+    def dev_instructions_source(self) -> str:
+        return self._dev_instructions_source
 
-    def load(self) -> Mapping:
-        with open(self._PROMPT_STORAGE_PATH, 'r') as f:
-            return json.load(f)
+    @property
+    def dev_instructions(self) -> Template:
+        if self._dev_instructions is None:
+            raise PromptTemplateError(f'{self._dev_instructions_path.name} could not be loaded')
+        return self._dev_instructions
 
-    def build_instructions(self, tasks: list[str]) -> str:
-        data = self.load()
+    def reload(self) -> list[str]:
+        """Reloads changed files. Returns errors of the files which could not be loaded."""
+        errors = []
+        blueprint_mtime = self._changed_mtime(self._blueprint_path)
+        if blueprint_mtime is not None:
+            try:
+                self._blueprint = self._load_blueprint()
+                self._instructions_cache.clear()
+                self.version += 1
+            except (OSError, ValueError, KeyError, PromptTemplateError) as ex:
+                errors.append(f'{self._blueprint_path.name}: {ex}')
+            # A broken file is reported once, not on every check until it is fixed
+            self._mtimes[self._blueprint_path] = blueprint_mtime
+
+        dev_mtime = self._changed_mtime(self._dev_instructions_path)
+        if dev_mtime is not None:
+            try:
+                source = self._dev_instructions_path.read_text()
+                self._dev_instructions = compile_prompt(source)
+                self._dev_instructions_source = source
+                self.version += 1
+            except (OSError, PromptTemplateError) as ex:
+                errors.append(f'{self._dev_instructions_path.name}: {ex}')
+            self._mtimes[self._dev_instructions_path] = dev_mtime
+        return errors
+
+    def _changed_mtime(self, path: Path) -> float | None:
+        try:
+            mtime = stat(path).st_mtime
+        except OSError:
+            return None
+        return mtime if self._mtimes.get(path) != mtime else None
+
+    def _load_blueprint(self) -> Mapping:
+        with open(self._blueprint_path, 'r') as f:
+            data = json.load(f)
+        # Every part must be valid on its own, so any combination of tasks is valid too
+        compile_prompt(data['role'])
+        compile_prompt(data['important_notes'])
+        for task in data['tasks'].values():
+            compile_prompt(task['description'])
+            compile_prompt(task['instructions'])
+        return data
+
+    def build_instructions(self, tasks: Iterable[str]) -> str:
+        """Template source of the instructions for the tasks, see compile_prompt."""
+        key = tuple(tasks)
+        instructions = self._instructions_cache.get(key)
+        if instructions is not None:
+            return instructions
+        if self._blueprint is None:
+            raise PromptTemplateError(f'{self._blueprint_path.name} could not be loaded')
+
+        data = self._blueprint
         parts = [data["role"]]
 
         # Add task description
-        for task in tasks:
+        for task in key:
             if task in data['tasks']:
                 parts.append(data['tasks'][task]['description'])
 
         # Add task instructions
-        for task in tasks:
+        for task in key:
             if task in data["tasks"]:
                 parts.append(data["tasks"][task]["instructions"])
 
         parts.append(data["important_notes"])
 
-        return "\n".join(parts)
+        instructions = self._instructions_cache[key] = upgrade_legacy_placeholders("\n".join(parts))
+        return instructions
 
 #####################################################################################################
-
-# FOR TESTING
-# if __name__ == '__main__':
-#     builder = PromptTemplateBuilder()
-#     print(builder.build_instructions(tasks=['valuation', 'viewing']))
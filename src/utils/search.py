@@ -0,0 +1,71 @@
+#####################################################################################################
+"""
+Transcript full-text search helpers.
+
+Search box queries are translated to to_tsquery syntax here instead of using
+websearch_to_tsquery, which has no prefix matching.
+"""
+import re
+from typing import Final, Iterable, Mapping
+
+#####################################################################################################
+
+# Text search configuration of the transcript documents and of the queries
+SEARCH_CONFIG: Final = 'english'
+
+_TOKEN_RE: Final = re.compile(r'"([^"]*)"|(\S+)')
+_WORD_RE: Final = re.compile(r'\w+')
+
+#####################################################################################################
+
+def build_tsquery(query: str, weights: str = '') -> str:
+    """
+    to_tsquery text of a search box query. Words must all match, "quoted words" are a phrase,
+    word* matches a prefix and -word excludes. weights (e.g. 'A') restrict the match to parts
+    of the document with these weights. Raises ValueError when nothing is left to search.
+    """
+    def words_term(words: list[str], prefix: bool = False) -> str:
+        labels = [f':{weights}' if weights else ''] * len(words)
+        if prefix:
+            labels[-1] = f':*{weights}'
+        return ' <-> '.join(word + label for word, label in zip(words, labels))
+
+    terms = []
+    positive = False
+    for phrase, token in _TOKEN_RE.findall(query):
+        if phrase:
+            words = _WORD_RE.findall(phrase)
+            if words:
+                terms.append(f'({words_term(words)})')
+                positive = True
+            continue
+        words = _WORD_RE.findall(token)
+        if not words:
+            continue
+        # Words glued by punctuation (e.g. "byres-road") stay a phrase
+        term = words_term(words, prefix=token.endswith('*'))
+        if token.startswith('-'):
+            terms.append(f'!({term})')
+        else:
+            terms.append(f'({term})')
+            positive = True
+    if not positive:
+        raise ValueError('query has no words to search for')
+    return ' & '.join(terms)
+
+#####################################################################################################
+
+def transcript_texts(transcript: Iterable[Mapping] | None) -> tuple[str, str]:
+    """Text said by the user and by the assistant, one message per line."""
+    user, assistant = [], []
+    for message in transcript or ():
+        content = message.get('content')
+        if not content:
+            continue
+        if message.get('role') == 'user':
+            user.append(content)
+        elif message.get('role') == 'assistant':
+            assistant.append(content)
+    return '\n'.join(user), '\n'.join(assistant)
+
+#####################################################################################################
@@ -0,0 +1,43 @@
+#####################################################################################################
+"""
+JSON of WebSocket frames and tool results.
+
+orjson writes datetime as RFC 3339, UUID as its string and str/int enums (ConversationPurpose,
+app_types.enums) as their values on its own. Pydantic models and sets go through _default.
+REST routes do not use it: FastAPI serializes their response models straight to bytes with
+pydantic-core, which is faster still (see benchmarks.json_serialization), and a custom
+response class would turn that off.
+"""
+from typing import Any, Final
+
+import orjson
+from pydantic import BaseModel
+
+#####################################################################################################
+
+_OPTIONS: Final = orjson.OPT_NON_STR_KEYS
+_PRETTY_OPTIONS: Final = _OPTIONS | orjson.OPT_INDENT_2
+
+loads: Final = orjson.loads
+
+#####################################################################################################
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode='json')
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+def dumps_text(obj: Any) -> str:
+    """Compact JSON as text, e.g. for text WebSocket frames."""
+    return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+
+def dumps_pretty(obj: Any) -> str:
+    """Indented JSON for people reading it, e.g. the dev mode frames."""
+    return orjson.dumps(obj, default=_default, option=_PRETTY_OPTIONS).decode()
+
+#####################################################################################################
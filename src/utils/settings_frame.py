@@ -0,0 +1,88 @@
+#####################################################################################################
+"""
+Deepgram settings messages compiled once and completed per call.
+
+The settings message of an agency is the same for every call except a few values like the
+current time. It is serialized once into a template with splice points for such values,
+so starting a call is a couple of string joins instead of building and serializing the
+whole options tree.
+"""
+import re
+from typing import Any, Final, Mapping
+
+import orjson
+from deepgram import AgentWebSocketEvents, SettingsConfigurationOptions
+
+#####################################################################################################
+
+_PLACEHOLDER_RE: Final = re.compile(r'\\u0000([a-z_]+)\\u0000')
+
+#####################################################################################################
+
+def placeholder(name: str) -> str:
+    """Marker of a per-call variable inside a string value. It can not appear in a real prompt."""
+    return f'\x00{name}\x00'
+
+#####################################################################################################
+
+def _drop_none(value: Any) -> Any:
+    # Deepgram SDK omits unset optional fields, the messages must stay the same
+    if isinstance(value, Mapping):
+        return {key: _drop_none(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [_drop_none(item) for item in value]
+    return value
+
+#####################################################################################################
+
+class SettingsFrameTemplate:
+    """Wire JSON of a SettingsConfiguration message with named splice points."""
+
+    __slots__ = ('_parts', '_names', 'names')
+
+    def __init__(self, parts: list[str], names: list[str]) -> None:
+        self._parts: Final = parts
+        self._names: Final = names
+        self.names: Final = frozenset(names)
+
+    @classmethod
+    def compile(cls, settings: Mapping[str, Any]) -> 'SettingsFrameTemplate':
+        """
+        Compiles a settings dict as produced by SettingsConfigurationOptions.to_dict() or by
+        AgencySettings.model_dump(). String values may contain placeholder() markers.
+        """
+        message = _drop_none({'type': str(AgentWebSocketEvents.SettingsConfiguration), **settings})
+        listen = message.get('agent', {}).get('listen', {})
+        if listen.get('keyterms') and not str(listen.get('model', 'nova-3')).startswith('nova-3'):
+            raise ValueError('Keyterms are only supported for nova-3 models')
+        # orjson writes the NUL of the markers as \u0000, which is where the text is split
+        parts = _PLACEHOLDER_RE.split(orjson.dumps(message).decode())
+        return cls(parts=parts[::2], names=parts[1::2])
+
+    def render(self, **values: Any) -> str:
+        """Message text with every placeholder replaced by the JSON escaped str(value)."""
+        if len(self._parts) == 1:
+            return self._parts[0]
+        escaped = {name: orjson.dumps(str(values[name])).decode()[1:-1] for name in self.names}
+        chunks = [self._parts[0]]
+        for name, part in zip(self._names, self._parts[1:]):
+            chunks.append(escaped[name])
+            chunks.append(part)
+        return ''.join(chunks)
+
+#####################################################################################################
+
+class PreSerializedSettings(SettingsConfigurationOptions):
+    """
+    Options whose message is already serialized. AsyncAgentWebSocketClient.start sends
+    str(options) as the settings message, so the rendered frame goes to the wire as is.
+    """
+
+    def __init__(self, frame: str) -> None:
+        super().__init__()
+        self.frame = frame
+
+    def __str__(self) -> str:
+        return self.frame
+
+#####################################################################################################
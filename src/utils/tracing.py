@@ -0,0 +1,175 @@
+#####################################################################################################
+"""
+Lightweight span tracing of voice sessions.
+
+Every session gets a session id, which is sent to Xano in the X-Session-Id header and is the
+trace id of the session's spans as well. Whether a session is traced is decided once, on its
+start, by the sample rate. Sessions that are not traced create no spans at all.
+Finished spans wait in a bounded queue for services.trace_exporter, which writes them as
+OTLP JSON.
+
+The current span is kept in a ContextVar, so tasks created inside a span (e.g. by the
+Deepgram SDK) inherit it. Handlers of Deepgram events pass the session root as parent.
+"""
+import os
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from random import random
+from time import time_ns
+from typing import Any, Final, Iterator
+from uuid import uuid4
+
+from utils.metrics import Counter
+
+#####################################################################################################
+
+SESSION_ID_HEADER: Final = 'X-Session-Id'
+TRACEPARENT_HEADER: Final = 'traceparent'
+
+_SPANS_DROPPED: Final = Counter(
+    'voice_trace_spans_dropped_total',
+    'Finished spans dropped because the export queue was full',
+)
+
+#####################################################################################################
+
+class SpanKind(IntEnum):
+    """Values of OTLP Span.SpanKind."""
+    INTERNAL = 1
+    SERVER = 2
+    CLIENT = 3
+
+#####################################################################################################
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_span_id', 'name', 'kind', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(
+        self,
+        trace_id: str,
+        parent_span_id: str | None,
+        name: str,
+        kind: SpanKind,
+        attributes: dict[str, Any] | None,
+    ) -> None:
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.error: str | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context of the span, sampled flag set."""
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+#####################################################################################################
+
+_session_id: Final[ContextVar[str | None]] = ContextVar('session_id', default=None)
+_current_span: Final[ContextVar[Span | None]] = ContextVar('current_span', default=None)
+
+#####################################################################################################
+
+class Tracer:
+    def __init__(self, sample_rate: float = 0.0, max_queued_spans: int = 10_000) -> None:
+        self.sample_rate = sample_rate
+        self._finished: deque[Span] = deque(maxlen=max_queued_spans)
+
+    def configure(self, sample_rate: float, max_queued_spans: int) -> None:
+        self.sample_rate = sample_rate
+        self._finished = deque(self._finished, maxlen=max_queued_spans)
+
+    def start_session(self, name: str, attributes: dict[str, Any] | None = None) -> tuple[str, Span | None]:
+        """
+        Sets a new session id in the current context and, when the session is sampled, starts
+        its root span and makes it current. Returns the session id and the root span.
+        """
+        session_id = uuid4().hex
+        _session_id.set(session_id)
+        if self.sample_rate <= 0 or random() >= self.sample_rate:
+            _current_span.set(None)
+            return session_id, None
+        root = Span(session_id, None, name, SpanKind.SERVER, {'session.id': session_id, **(attributes or {})})
+        _current_span.set(root)
+        return session_id, root
+
+    def start_span(
+        self,
+        name: str,
+        parent: Span | None = None,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes: dict[str, Any] | None = None,
+    ) -> Span | None:
+        """Span that is not made current, for work which ends in another task. None when not traced."""
+        parent = parent or _current_span.get()
+        if parent is None:
+            return None
+        return Span(parent.trace_id, parent.span_id, name, kind, attributes)
+
+    def end_span(self, span: Span | None, error: BaseException | str | None = None) -> None:
+        if span is None or span.end_ns:
+            return
+        span.end_ns = time_ns()
+        if error is not None:
+            span.error = str(error) or type(error).__name__
+        if len(self._finished) == self._finished.maxlen:
+            _SPANS_DROPPED.inc()
+        self._finished.append(span)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        parent: Span | None = None,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes: dict[str, Any] | None = None,
+    ) -> Iterator[Span | None]:
+        """Current span for the duration of the block, child of parent or of the current span."""
+        span = self.start_span(name, parent, kind, attributes)
+        if span is None:
+            yield None
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as ex:
+            self.end_span(span, ex)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def drain(self) -> list[Span]:
+        """Finished spans queued since the last drain."""
+        spans = []
+        while self._finished:
+            spans.append(self._finished.popleft())
+        return spans
+
+#####################################################################################################
+
+TRACER: Final = Tracer()
+
+#####################################################################################################
+
+def trace_headers() -> dict[str, str]:
+    """Headers correlating an outgoing request with the current session and span."""
+    headers = {}
+    session_id = _session_id.get()
+    if session_id is not None:
+        headers[SESSION_ID_HEADER] = session_id
+    span = _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = span.traceparent
+    return headers
+
+#####################################################################################################
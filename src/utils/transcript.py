@@ -0,0 +1,48 @@
+#####################################################################################################
+"""
+Compact binary encoding of transcripts.
+
+A packed transcript is a format byte followed by the compact JSON of the turns, deflated with
+a preset dictionary of what every Deepgram turn repeats. The dictionary makes even short calls
+compress well. Plain JSON (rows written before packing) is read as it is, so both can be
+unpacked the same way.
+"""
+import zlib
+from typing import Final
+
+import orjson
+
+#####################################################################################################
+
+# Format 1: raw deflate with _DICTIONARY_V1. Neither may ever change, stored rows depend on them
+_FORMAT_V1: Final = b'\x01'
+_COMPRESSION_LEVEL: Final = 6
+_DICTIONARY_V1: Final = b''.join((
+    b'Thank you. Would you like to book a viewing or a valuation of the property? ',
+    b'Could I take your name, email address and phone number, please? ',
+    b'bedroom flat available appointment tomorrow morning afternoon',
+    b'"},{"type":"ConversationText","role":"assistant","content":"',
+    b'"},{"type":"ConversationText","role":"user","content":"',
+    b'[{"type":"ConversationText","role":"assistant","content":"',
+))
+
+#####################################################################################################
+
+def pack_transcript(transcript: list[dict] | None) -> bytes | None:
+    if transcript is None:
+        return None
+    compressor = zlib.compressobj(_COMPRESSION_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=_DICTIONARY_V1)
+    return _FORMAT_V1 + compressor.compress(orjson.dumps(transcript)) + compressor.flush()
+
+def unpack_transcript(data: bytes | None) -> list[dict] | None:
+    """Turns of a packed transcript or of plain JSON. Raises ValueError for unknown formats."""
+    if data is None:
+        return None
+    if data[:1] == _FORMAT_V1:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=_DICTIONARY_V1)
+        data = decompressor.decompress(data[1:]) + decompressor.flush()
+    elif data[:1] not in (b'[', b'n'):
+        raise ValueError(f'Unknown transcript format {data[:1]!r}')
+    return orjson.loads(data)
+
+#####################################################################################################